@@ -0,0 +1,176 @@
+"""
+Scale benchmark for the mastersheet stages on synthetic data.
+
+Run from analysis/create_mastersheet/ so the parsers/ imports resolve, e.g.:
+
+    python -m benchmarks.run_benchmark --sessions 1000 5000 --workers 8 --output bench.json
+    python -m benchmarks.run_benchmark --sessions 1000 --baseline bench.json   # exit 1 on regression
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import argparse
+import tempfile
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.synthetic_dataset import generate_dataset
+from parsers.anchors import AnchorTable
+from parsers.dicom_cache import DICOMCache
+from parsers.nifti_cache import NiftiCache
+from parsers.structural_probe import StructuralProbe
+from parsers.path_strategies.default_flat import DefaultFlatStrategy
+from parsers.path_strategies.per_subject import PerSubjectStrategy
+from config.dicom_fields import dcm_keep_fields
+
+STAGES = ["anchors", "dicom", "nifti", "struct"]
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process and its finished children (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * scale / 2**20
+
+
+def stage_anchors(dataset, out_dir, workers):
+    if dataset["layout"] == "per-subject":
+        strategy = PerSubjectStrategy(dataset["subject_dirs"], workers=max(workers, 16))
+    else:
+        strategy = DefaultFlatStrategy(base_dir=dataset["base_dir"], bids_base_dir=dataset["bids_dir"])
+    strategy.missing_report_path = os.path.join(out_dir, "missing_bids_files.csv")
+    anchors = AnchorTable(
+        strategy, cache_path=os.path.join(out_dir, "anchor_df.csv"),
+        hash_path=os.path.join(out_dir, "anchor_hash.txt"),
+        fingerprint_path=os.path.join(out_dir, "anchor_fingerprints.csv"),
+    )
+    return anchors.get_df()
+
+
+def stage_dicom(anchor_df, out_dir, workers):
+    cache = DICOMCache(os.path.join(out_dir, "dicom_cache.json"), keep_fields=dcm_keep_fields)
+    rows, _, _ = cache.parse(anchor_df["Path"], workers=workers)
+    cache.save()
+    return pd.concat([anchor_df.reset_index(drop=True), pd.DataFrame(rows)], axis=1)
+
+
+def stage_nifti(merged_df, out_dir, workers):
+    cache = NiftiCache(os.path.join(out_dir, "nifti_cache.json"))
+    rows, _ = cache.parse(merged_df["NIfTI_path"], merged_df["JSON_path"])
+    cache.save()
+    return pd.concat([merged_df.reset_index(drop=True), pd.DataFrame(rows)], axis=1)
+
+
+def stage_struct(final_df, out_dir, workers):
+    probe = StructuralProbe(modalities=["T1w", "FLAIR"], folders=["anat"], workers=workers)
+    return pd.concat([final_df.reset_index(drop=True), probe.run(final_df)], axis=1)
+
+
+STAGE_FUNCS = {"anchors": stage_anchors, "dicom": stage_dicom, "nifti": stage_nifti, "struct": stage_struct}
+
+
+def _measure(stage, data, out_dir, workers):
+    """Run one stage in a fresh process and return (result, seconds, peak RSS in MB)."""
+    start = time.perf_counter()
+    result = STAGE_FUNCS[stage](data, out_dir, workers)
+    return result, time.perf_counter() - start, _peak_rss_mb()
+
+
+def run_stages(dataset, out_dir, workers=1, passes=("cold",)):
+    """
+    Time every stage on one dataset.
+
+    Each stage runs in its own freshly spawned process so its peak RSS is not inflated by earlier
+    stages (the figure still includes the interpreter and pandas, roughly 100 MB). A "warm" pass
+    reruns the stages with the DICOM/NIfTI caches from the cold pass in place.
+
+    Returns:
+        list: One dict per (pass, stage) with seconds, rows, rows_per_sec and peak_rss_mb.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for pass_name in passes:
+        data = dataset
+        for stage in STAGES:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                data, seconds, rss = pool.submit(_measure, stage, data, out_dir, workers).result()
+            results.append({
+                "pass": pass_name, "stage": stage, "rows": len(data), "seconds": round(seconds, 3),
+                "rows_per_sec": round(len(data) / seconds, 1) if seconds > 0 else None,
+                "peak_rss_mb": round(rss, 1),
+            })
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """Return the (sessions, workers, pass, stage) entries whose rows/sec dropped more than `tolerance` below the baseline."""
+    key = lambda r: (r["sessions"], r["workers"], r["pass"], r["stage"])
+    previous = {key(r): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = previous.get(key(r))
+        if old and old["rows_per_sec"] and r["rows_per_sec"] is not None:
+            if r["rows_per_sec"] < old["rows_per_sec"] * (1 - tolerance):
+                regressions.append({**r, "baseline_rows_per_sec": old["rows_per_sec"]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mastersheet stages on synthetic ADNI-like data.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000], help="Dataset sizes to run (default: 1000).")
+    parser.add_argument("--layout", choices=["flat", "per-subject"], default="flat")
+    parser.add_argument("--workers", type=int, default=1, help="Workers passed to the DICOM/structural stages.")
+    parser.add_argument("--gen-workers", type=int, default=os.cpu_count(), help="Processes used to generate the data.")
+    parser.add_argument("--volumes", type=int, default=20, help="BOLD volumes per synthetic run (default: 20).")
+    parser.add_argument("--warm", action="store_true", help="Also time a second pass with warm caches.")
+    parser.add_argument("--data-dir", help="Keep generated datasets here and reuse them across runs (default: temp dir).")
+    parser.add_argument("--output", help="Write the results as JSON.")
+    parser.add_argument("--baseline", help="Earlier --output JSON; exit 1 if any stage is slower by more than --tolerance.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed rows/sec drop vs. the baseline (default: 0.2).")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="mastersheet_bench_")
+    passes = ("cold", "warm") if args.warm else ("cold",)
+    results = []
+    try:
+        for n in args.sessions:
+            root = os.path.join(data_dir, f"{args.layout}_{n}")
+            dataset_file = os.path.join(root, "dataset.json")
+            if os.path.exists(dataset_file):
+                with open(dataset_file) as f:
+                    dataset = json.load(f)
+            else:
+                dataset = generate_dataset(root, n_sessions=n, layout=args.layout, n_volumes=args.volumes,
+                                           workers=args.gen_workers)
+            out_dir = os.path.join(root, "out")
+            shutil.rmtree(out_dir, ignore_errors=True)
+            os.makedirs(out_dir)
+            results += [{"sessions": n, "workers": args.workers, **r}
+                        for r in run_stages(dataset, out_dir, args.workers, passes)]
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    print(pd.DataFrame(results).to_string(index=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"[REGRESSION] {r['stage']} ({r['pass']}, {r['sessions']} sessions): "
+                  f"{r['rows_per_sec']} rows/sec vs. {r['baseline_rows_per_sec']} in the baseline")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
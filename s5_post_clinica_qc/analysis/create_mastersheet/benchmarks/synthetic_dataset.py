@@ -0,0 +1,267 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+import nibabel as nib
+import pydicom
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, MRImageStorage, generate_uid
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+
+# Visits in the order a subject accrues them
+VISCODES = ["bl", "m03", "m06", "m12", "m24", "m36", "m48", "m60", "m72", "m84"]
+
+# (Manufacturer, model, TR in s, volumes, coil) per scanner profile; sites get one profile each
+SCANNERS = [
+    ("SIEMENS", "Prisma_fit", 0.607, 976, "HEA;HEP"),
+    ("SIEMENS", "TrioTim", 3.0, 140, "32Ch_Head"),
+    ("Philips Medical Systems", "Ingenia", 3.0, 140, "HEAD"),
+    ("Philips Medical Systems", "Achieva", 3.0, 140, "SENSE-Head-8"),
+    ("GE MEDICAL SYSTEMS", "DISCOVERY MR750", 3.0, 197, "8HRBRAIN"),
+    ("GE MEDICAL SYSTEMS", "SIGNA Premier", 0.607, 976, "32Ch Head"),
+]
+
+TSV_COLUMNS = [
+    "Subject_ID", "VISCODE", "Visit", "Sequence", "Scan_Date", "Study_ID", "Series_ID",
+    "Image_ID", "Field_Strength", "Is_Dicom", "Path",
+]
+
+
+def make_sessions(n_sessions, seed=0, n_sites=60, missing_rate=0.02, t1_repeat_rate=0.1):
+    """
+    Build the session table the files are generated from: one row per (Subject_ID, VISCODE).
+
+    Subjects get 1-6 visits; each site is pinned to one scanner profile, so manufacturer x site
+    groupings look like ADNI's. A `missing_rate` fraction of sessions lose their NIfTI or JSON,
+    and a `t1_repeat_rate` fraction get a second T1w run.
+
+    Args:
+        n_sessions (int): Number of sessions (rows) to generate.
+        seed (int): Seed for reproducible datasets.
+
+    Returns:
+        pd.DataFrame: One row per session with the TSV columns plus scanner and file flags.
+    """
+    rng = np.random.default_rng(seed)
+    visits = rng.integers(1, 7, size=n_sessions)
+    subject_idx = np.repeat(np.arange(n_sessions), visits)[:n_sessions]
+    visit_idx = np.concatenate([np.arange(v) for v in visits])[:n_sessions]
+
+    site = 2 + (subject_idx % n_sites)
+    scanner = site % len(SCANNERS)
+    subject = [f"{s:03d}_S_{1000 + i:04d}" for s, i in zip(site, subject_idx)]
+    viscode = np.array(VISCODES)[np.minimum(visit_idx, len(VISCODES) - 1)]
+    months = pd.Series(viscode).str.extract(r"m(\d+)", expand=False).fillna(0).astype(int)
+    scan_date = pd.Timestamp("2011-01-01") + pd.to_timedelta(subject_idx % 2000 + months * 30, unit="D")
+
+    df = pd.DataFrame({
+        "Subject_ID": subject,
+        "VISCODE": viscode,
+        "Visit": [f"ADNI3 {v}" for v in viscode],
+        "Sequence": "Axial_rsfMRI__Eyes_Open_",
+        "Scan_Date": scan_date.dt.strftime("%Y-%m-%d"),
+        "Study_ID": 100000 + np.arange(n_sessions),
+        "Series_ID": 500000 + np.arange(n_sessions),
+        "Image_ID": 800000 + np.arange(n_sessions),
+        "Field_Strength": "",
+        "Is_Dicom": True,
+        "scanner": scanner,
+    })
+    df["has_nifti"] = rng.random(n_sessions) >= missing_rate
+    df["has_json"] = rng.random(n_sessions) >= missing_rate
+    df["n_t1_runs"] = np.where(rng.random(n_sessions) < t1_repeat_rate, 2, 1)
+    return df
+
+
+def _dicom_template():
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = MRImageStorage
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = FileDataset("", {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.SOPClassUID = MRImageStorage
+    ds.Modality = "MR"
+    ds.MagneticFieldStrength = 3.0
+    ds.SliceThickness = 3.3
+    ds.SpacingBetweenSlices = 3.3
+    ds.EchoTime = 30.0
+    ds.ScanningSequence = "EP"
+    ds.SequenceVariant = "SK"
+    ds.ProtocolName = "Axial rsfMRI (Eyes Open)"
+    ds.SeriesDescription = "Axial rsfMRI (Eyes Open)"
+    ds.MRAcquisitionFrequencyEncodingSteps = 64
+    ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    ds.PixelSpacing = [3.3, 3.3]
+    ds.Rows = ds.Columns = 4
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.PixelData = np.zeros((4, 4), np.uint16).tobytes()
+    return ds
+
+
+def write_dicom_series(series_dir, row, n_slices=3, template=None):
+    """Write a minimal MR series (n_slices tiny instances) with the header fields the parser reads."""
+    os.makedirs(series_dir, exist_ok=True)
+    manufacturer, model, tr, _, _ = SCANNERS[row.scanner]
+    ds = template or _dicom_template()
+    ds.PatientID = row.Subject_ID
+    ds.StudyDate = ds.SeriesDate = row.Scan_Date.replace("-", "")
+    ds.Manufacturer = manufacturer
+    ds.ManufacturerModelName = model
+    ds.SoftwareVersions = ["syngo MR XA30"] if manufacturer == "SIEMENS" else ["5.4.1", "5.4.1.0"]
+    ds.RepetitionTime = tr * 1000
+    ds.StudyInstanceUID = generate_uid()
+    ds.SeriesInstanceUID = generate_uid()
+    for i in range(n_slices):
+        ds.SOPInstanceUID = ds.file_meta.MediaStorageSOPInstanceUID = generate_uid()
+        ds.InstanceNumber = i + 1
+        ds.ImagePositionPatient = [0.0, 0.0, i * 3.3]
+        ds.SliceLocation = i * 3.3
+        ds.save_as(os.path.join(series_dir, f"{i + 1:05d}.dcm"), enforce_file_format=True)
+
+
+def write_bold(func_dir, base, row, n_volumes=None):
+    """Write a tiny 4D BOLD .nii.gz and its JSON sidecar (either may be skipped to mimic a failed conversion)."""
+    os.makedirs(func_dir, exist_ok=True)
+    manufacturer, model, tr, volumes, coil = SCANNERS[row.scanner]
+    if row.has_nifti:
+        img = nib.Nifti1Image(np.zeros((4, 4, 3, n_volumes or volumes), np.int16), np.diag([3.3, 3.3, 3.3, 1.0]))
+        img.header.set_zooms((3.3, 3.3, 3.3, tr))
+        img.header.set_xyzt_units("mm", "sec")
+        nib.save(img, os.path.join(func_dir, f"{base}.nii.gz"))
+    if row.has_json:
+        sidecar = {
+            "Manufacturer": manufacturer,
+            "ManufacturersModelName": model,
+            "MagneticFieldStrength": 3,
+            "InstitutionName": f"Site {row.Subject_ID[:3]}",
+            "MRAcquisitionType": "2D",
+            "CoilString": coil,
+            "RepetitionTime": tr,
+            "EchoTime": 0.03,
+            "FlipAngle": 90 if tr > 1 else 52,
+            "SliceThickness": 3.3,
+            "SpacingBetweenSlices": 3.3,
+            "PhaseEncodingDirection": "j-",
+            "PhaseEncodingAxis": "j",
+            "AcquisitionMatrixPE": 64,
+            "PercentPhaseFOV": 100,
+            "PercentSampling": 100,
+            "EchoTrainLength": 64,
+        }
+        with open(os.path.join(func_dir, f"{base}.json"), "w") as f:
+            json.dump(sidecar, f)
+
+
+def write_t1(anat_dir, prefix, n_runs=1):
+    """Write tiny 3D T1w images; repeated acquisitions get BIDS run-NN entities."""
+    os.makedirs(anat_dir, exist_ok=True)
+    img = nib.Nifti1Image(np.zeros((8, 8, 8), np.int16), np.diag([1.0, 1.0, 1.2, 1.0]))
+    names = [f"{prefix}_T1w.nii.gz"] if n_runs == 1 else [f"{prefix}_run-{r:02d}_T1w.nii.gz" for r in range(1, n_runs + 1)]
+    for name in names:
+        nib.save(img, os.path.join(anat_dir, name))
+
+
+def _write_sessions(args):
+    """Write DICOM + BIDS files for a batch of session rows (runs in a worker process)."""
+    rows, dicom_root, bids_roots, n_slices, n_volumes = args
+    template = _dicom_template()
+    for row, bids_root in zip(rows.itertuples(), bids_roots):
+        write_dicom_series(row.Path, row, n_slices=n_slices, template=template)
+        sub = "sub-ADNI" + row.Subject_ID.replace("_", "")
+        ses = "ses-" + row.session
+        write_bold(os.path.join(bids_root, sub, ses, "func"), f"{sub}_{ses}_task-rest_bold", row, n_volumes)
+        write_t1(os.path.join(bids_root, sub, ses, "anat"), f"{sub}_{ses}", row.n_t1_runs)
+    return len(rows)
+
+
+def generate_dataset(root, n_sessions=1000, layout="flat", n_versions=2, n_slices=3, n_volumes=None,
+                     seed=0, workers=1, batch_size=200):
+    """
+    Generate an ADNI-like Clinica output tree under `root`.
+
+    Layouts:
+        flat: root/bids/conversion_info/v*/fmri_paths.tsv and root/bids/sub-*/ses-*/{func,anat}
+            (for DefaultFlatStrategy).
+        per-subject: root/sourcedata/<Subject_ID>/conversion_info/v*/fmri_paths.tsv next to that
+            subject's sub-*/ses-* folders (for PerSubjectStrategy).
+
+    DICOM series go to root/dicom/<Subject_ID>/<Series_ID>/. Rows are spread over `n_versions`
+    conversion_info versions, with a few sessions repeated in an older version so the anchor
+    de-duplication has something to do.
+
+    Args:
+        root (str): Output folder (created if needed).
+        n_sessions (int): Number of sessions, e.g. 1_000 to 50_000.
+        n_volumes (int): Override the per-scanner number of BOLD volumes (smaller files).
+        workers (int): Processes used to write the files.
+
+    Returns:
+        dict: Paths to pass to the path strategies ("base_dir"/"bids_dir" or "subject_dirs")
+        plus "dicom_dir" and "n_sessions".
+    """
+    sessions = make_sessions(n_sessions, seed=seed)
+    sessions["session"] = "M" + sessions["VISCODE"].str.extract(r"m(\d+)", expand=False).fillna("0").str.zfill(3)
+    dicom_dir = os.path.join(root, "dicom")
+    sessions["Path"] = [
+        os.path.join(dicom_dir, s, str(series)) for s, series in zip(sessions["Subject_ID"], sessions["Series_ID"])
+    ]
+    sessions["version"] = "v" + (np.arange(n_sessions) % n_versions).astype(str)
+
+    if layout == "per-subject":
+        source_dir = os.path.join(root, "sourcedata")
+        bids_roots = [os.path.join(source_dir, s) for s in sessions["Subject_ID"]]
+        paths = {"subject_dirs": [source_dir]}
+    else:
+        bids_dir = os.path.join(root, "bids")
+        bids_roots = [bids_dir] * n_sessions
+        paths = {"base_dir": os.path.join(bids_dir, "conversion_info"), "bids_dir": bids_dir}
+    sessions["bids_root"] = bids_roots
+
+    # conversion_info TSVs; every 50th session also appears in an older version with a stale Path
+    stale = sessions.iloc[1::50]
+    stale = stale[stale["version"] != "v0"].assign(version="v0", Path=lambda d: d["Path"] + "_old")
+    tsv_rows = pd.concat([sessions, stale], ignore_index=True)
+    group_root = tsv_rows["bids_root"] if layout == "per-subject" else pd.Series(paths.get("base_dir"), index=tsv_rows.index)
+    for (base, version), rows in tsv_rows.groupby([group_root, tsv_rows["version"]]):
+        conv_dir = os.path.join(base, "conversion_info", version) if layout == "per-subject" else os.path.join(base, version)
+        os.makedirs(conv_dir, exist_ok=True)
+        rows[TSV_COLUMNS].to_csv(os.path.join(conv_dir, "fmri_paths.tsv"), sep="\t", index=False)
+
+    batches = [
+        (sessions.iloc[i:i + batch_size], dicom_dir, bids_roots[i:i + batch_size], n_slices, n_volumes)
+        for i in range(0, n_sessions, batch_size)
+    ]
+    with tqdm(total=n_sessions, desc=f"Writing {n_sessions} synthetic sessions") as bar:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for n in pool.map(_write_sessions, batches):
+                    bar.update(n)
+        else:
+            for batch in batches:
+                bar.update(_write_sessions(batch))
+
+    paths.update({"dicom_dir": dicom_dir, "n_sessions": n_sessions, "layout": layout})
+    with open(os.path.join(root, "dataset.json"), "w") as f:
+        json.dump(paths, f, indent=2)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic ADNI-like Clinica/DICOM tree for benchmarking.")
+    parser.add_argument("root", help="Output folder.")
+    parser.add_argument("--sessions", type=int, default=1000, help="Number of sessions (default: 1000).")
+    parser.add_argument("--layout", choices=["flat", "per-subject"], default="flat")
+    parser.add_argument("--slices", type=int, default=3, help="DICOM instances per series (default: 3).")
+    parser.add_argument("--volumes", type=int, help="Override BOLD volumes per run (default: per scanner profile).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to write files (default: 1).")
+    args = parser.parse_args()
+    print(json.dumps(generate_dataset(
+        args.root, n_sessions=args.sessions, layout=args.layout, n_slices=args.slices,
+        n_volumes=args.volumes, seed=args.seed, workers=args.workers
+    ), indent=2))
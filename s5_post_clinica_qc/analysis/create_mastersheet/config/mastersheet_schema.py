@@ -0,0 +1,28 @@
+# Column types for the columnar (Parquet) mastersheet written by writers/columnar.py
+
+# List-valued NIfTI header fields expanded into one numeric column per element
+# (e.g. nifti_dim -> nifti_dim0 ... nifti_dim7), with their element dtype
+list_columns = {
+    "nifti_dim": ("Int16", 8),
+    "nifti_pixdim": ("float32", 8),
+}
+
+# Low-cardinality text columns stored as categoricals
+categorical_columns = [
+    "Site",
+    "VISCODE",
+    "Visit",
+    "Sequence",
+    "source_version",
+    "dicom_Manufacturer",
+    "dicom_Modality",
+    "dicom_ProtocolName",
+    "dicom_SeriesDescription",
+    "json_Manufacturer",
+    "json_ManufacturersModelName",
+    "json_InstitutionName",
+    "json_MRAcquisitionType",
+    "json_CoilString",
+    "json_PhaseEncodingDirection",
+    "json_PhaseEncodingAxis",
+]
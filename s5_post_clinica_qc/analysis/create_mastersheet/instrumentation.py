@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import time
+import heapq
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+# Upper edges (ms) of the per-file latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000]
+
+
+class StageStats:
+    """
+    Timing, per-file latencies, slowest files and failure counts for one pipeline stage.
+
+    Parsers accept an optional `stats` object and call `record_file` once per file they read;
+    calls may come from worker threads. Per-file times measured in worker processes are passed
+    back with the result and recorded by the parent.
+    """
+
+    def __init__(self, name, slowest_n=20):
+        self.name = name
+        self.slowest_n = slowest_n
+        self.seconds = None
+        self.items = 0
+        self.latencies = []
+        self.slowest = []  # min-heap of (seconds, path)
+        self.failures = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def record_file(self, path, seconds, failure=None):
+        """Record one file read. `failure` is a short failure type (e.g. "missing_json"), if any."""
+        with self._lock:
+            self.latencies.append(seconds)
+            item = (seconds, str(path))
+            if len(self.slowest) < self.slowest_n:
+                heapq.heappush(self.slowest, item)
+            elif item > self.slowest[0]:
+                heapq.heapreplace(self.slowest, item)
+            if failure:
+                self.failures[failure] = self.failures.get(failure, 0) + 1
+
+    def record_failure(self, failure, n=1):
+        with self._lock:
+            self.failures[failure] = self.failures.get(failure, 0) + n
+
+    def count(self, counter, n=1):
+        """Increment a free-form counter, e.g. cache hits."""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def to_dict(self):
+        latencies_ms = np.asarray(self.latencies) * 1000
+        edges = LATENCY_BUCKETS_MS + [np.inf]
+        counts = np.histogram(latencies_ms, bins=[0] + edges)[0] if len(latencies_ms) else np.zeros(len(edges), int)
+        labels = [f"<{e}ms" for e in LATENCY_BUCKETS_MS] + [f">={LATENCY_BUCKETS_MS[-1]}ms"]
+        files = {"count": int(len(latencies_ms))}
+        if len(latencies_ms):
+            files.update({
+                "total_seconds": round(float(latencies_ms.sum()) / 1000, 3),
+                "mean_ms": round(float(latencies_ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+                "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+                "max_ms": round(float(latencies_ms.max()), 3),
+            })
+        files["histogram"] = dict(zip(labels, (int(c) for c in counts)))
+        return {
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "items": self.items,
+            "items_per_sec": round(self.items / self.seconds, 1) if self.seconds else None,
+            "files": files,
+            "slowest_files": [
+                {"path": path, "ms": round(seconds * 1000, 3)}
+                for seconds, path in sorted(self.slowest, reverse=True)
+            ],
+            "failures": dict(sorted(self.failures.items())),
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+class RunReport:
+    """
+    Machine-readable record of one mastersheet build.
+
+    Example usage:
+        report = RunReport()
+        with report.stage("dicom") as stats:
+            rows, failures, _ = cache.parse(anchor_df["Path"], workers=8, stats=stats)
+            stats.items = len(rows)
+        report.save("data/run_report.json")
+    """
+
+    def __init__(self, slowest_n=20, **settings):
+        self.slowest_n = slowest_n
+        self.settings = settings
+        self.stages = {}
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage `name` and yield its StageStats."""
+        stats = self.stages.setdefault(name, StageStats(name, self.slowest_n))
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds = (stats.seconds or 0) + time.perf_counter() - start
+
+    def to_dict(self):
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "total_seconds": round(time.perf_counter() - self._start, 3),
+            "argv": sys.argv,
+            "settings": self.settings,
+            "stages": {name: stats.to_dict() for name, stats in self.stages.items()},
+        }
+
+    def summary(self):
+        lines = []
+        for name, stats in self.stages.items():
+            line = f"  {name:<8} {stats.seconds or 0:8.2f}s  {stats.items} items"
+            if stats.latencies:
+                line += f", p95 {np.percentile(stats.latencies, 95) * 1000:.1f} ms/file"
+            if stats.failures:
+                line += f", {sum(stats.failures.values())} failures"
+            lines.append(line)
+        return "Stage timings:\n" + "\n".join(lines)
+
+    def save(self, path, history_path=None):
+        """
+        Write the report to `path` (replaced every run). If `history_path` is given, also append
+        it as one JSON line so runs can be compared over time.
+        """
+        report = self.to_dict()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+        if history_path:
+            with open(history_path, "a") as f:
+                f.write(json.dumps(report, default=str) + "\n")
+        return report
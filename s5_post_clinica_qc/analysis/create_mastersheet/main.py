@@ -1,86 +1,273 @@
 #%%
 from parsers.anchors import AnchorTable
-from parsers.dicom_parser import DICOMMetadata
-from parsers.nifti_parser import NiftiParser
+from parsers.dicom_cache import DICOMCache
+from parsers.nifti_cache import NiftiCache
 from parsers.structural_probe import StructuralProbe
 from config.dicom_fields import dcm_keep_fields
 from parsers.path_strategies.default_flat import DefaultFlatStrategy
 from parsers.path_strategies.per_subject import PerSubjectStrategy
-from parsers.anchors import AnchorTable
+from writers.columnar import write_parquet
+from writers.session_store import SessionStore
+from streaming import build_streaming
+from instrumentation import RunReport
 from tqdm import tqdm
 import pandas as pd
+import argparse
 import os
 #%%
 
-def main():
+# Defaults used when no paths are given on the command line
+DEFAULT_BASE_DIR = "/N/project/statadni/20250922_Saige/adni_db/bids/participants/conversion_info" # Folder containing Clinica conversion_info
+DEFAULT_BIDS_DIR = "/N/project/statadni/20250922_Saige/adni_db/bids/participants" # BIDS root folder
+
+STAGES = ["anchors", "dicom", "nifti", "struct"]
+SESSION_KEYS = ["Subject_ID", "VISCODE"]
+
+
+def build_strategy(strategy="flat", base_dir=DEFAULT_BASE_DIR, bids_dir=DEFAULT_BIDS_DIR, subject_dirs=None,
+                   output_dir="data", workers=None):
+    if strategy == "per-subject":
+        # Use subject_dirs + PerSubjectStrategy if your BIDS data is split across multiple root folders,
+        # e.g. /N/project/statadni/20231219_ADNI/sourcedata_dev_1 ... sourcedata_dev_4
+        if not subject_dirs:
+            raise ValueError("The per-subject strategy needs at least one subject directory (--subject-dirs).")
+        # Without an explicit worker count, keep PerSubjectStrategy's default (16 threads) for the folder listing
+        strategy = PerSubjectStrategy(
+            subject_dirs, modality="fmri", cache_path=os.path.join(output_dir, "per_subject_tsvs.csv"),
+            **({"workers": workers} if workers is not None else {})
+        )
+    else:
+        # Use DefaultFlatStrategy if your BIDS data is all under a single root folder
+        strategy = DefaultFlatStrategy(base_dir=base_dir, modality="fmri", bids_base_dir=bids_dir)
+    strategy.missing_report_path = os.path.join(output_dir, "missing_bids_files.csv")
+    return strategy
+
+
+def filter_sessions(df, subjects=None, since=None):
+    """Keep only rows for the given Subject_IDs and/or with Scan_Date on or after `since` (YYYY-MM-DD)."""
+    mask = pd.Series(True, index=df.index)
+    if subjects:
+        mask &= df["Subject_ID"].isin(subjects)
+    if since:
+        mask &= pd.to_datetime(df["Scan_Date"], errors="coerce") >= pd.Timestamp(since)
+    return df[mask].reset_index(drop=True)
+
+
+def write_stage(df, path, partial, merge_path=None):
+    """
+    Write a stage's output. For a partial (filtered) run, only the rows for the processed
+    sessions are replaced and every other session already in the file is kept.
+    If `path` does not exist, the existing sessions are read from `merge_path` instead
+    (the Parquet mastersheet, when earlier runs used --output-format parquet).
+    """
+    base = path if os.path.exists(path) else merge_path
+    if partial and base and os.path.exists(base):
+        existing = pd.read_parquet(base) if base.endswith(".parquet") else pd.read_csv(base)
+        keys = pd.MultiIndex.from_frame(df[SESSION_KEYS].astype(str))
+        keep = ~pd.MultiIndex.from_frame(existing[SESSION_KEYS].astype(str)).isin(keys)
+        df = pd.concat([existing[keep], df], ignore_index=True)
+    df.to_csv(path, index=False)
+    return df
+
+
+def read_stage(path, stage):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Stage '{stage}' was not selected and its output {path} does not exist yet.")
+    return pd.read_csv(path)
+
+
+def main(base_dir=DEFAULT_BASE_DIR, bids_dir=DEFAULT_BIDS_DIR, subject_dirs=None, output_dir="data",
+         strategy="flat", stages=STAGES, subjects=None, since=None, workers=None, output_format="csv",
+         stream=False, chunk_size=250):
+    stages = set(stages)
+    listing_workers, workers = workers, workers or 1  # header reads are serial unless --workers is given
+    partial = bool(subjects or since)
+    os.makedirs(output_dir, exist_ok=True)
+    out = lambda name: os.path.join(output_dir, name)
+    # Wall time, per-file latencies, slowest files and failure counts per stage -> data/run_report.json
+    report = RunReport(
+        strategy=strategy, stages=[s for s in STAGES if s in stages], subjects=len(subjects or []), since=since,
+        workers=workers, output_format=output_format, stream=stream, chunk_size=chunk_size
+    )
+
     #%% Load anchors that allow us to join dfs from NIFTI and DICOM header data
+    if "anchors" in stages:
+        with report.stage("anchors") as stats:
+            path_strategy = build_strategy(strategy, base_dir, bids_dir, subject_dirs, output_dir, listing_workers)
+            anchors = AnchorTable(
+                strategy=path_strategy, cache_path=out("anchor_df.csv"), hash_path=out("anchor_hash.txt"),
+                fingerprint_path=out("anchor_fingerprints.csv")
+            )
+            anchor_df = anchors.get_df()
+            anchor_diff = anchors.diff()
+            stats.items = len(anchor_df)
+            for change in ("added", "removed", "changed"):
+                stats.count(f"sessions_{change}", len(anchor_diff[change]))
+        print(
+            f"Anchor changes since last run: {len(anchor_diff['added'])} added, "
+            f"{len(anchor_diff['removed'])} removed, {len(anchor_diff['changed'])} changed."
+        )
+    elif "dicom" in stages or stream:
+        anchor_df = read_stage(out("anchor_df.csv"), "anchors")
+    else:
+        anchor_df = None  # not needed by the selected stages
+
+    if partial and anchor_df is not None:
+        anchor_df = filter_sessions(anchor_df, subjects, since)
+        print(f"Processing {len(anchor_df)} sessions matching --subjects/--since.")
+
+    if stream:
+        #%% Streaming mode: sessions flow through all stages in fixed-size chunks written to data/chunks/
+        # The DICOM/NIfTI caches are shared with normal runs, so rebuilt chunks only re-read changed files
+        dicom_cache = DICOMCache(out("dicom_cache.json"), keep_fields=dcm_keep_fields)
+        nifti_cache = NiftiCache(out("nifti_cache.json"))
+        with SessionStore(out("mastersheet.sqlite")) as store:
+            build_streaming(
+                anchor_df, chunk_dir=out("chunks"), output_path=out("anchor_plus_dicom_nifti_struct.csv"),
+                runs_output_path=out("structural_runs.csv"), chunk_size=chunk_size, workers=workers,
+                on_chunk=store.upsert, report=report, dicom_cache=dicom_cache, nifti_cache=nifti_cache
+            )
+            store.prune(anchor_df)
+        dicom_cache.evict_missing(anchor_df["Path"])
+        dicom_cache.save()
+        nifti_cache.evict_missing(anchor_df["NIfTI_path"])
+        nifti_cache.save()
+
+        if output_format in ("parquet", "both"):
+            with report.stage("write") as stats:
+                # Parquet needs the whole table; it is read back from the combined CSV once
+                full_df = pd.read_csv(out("anchor_plus_dicom_nifti_struct.csv"))
+                write_parquet(full_df, out("anchor_plus_dicom_nifti_struct.parquet"))
+                stats.items = len(full_df)
+        if output_format not in ("csv", "both"):
+            os.remove(out("anchor_plus_dicom_nifti_struct.csv"))
+        save_report(report, out)
+        return
 
-    # Use subject_dirs + PerSubjectStrategy if your BIDS data is split across multiple root folders
-    #subject_dirs = [
-    #    "/N/project/statadni/20231219_ADNI/sourcedata_dev_1",
-    #    "/N/project/statadni/20231219_ADNI/sourcedata_dev_2",
-    #    "/N/project/statadni/20231219_ADNI/sourcedata_dev_3",
-    #    "/N/project/statadni/20231219_ADNI/sourcedata_dev_4"
-    #]   
-    #strategy = PerSubjectStrategy(subject_dirs, modality="fmri")
-
-    # Use DefaultFlatStrategy if your BIDS data is all under a single root folder
-    strategy = DefaultFlatStrategy(
-         base_dir="/N/project/statadni/20250922_Saige/adni_db/bids/participants/conversion_info", # Point to folder containing Clinica conversion_info
-         modality="fmri",
-         bids_base_dir="/N/project/statadni/20250922_Saige/adni_db/bids/participants" # Point to BIDS root folder
-        
-     )
-
-    anchors = AnchorTable(strategy=strategy)
-    anchor_df = anchors.get_df()
-    
     #%% Load DICOM header data into a dataframe using paths from our Anchors
-    dicom_df = None
-    if anchors.hash_has_changed() or not os.path.exists("data/anchor_plus_dicom.csv"):
-        dicom_objects = []
-        for row in tqdm(anchor_df.itertuples(), total=len(anchor_df), desc="Parsing DICOMs"):
-            try:
-                dicom_path = row.Path
-                dicom_meta = DICOMMetadata(dicom_path)
-                meta_dict = dicom_meta.to_dict()
-                trimmed = {k: meta_dict[k] for k in dcm_keep_fields if k in meta_dict}
-                dicom_objects.append(trimmed)
-            except Exception as e:
-                tqdm.write(f"Failed to parse DICOM (this row will not contain DICOM information) - {e}")
-
-        dicom_df = pd.DataFrame(dicom_objects)
-        merged_df = pd.concat([anchor_df.reset_index(drop=True), dicom_df.reset_index(drop=True)], axis=1)
-        merged_df.to_csv("data/anchor_plus_dicom.csv", index=False)
+    if "dicom" in stages:
+        with report.stage("dicom") as stats:
+            # Only series that are new or whose first DICOM file changed are parsed; the rest come from the cache
+            dicom_cache = DICOMCache(out("dicom_cache.json"), keep_fields=dcm_keep_fields)
+            dicom_objects, dicom_failures, n_parsed = dicom_cache.parse(anchor_df["Path"], workers=workers, stats=stats)
+            for i, dicom_path, error in dicom_failures:
+                tqdm.write(f"Failed to parse DICOM (this row will not contain DICOM information) {dicom_path} - {error}")
+            if dicom_failures:
+                print(f"{len(dicom_failures)} of {len(anchor_df)} DICOM series failed to parse.")
+            if not partial:
+                dicom_cache.evict_missing(anchor_df["Path"])
+            dicom_cache.save()
+
+            dicom_df = pd.DataFrame(dicom_objects)
+            merged_df = pd.concat([anchor_df.reset_index(drop=True), dicom_df.reset_index(drop=True)], axis=1)
+            write_stage(merged_df, out("anchor_plus_dicom.csv"), partial)
+            stats.items = len(merged_df)
         print("Merged DICOM with anchor and saved.")
-    else:
-        print("Anchor table unchanged. Skipping DICOM parsing.")
-        merged_df = pd.read_csv("data/anchor_plus_dicom.csv")
+    elif "nifti" in stages:
+        merged_df = filter_sessions(read_stage(out("anchor_plus_dicom.csv"), "dicom"), subjects, since)
 
     #%% Load NIfTI + JSONs header data into a dataframe using paths from our Anchors and combine.
-    nifti_objects = []
-    for row in tqdm(merged_df.itertuples(), total=len(merged_df), desc="Parsing NIfTI + JSON"):
-        try:
-            parser = NiftiParser(row.NIfTI_path, row.JSON_path)
-            parsed_meta = parser.parse()
-            nifti_objects.append(parsed_meta)
-        except Exception as e:
-            tqdm.write(f"Failed to parse NIfTI/JSON for (this row will not contain NIFTI/JSON information) {row.Subject_ID}, {row.VISCODE} — {e}")
-            nifti_objects.append({})  # keep row count aligned
-
-    nifti_df = pd.DataFrame(nifti_objects)
-    final_df = pd.concat([merged_df.reset_index(drop=True), nifti_df.reset_index(drop=True)], axis=1)
-    # In the future add hash checking to avoid re-parsing
-    # final_df.to_csv("data/anchor_plus_dicom_nifti.csv", index=False)
-    # print(f"Final merged DataFrame saved with {final_df.shape[0]} rows and {final_df.shape[1]} columns.")
+    if "nifti" in stages:
+        with report.stage("nifti") as stats:
+            # Only sessions whose NIfTI or JSON changed since the last build are re-parsed
+            nifti_cache = NiftiCache(out("nifti_cache.json"))
+            nifti_objects, _ = nifti_cache.parse(merged_df["NIfTI_path"], merged_df["JSON_path"], stats=stats)
+            if not partial:
+                nifti_cache.evict_missing(merged_df["NIfTI_path"])
+            nifti_cache.save()
+
+            nifti_df = pd.DataFrame(nifti_objects)
+            final_df = pd.concat([merged_df.reset_index(drop=True), nifti_df.reset_index(drop=True)], axis=1)
+            write_stage(final_df, out("anchor_plus_dicom_nifti.csv"), partial)
+            stats.items = len(final_df)
+        print(f"NIfTI/JSON merged DataFrame saved with {final_df.shape[0]} rows and {final_df.shape[1]} columns.")
+    elif "struct" in stages:
+        final_df = filter_sessions(read_stage(out("anchor_plus_dicom_nifti.csv"), "nifti"), subjects, since)
+
+    if "struct" not in stages:
+        save_report(report, out)
+        return
 
     #%% Feature Addition: Extract structural MRI metrics via StructuralProbe
-    probe = StructuralProbe(modalities=["T1w", "FLAIR"], folders=["anat"]) # Adjust modalities as needed, e.g., remove "FLAIR" if only using T1w
-    struct_df = probe.run(final_df)
-    final_df = pd.concat([final_df.reset_index(drop=True), struct_df.reset_index(drop=True)], axis=1)
-    final_df.to_csv("data/anchor_plus_dicom_nifti_struct.csv", index=False)
-    print(f"Structural probe complete. Final dataset saved with {final_df.shape[0]} rows and {final_df.shape[1]} columns.")
+    with report.stage("struct") as stats:
+        probe = StructuralProbe(modalities=["T1w", "FLAIR"], folders=["anat"], workers=workers, stats=stats) # Adjust modalities as needed, e.g., remove "FLAIR" if only using T1w
+        struct_df = probe.run(final_df)
+        write_stage(probe.runs_df, out("structural_runs.csv"), partial)  # one row per structural run (run-01, run-02, ...)
+        final_df = pd.concat([final_df.reset_index(drop=True), struct_df.reset_index(drop=True)], axis=1)
+        stats.items = len(final_df)
+
+    with report.stage("write") as stats:
+        full_df = write_stage(final_df, out("anchor_plus_dicom_nifti_struct.csv"), partial,
+                              merge_path=out("anchor_plus_dicom_nifti_struct.parquet"))
+        if output_format not in ("csv", "both"):
+            os.remove(out("anchor_plus_dicom_nifti_struct.csv"))
+        if output_format in ("parquet", "both"):
+            # Typed columns: nifti_dim0..7 / nifti_pixdim0..7 as numbers, categoricals for Manufacturer, Site, ...
+            write_parquet(full_df, out("anchor_plus_dicom_nifti_struct.parquet"))
+        print(f"Structural probe complete. Final dataset saved with {full_df.shape[0]} rows and {full_df.shape[1]} columns.")
+
+        #%% Upsert per-session rows into the indexed SQLite store used for lookups and filtered reads
+        with SessionStore(out("mastersheet.sqlite")) as store:
+            store.upsert(final_df)
+            n_pruned = 0 if partial else store.prune(final_df)
+        stats.items = len(full_df)
+    print(f"Session store updated: {len(final_df)} sessions upserted, {n_pruned} removed.")
+    save_report(report, out)
+
+
+def save_report(report, out):
+    """Write data/run_report.json (latest run) and append it to data/run_history.jsonl."""
+    report.save(out("run_report.json"), history_path=out("run_history.jsonl"))
+    print(report.summary())
+    print(f"Run report saved to {out('run_report.json')}")
+
+
+def _parse_subjects(value):
+    """Comma-separated Subject_IDs, or a path to a text file with one Subject_ID per line."""
+    if os.path.isfile(value):
+        with open(value, "r") as f:
+            return [line.strip() for line in f if line.strip()]
+    return [s.strip() for s in value.split(",") if s.strip()]
+
+
+def _parse_stages(value):
+    stages = [s.strip() for s in value.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown stage(s) {unknown}; choose from {','.join(STAGES)}.")
+    return stages
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the ADNI mastersheet from Clinica anchors, DICOM and NIfTI headers.")
+    parser.add_argument("--strategy", choices=["flat", "per-subject"], default="flat",
+                        help="flat: one BIDS root + conversion_info folder; per-subject: per-subject Clinica runs.")
+    parser.add_argument("--base-dir", default=DEFAULT_BASE_DIR, help="Clinica conversion_info folder (flat strategy).")
+    parser.add_argument("--bids-dir", default=DEFAULT_BIDS_DIR, help="BIDS root folder (flat strategy).")
+    parser.add_argument("--subject-dirs", nargs="+", help="Source roots holding per-subject Clinica output (per-subject strategy).")
+    parser.add_argument("--output-dir", default="data", help="Where CSVs, caches and the session store are written (default: data).")
+    parser.add_argument("--stages", type=_parse_stages, default=STAGES,
+                        help="Comma-separated stages to run, from anchors,dicom,nifti,struct (default: all). "
+                             "Skipped stages are read from their previous output in --output-dir.")
+    parser.add_argument("--subjects", type=_parse_subjects,
+                        help="Only (re)process these Subject_IDs: comma-separated or a file with one per line.")
+    parser.add_argument("--since", help="Only (re)process sessions with Scan_Date on or after this date (YYYY-MM-DD).")
+    parser.add_argument("--workers", type=int,
+                        help="Parallel workers for DICOM and structural header reads (default: 1, serial) and for "
+                             "listing subject folders with --strategy per-subject (default: 16).")
+    parser.add_argument("--output-format", choices=["csv", "parquet", "both"], default="csv",
+                        help="Format of the final mastersheet; parquet stores typed numeric/categorical columns.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Build in fixed-size chunks with bounded memory; finished chunks survive a crash and are reused.")
+    parser.add_argument("--chunk-size", type=int, default=250, help="Sessions per chunk in --stream mode (default: 250).")
+    args = parser.parse_args()
+    if args.stream and set(args.stages) != set(STAGES):
+        parser.error("--stream runs every stage; it cannot be combined with --stages.")
+    if args.stream and (args.subjects or args.since):
+        parser.error("--stream rebuilds the whole mastersheet; it cannot be combined with --subjects/--since.")
+
+    main(
+        base_dir=args.base_dir, bids_dir=args.bids_dir, subject_dirs=args.subject_dirs, output_dir=args.output_dir,
+        strategy=args.strategy, stages=args.stages, subjects=args.subjects, since=args.since, workers=args.workers,
+        output_format=args.output_format, stream=args.stream, chunk_size=args.chunk_size
+    )
@@ -6,14 +6,45 @@ from parsers.path_strategies.base import PathStrategy
 from parsers.path_strategies.default_flat import DefaultFlatStrategy
 
 class AnchorTable:
-    def __init__(self, strategy, cache_path="data/anchor_df.csv", hash_path="data/anchor_hash.txt"):
+    # One anchor row per session; the fingerprint changes when any of these values change
+    KEY_COLUMNS = ["Subject_ID", "VISCODE"]
+    FINGERPRINT_COLUMNS = ["Subject_ID", "VISCODE", "Path", "source_version"]
+
+    def __init__(self, strategy, cache_path="data/anchor_df.csv", hash_path="data/anchor_hash.txt",
+                 fingerprint_path="data/anchor_fingerprints.csv"):
         self.path_strategy = strategy
         self.cache_path = cache_path
         self.hash_path = hash_path
+        self.fingerprint_path = fingerprint_path
+        # Read the previous run's state before _load_and_process overwrites it
+        self.previous_hash = self._read_previous_hash()
+        self.previous_fingerprints = self._read_previous_fingerprints()
         self.df = self._load_and_process()
+        self.fingerprints = self._calculate_fingerprints(self.df)
+        self._hash = self._calculate_hash(self.fingerprints)
+        self._save_state()
+
+    def _read_previous_hash(self):
+        if not os.path.exists(self.hash_path):
+            return None
+        with open(self.hash_path, "r") as f:
+            return f.read().strip()
 
-    def _calculate_hash(self, df):
-        content = df.to_csv(index=False).encode('utf-8')
+    def _read_previous_fingerprints(self):
+        if not os.path.exists(self.fingerprint_path):
+            return None
+        return pd.read_csv(self.fingerprint_path, dtype=str, keep_default_na=False)
+
+    def _calculate_fingerprints(self, df):
+        """Stable per-row fingerprint over FINGERPRINT_COLUMNS (hex of a 64-bit pandas hash)."""
+        hashed = pd.util.hash_pandas_object(df[self.FINGERPRINT_COLUMNS].astype(str), index=False)
+        out = df[self.KEY_COLUMNS].astype(str).reset_index(drop=True)
+        out["fingerprint"] = [f"{h:016x}" for h in hashed.to_numpy()]
+        return out
+
+    def _calculate_hash(self, fingerprints):
+        # Order-independent: sort the per-row fingerprints and hash them, no CSV round-trip
+        content = "\n".join(sorted(fingerprints["fingerprint"])).encode("utf-8")
         return hashlib.md5(content).hexdigest()
 
     def _load_and_process(self):
@@ -32,20 +63,46 @@ class AnchorTable:
 
         os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
         df.to_csv(self.cache_path, index=False)
-        with open(self.hash_path, "w") as f:
-            f.write(self._calculate_hash(df))
 
         print(f"Anchor table saved to {self.cache_path}")
         return df
 
+    def _save_state(self):
+        with open(self.hash_path, "w") as f:
+            f.write(self._hash)
+        self.fingerprints.to_csv(self.fingerprint_path, index=False)
+
     def get_df(self):
         return self.df
 
     def get_hash(self):
-        return self._calculate_hash(self.df)
+        return self._hash
 
     def hash_has_changed(self):
-        if not os.path.exists(self.hash_path):
-            return True
-        with open(self.hash_path, "r") as f:
-            return f.read().strip() != self.get_hash()
\ No newline at end of file
+        """True if the anchor rows differ from the previous run (or there was no previous run)."""
+        return self.previous_hash != self._hash
+
+    def diff(self):
+        """
+        Compare this run's anchor rows to the previous run's, by (Subject_ID, VISCODE).
+
+        Returns:
+            dict: {"added": df, "removed": df, "changed": df}, each holding the KEY_COLUMNS of the
+            affected sessions. With no previous fingerprints, every row counts as added.
+        """
+        current = self.fingerprints
+        empty = current.iloc[0:0][self.KEY_COLUMNS]
+        if self.previous_fingerprints is None:
+            return {"added": current[self.KEY_COLUMNS], "removed": empty, "changed": empty}
+
+        merged = current.merge(
+            self.previous_fingerprints, on=self.KEY_COLUMNS, how="outer",
+            suffixes=("", "_previous"), indicator=True
+        )
+        both = merged["_merge"] == "both"
+        return {
+            "added": merged.loc[merged["_merge"] == "left_only", self.KEY_COLUMNS].reset_index(drop=True),
+            "removed": merged.loc[merged["_merge"] == "right_only", self.KEY_COLUMNS].reset_index(drop=True),
+            "changed": merged.loc[both & (merged["fingerprint"] != merged["fingerprint_previous"]),
+                                  self.KEY_COLUMNS].reset_index(drop=True),
+        }
@@ -0,0 +1,89 @@
+from pydicom.multival import MultiValue
+from parsers.dicom_parser import find_first_dicom_file, parse_dicom_dirs
+from parsers.file_cache import JSONFileCache, file_fingerprint
+
+
+def _to_jsonable(value):
+    """Convert pydicom values (MultiValue, DSfloat, PersonName, ...) to plain JSON types."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="ignore")
+    if isinstance(value, (list, tuple, MultiValue)):
+        return [_to_jsonable(v) for v in value]
+    return str(value)
+
+
+class DICOMCache(JSONFileCache):
+    """
+    Persistent per-series cache of trimmed DICOM header dicts.
+
+    Each entry is keyed on the series directory and validated against the first file in it
+    (path, size, mtime). On a rerun only new or changed series are parsed; every other row
+    is served from the cache. Entries for series no longer present in the anchors are evicted.
+
+    Example usage:
+        cache = DICOMCache("data/dicom_cache.json", keep_fields=dcm_keep_fields)
+        rows, failures, n_parsed = cache.parse(anchor_df["Path"], workers=8)
+        cache.evict_missing(anchor_df["Path"])
+        cache.save()
+    """
+
+    def __init__(self, cache_path="data/dicom_cache.json", keep_fields=()):
+        self.keep_fields = list(keep_fields)
+        # A different field selection invalidates every entry
+        super().__init__(cache_path, schema=self.keep_fields)
+
+    @staticmethod
+    def _fingerprint(dicom_dir):
+        """[first-file path, size, mtime_ns] for a series directory, or None if it cannot be stat'ed."""
+        try:
+            first = find_first_dicom_file(dicom_dir)
+        except OSError:
+            return None
+        fp = file_fingerprint(first)
+        return [first] + fp if fp is not None else None
+
+    def parse(self, dicom_dirs, workers=1, executor="process", stats=None, progress=True):
+        """
+        Return DICOM dicts for `dicom_dirs`, parsing only series that are new or changed.
+        `stats` (StageStats, optional) receives per-series read times and cache hit/miss counts.
+        `progress=False` hides the progress bar and the hit/miss summary (e.g. per streaming chunk).
+
+        Returns:
+            (list, list, int): One dict per input directory in input order, the
+            (index, dicom_dir, error) failures from parse_dicom_dirs, and the number of series parsed.
+        """
+        dicom_dirs = list(dicom_dirs)
+        rows = [None] * len(dicom_dirs)
+        misses, fingerprints = [], {}
+
+        for i, d in enumerate(dicom_dirs):
+            fp = self._fingerprint(d)
+            rows[i] = self.lookup(d, fp)
+            if rows[i] is None:
+                misses.append(i)
+                fingerprints[d] = fp
+
+        if progress:
+            print(f"DICOM cache: {len(dicom_dirs) - len(misses)} cached, {len(misses)} to parse.")
+        if stats is not None:
+            stats.count("cache_hits", len(dicom_dirs) - len(misses))
+            stats.count("cache_misses", len(misses))
+        failures = []
+        if misses:
+            parsed, miss_failures = parse_dicom_dirs(
+                [dicom_dirs[i] for i in misses], self.keep_fields, workers=workers, executor=executor,
+                progress=progress, stats=stats
+            )
+            failed = {j for j, _, _ in miss_failures}
+            for j, (i, row) in enumerate(zip(misses, parsed)):
+                row = {k: _to_jsonable(v) for k, v in row.items()}
+                rows[i] = row
+                d = dicom_dirs[i]
+                # Failed or empty reads are not cached so they are retried on the next run
+                if j not in failed and row and fingerprints[d] is not None:
+                    self.store(d, fingerprints[d], row)
+            failures = [(misses[j], d, error) for j, d, error in miss_failures]
+
+        return rows, failures, len(misses)
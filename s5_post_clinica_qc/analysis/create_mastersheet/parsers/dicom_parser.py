@@ -1,28 +1,48 @@
 import os
+import time
 import pydicom
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from tqdm import tqdm
 
 # Suppress pydicom UserWarnings about invalid VR UI values
 warnings.filterwarnings("ignore", category=UserWarning, module="pydicom")
 
+def find_first_dicom_file(dicom_dir):
+    """Return the first regular file in a series directory (the one whose header is read)."""
+    for file in os.listdir(dicom_dir):
+        full_path = os.path.join(dicom_dir, file)
+        if os.path.isfile(full_path):
+            return full_path
+    raise FileNotFoundError(f"No DICOM file found in directory: {dicom_dir}")
+
+
 class DICOMMetadata:
-    def __init__(self, dicom_dir):
+    def __init__(self, dicom_dir, keywords=None):
+        """
+        Args:
+            dicom_dir (str): Series directory; the first file found is read.
+            keywords (list): Optional DICOM keywords (e.g. "RepetitionTime") to read. When given,
+                only these elements are parsed and large values are deferred; otherwise the whole
+                header is loaded.
+        """
         self.dir = dicom_dir
+        self.keywords = list(keywords) if keywords else None
         self.path = self._find_dicom_file(dicom_dir)
         self.metadata = {}
+        self.error = None  # exception class name if the header could not be read
         self._load()
 
     def _find_dicom_file(self, dicom_dir):
-        for file in os.listdir(dicom_dir):
-            full_path = os.path.join(dicom_dir, file)
-            if os.path.isfile(full_path):
-                return full_path
-        raise FileNotFoundError(f"No DICOM file found in directory: {dicom_dir}")
+        return find_first_dicom_file(dicom_dir)
 
     def _load(self):
         try:
-            ds = pydicom.dcmread(self.path, stop_before_pixels=True)
+            read_kwargs = {"stop_before_pixels": True}
+            if self.keywords:
+                read_kwargs["specific_tags"] = self.keywords
+                read_kwargs["defer_size"] = "1 KB"
+            ds = pydicom.dcmread(self.path, **read_kwargs)
             self.metadata = {
                 elem.keyword: elem.value
                 for elem in ds
@@ -31,9 +51,81 @@ class DICOMMetadata:
         except Exception as e:
             tqdm.write(f"Failed to read DICOM at {self.path}: {e}")
             self.metadata = {}
+            self.error = type(e).__name__
 
     def get(self, key, default=None):
         return self.metadata.get(key, default)
 
     def to_dict(self):
-        return {"dicom_" + k: v for k, v in self.metadata.items()}
\ No newline at end of file
+        return {"dicom_" + k: v for k, v in self.metadata.items()}
+
+
+def keep_fields_to_keywords(keep_fields):
+    """Map "dicom_*" column names (see config/dicom_fields.py) to the DICOM keywords they come from."""
+    return [k[len("dicom_"):] for k in keep_fields if k.startswith("dicom_") and k != "dicom_path"]
+
+
+def _parse_dicom_dir(dicom_dir, keep_fields, selective=True):
+    """
+    Parse one series directory into a trimmed dict.
+
+    Returns:
+        (dict, str, str, float): The dict, an error message or None, a failure type (exception
+        class name) or None, and the seconds spent. An unreadable header yields {} with a failure
+        type but no error message, as before.
+    """
+    start = time.perf_counter()
+    try:
+        keywords = keep_fields_to_keywords(keep_fields) if selective else None
+        meta = DICOMMetadata(dicom_dir, keywords=keywords)
+        meta_dict = meta.to_dict()
+        row = {k: meta_dict[k] for k in keep_fields if k in meta_dict}
+        return row, None, meta.error, time.perf_counter() - start
+    except Exception as e:
+        return {}, str(e), type(e).__name__, time.perf_counter() - start
+
+
+def parse_dicom_dirs(dicom_dirs, keep_fields, workers=1, executor="process", selective=True, progress=True,
+                     stats=None):
+    """
+    Parse the DICOM header of every series directory in `dicom_dirs`.
+
+    Args:
+        dicom_dirs (list): Series directories, one per anchor row.
+        keep_fields (list): "dicom_*" keys to keep from each header.
+        workers (int): Number of parallel workers. 1 parses serially in this process.
+        executor (str): "process" or "thread" pool when workers > 1.
+        selective (bool): Only read the elements named in `keep_fields` instead of the full header.
+        progress (bool): Show a tqdm progress bar.
+        stats (StageStats): Optional; receives the read time and failure type of every series.
+
+    Returns:
+        (list, list): One dict per input directory, in input order ({} for failed rows),
+        and a list of (index, dicom_dir, error) tuples for the rows that failed.
+    """
+    dicom_dirs = list(dicom_dirs)
+    progress = dict(total=len(dicom_dirs), desc="Parsing DICOMs", disable=not progress)
+
+    if workers <= 1:
+        results = [_parse_dicom_dir(d, keep_fields, selective) for d in tqdm(dicom_dirs, **progress)]
+    else:
+        pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        chunksize = max(1, len(dicom_dirs) // (workers * 16)) if executor == "process" else 1
+        with pool_cls(max_workers=workers) as pool:
+            # map() yields results in submission order, so rows stay aligned with the anchors
+            results = list(tqdm(
+                pool.map(
+                    _parse_dicom_dir, dicom_dirs, [keep_fields] * len(dicom_dirs), [selective] * len(dicom_dirs),
+                    chunksize=chunksize
+                ),
+                **progress
+            ))
+
+    rows, failures = [], []
+    for i, (d, (row, error, failure, seconds)) in enumerate(zip(dicom_dirs, results)):
+        rows.append(row)
+        if stats is not None:
+            stats.record_file(d, seconds, failure)
+        if error is not None:
+            failures.append((i, d, error))
+    return rows, failures
@@ -0,0 +1,73 @@
+import os
+import json
+import hashlib
+from tqdm import tqdm
+
+
+def file_fingerprint(path):
+    """[size, mtime_ns] of a file, or None if it does not exist / cannot be stat'ed."""
+    try:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    except (OSError, TypeError):
+        return None
+
+
+class JSONFileCache:
+    """
+    Persistent JSON cache of parsed rows, keyed on a source path and validated by a file fingerprint.
+
+    Entries look like {"key": <fingerprint>, "row": <dict>}. `schema` is anything that changes
+    what a row contains (e.g. the list of kept fields); a different schema invalidates the file.
+    Subclasses implement the lookup/parse logic for their stage.
+    """
+
+    def __init__(self, cache_path, schema=()):
+        self.cache_path = cache_path
+        self.schema_hash = hashlib.md5(json.dumps(list(schema)).encode("utf-8")).hexdigest()
+        self.entries = self._read()
+        self.dirty = False
+
+    def _read(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r") as f:
+                cached = json.load(f)
+        except Exception as e:
+            tqdm.write(f"[WARNING] Ignoring unreadable cache {self.cache_path}: {e}")
+            return {}
+        if cached.get("schema_hash") != self.schema_hash:
+            return {}
+        return cached.get("entries", {})
+
+    def lookup(self, source, key):
+        """Return the cached row for `source` if its stored key matches `key`, else None."""
+        entry = self.entries.get(source)
+        if key is not None and entry is not None and entry["key"] == key:
+            return entry["row"]
+        return None
+
+    def store(self, source, key, row):
+        self.entries[source] = {"key": key, "row": row}
+        self.dirty = True
+
+    def evict_missing(self, sources):
+        """Drop entries whose source is not in `sources`. Returns the number evicted."""
+        keep = set(sources)
+        stale = [s for s in self.entries if s not in keep]
+        for s in stale:
+            del self.entries[s]
+        if stale:
+            self.dirty = True
+        return len(stale)
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"schema_hash": self.schema_hash, "entries": self.entries}, f)
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
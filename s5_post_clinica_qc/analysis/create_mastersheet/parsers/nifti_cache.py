@@ -0,0 +1,61 @@
+from tqdm import tqdm
+from parsers.nifti_parser import parse_nifti_pair
+from parsers.file_cache import JSONFileCache, file_fingerprint
+
+# NiftiParser failures that leave a partial row behind for files that do exist
+READ_ERRORS = {"nifti_read_error", "json_read_error"}
+
+
+class NiftiCache(JSONFileCache):
+    """
+    Persistent per-session cache of parsed NIfTI header + JSON sidecar dicts.
+
+    Entries are keyed on the NIfTI path and validated against the size and mtime of both the
+    NIfTI and its JSON sidecar, so only sessions whose files changed (or appeared) are re-parsed.
+
+    Example usage:
+        cache = NiftiCache("data/nifti_cache.json")
+        rows, n_parsed = cache.parse(df["NIfTI_path"], df["JSON_path"])
+        cache.evict_missing(df["NIfTI_path"])
+        cache.save()
+    """
+
+    # Bump when NiftiParser changes what it emits so old entries are discarded
+    SCHEMA = ["NiftiParser", "header_only", 1]
+
+    def __init__(self, cache_path="data/nifti_cache.json"):
+        super().__init__(cache_path, schema=self.SCHEMA)
+
+    @staticmethod
+    def _fingerprint(nifti_path, json_path):
+        return [json_path, file_fingerprint(nifti_path), file_fingerprint(json_path)]
+
+    def parse(self, nifti_paths, json_paths, stats=None, progress=True):
+        """
+        Return one parsed dict per (NIfTI, JSON) pair in input order, parsing only changed sessions.
+        `stats` (StageStats, optional) receives per-pair read times and cache hit/miss counts.
+        `progress=False` hides the progress bar and the hit/miss summary (e.g. per streaming chunk).
+
+        Returns:
+            (list, int): The dicts ({} for rows that could not be parsed) and the number parsed.
+        """
+        pairs = list(zip(nifti_paths, json_paths))
+        rows, n_parsed = [], 0
+
+        for nifti_path, json_path in tqdm(pairs, total=len(pairs), desc="Parsing NIfTI + JSON", disable=not progress):
+            key = self._fingerprint(nifti_path, json_path)
+            row = self.lookup(nifti_path, key)
+            if row is None:
+                row, ok, failures = parse_nifti_pair(nifti_path, json_path, stats=stats)
+                # Read errors (e.g. transient I/O failures) are not cached so they are retried on the next run
+                if ok and not set(failures) & READ_ERRORS:
+                    self.store(nifti_path, key, row)
+                n_parsed += 1
+            rows.append(row)
+
+        if progress:
+            print(f"NIfTI cache: {len(pairs) - n_parsed} cached, {n_parsed} parsed.")
+        if stats is not None:
+            stats.count("cache_hits", len(pairs) - n_parsed)
+            stats.count("cache_misses", n_parsed)
+        return rows, n_parsed
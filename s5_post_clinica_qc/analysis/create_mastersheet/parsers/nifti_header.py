@@ -0,0 +1,108 @@
+import zlib
+import numpy as np
+
+# NIfTI-1 header layout (348 bytes), field names as exposed by nibabel's Nifti1Header
+NIFTI1_HEADER_DTYPE = np.dtype([
+    ("sizeof_hdr", "i4"),
+    ("data_type", "S10"),
+    ("db_name", "S18"),
+    ("extents", "i4"),
+    ("session_error", "i2"),
+    ("regular", "S1"),
+    ("dim_info", "u1"),
+    ("dim", "i2", (8,)),
+    ("intent_p1", "f4"),
+    ("intent_p2", "f4"),
+    ("intent_p3", "f4"),
+    ("intent_code", "i2"),
+    ("datatype", "i2"),
+    ("bitpix", "i2"),
+    ("slice_start", "i2"),
+    ("pixdim", "f4", (8,)),
+    ("vox_offset", "f4"),
+    ("scl_slope", "f4"),
+    ("scl_inter", "f4"),
+    ("slice_end", "i2"),
+    ("slice_code", "u1"),
+    ("xyzt_units", "u1"),
+    ("cal_max", "f4"),
+    ("cal_min", "f4"),
+    ("slice_duration", "f4"),
+    ("toffset", "f4"),
+    ("glmax", "i4"),
+    ("glmin", "i4"),
+    ("descrip", "S80"),
+    ("aux_file", "S24"),
+    ("qform_code", "i2"),
+    ("sform_code", "i2"),
+    ("quatern_b", "f4"),
+    ("quatern_c", "f4"),
+    ("quatern_d", "f4"),
+    ("qoffset_x", "f4"),
+    ("qoffset_y", "f4"),
+    ("qoffset_z", "f4"),
+    ("srow_x", "f4", (4,)),
+    ("srow_y", "f4", (4,)),
+    ("srow_z", "f4", (4,)),
+    ("intent_name", "S16"),
+    ("magic", "S4"),
+])
+NIFTI1_HEADER_SIZE = NIFTI1_HEADER_DTYPE.itemsize  # 348
+NIFTI1_MAGICS = (b"n+1", b"ni1")  # single file / .hdr+.img pair; Analyze 7.5 has neither
+
+_CHUNK_SIZE = 4096
+
+
+def _read_prefix(path, n_bytes):
+    """Return the first `n_bytes` of a .nii or .nii.gz file, decompressing only as much as needed."""
+    with open(path, "rb") as f:
+        if not path.endswith(".gz"):
+            return f.read(n_bytes)
+        decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)  # gzip container
+        out = b""
+        while len(out) < n_bytes:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            out += decomp.decompress(chunk, n_bytes - len(out))
+            # Feed back any compressed input held back by max_length
+            while decomp.unconsumed_tail and len(out) < n_bytes:
+                out += decomp.decompress(decomp.unconsumed_tail, n_bytes - len(out))
+        return out
+
+
+def read_nifti_header(path):
+    """
+    Read a NIfTI-1 header without touching the image data.
+
+    Only the first 348 decompressed bytes are read and parsed with a fixed NumPy dtype, so
+    this is much cheaper than nib.load on large 4D .nii.gz files.
+
+    Returns:
+        dict: Header field -> Python value, with the same keys as `dict(nib.load(path).header)`.
+        Strings are decoded and arrays converted with `.tolist()`. Unlike nibabel, vox_offset,
+        scl_slope and scl_inter are the values stored on disk (nibabel resets them after load).
+
+    Raises:
+        ValueError: If the file is truncated or is not a NIfTI-1 file (e.g. NIfTI-2 or Analyze 7.5).
+    """
+    raw = _read_prefix(path, NIFTI1_HEADER_SIZE)
+    if len(raw) < NIFTI1_HEADER_SIZE:
+        raise ValueError(f"Truncated NIfTI header ({len(raw)} bytes): {path}")
+
+    hdr = np.frombuffer(raw, dtype=NIFTI1_HEADER_DTYPE.newbyteorder("<"), count=1)[0]
+    if hdr["sizeof_hdr"] != NIFTI1_HEADER_SIZE:
+        hdr = np.frombuffer(raw, dtype=NIFTI1_HEADER_DTYPE.newbyteorder(">"), count=1)[0]
+        if hdr["sizeof_hdr"] != NIFTI1_HEADER_SIZE:
+            raise ValueError(f"Not a NIfTI-1 header: {path}")
+    if hdr["magic"] not in NIFTI1_MAGICS:
+        raise ValueError(f"Not a NIfTI-1 header (magic {bytes(hdr['magic'])!r}): {path}")
+
+    header = {}
+    for name in NIFTI1_HEADER_DTYPE.names:
+        value = hdr[name]
+        if isinstance(value, bytes):
+            header[name] = value.decode("utf-8", errors="ignore")
+        else:
+            header[name] = value.tolist()
+    return header
@@ -1,29 +1,50 @@
 import nibabel as nib
 import json
 import os
+import time
 from tqdm import tqdm
+from parsers.nifti_header import read_nifti_header
 
 class NiftiParser:
-    def __init__(self, nifti_path, json_path):
+    def __init__(self, nifti_path, json_path, header_only=True):
+        """
+        Args:
+            nifti_path (str): Path to the BOLD *.nii.gz file.
+            json_path (str): Path to its BIDS JSON sidecar.
+            header_only (bool): Read the NIfTI-1 header directly from the first bytes of the file
+                instead of nib.load. Falls back to nibabel for anything that is not NIfTI-1.
+        """
         self.nifti_path = nifti_path
         self.json_path = json_path
+        self.header_only = header_only
         self.metadata = {}
+        self.failures = []  # e.g. ["missing_json"], filled by parse()
+
+    def _read_header(self):
+        if self.header_only:
+            try:
+                return read_nifti_header(self.nifti_path)
+            except ValueError:
+                pass  # e.g. NIfTI-2; let nibabel handle it
+        header = dict(nib.load(self.nifti_path).header)
+        for k, v in header.items():
+            if isinstance(v, bytes):
+                header[k] = v.decode("utf-8", errors="ignore")
+            elif hasattr(v, 'tolist'):
+                header[k] = v.tolist()
+        return header
 
     def parse(self):
         if os.path.exists(self.nifti_path):
             try:
-                nii = nib.load(self.nifti_path)
-                header = dict(nii.header)
-                for k, v in header.items():
-                    if isinstance(v, bytes):
-                        header[k] = v.decode("utf-8", errors="ignore")
-                    elif hasattr(v, 'tolist'):
-                        header[k] = v.tolist()
+                header = self._read_header()
                 self.metadata.update({f"nifti_{k}": v for k, v in header.items()})
             except Exception as e:
                 tqdm.write(f"[Error reading NIfTI] {self.nifti_path} — {e}")
+                self.failures.append("nifti_read_error")
         else:
             tqdm.write(f"[Missing NIfTI] {self.nifti_path}")
+            self.failures.append("missing_nifti")
         
         if os.path.exists(self.json_path):
             try:
@@ -32,7 +53,29 @@ class NiftiParser:
                     self.metadata.update({f"json_{k}": v for k, v in json_meta.items()})
             except Exception as e:
                 tqdm.write(f"[Error reading JSON] {self.json_path} — {e}")
+                self.failures.append("json_read_error")
         else:
             tqdm.write(f"[Missing JSON] {self.json_path}")
+            self.failures.append("missing_json")
+
+        return self.metadata
+
 
-        return self.metadata
\ No newline at end of file
+def parse_nifti_pair(nifti_path, json_path, stats=None):
+    """
+    Parse one NIfTI + JSON sidecar pair. Returns (dict, ok, failures); the dict is {} if parsing
+    failed, and failures lists the NiftiParser failure types (e.g. "missing_json", "nifti_read_error").
+    `stats` (StageStats, optional) receives the read time and any failure types for the pair.
+    """
+    start = time.perf_counter()
+    try:
+        parser = NiftiParser(nifti_path, json_path)
+        row, ok, failures = parser.parse(), True, parser.failures
+    except Exception as e:
+        tqdm.write(f"Failed to parse NIfTI/JSON (this row will not contain NIFTI/JSON information) {nifti_path} — {e}")
+        row, ok, failures = {}, False, [type(e).__name__]  # keep row count aligned
+    if stats is not None:
+        stats.record_file(nifti_path, time.perf_counter() - start, failures[0] if failures else None)
+        for failure in failures[1:]:
+            stats.record_failure(failure)
+    return row, ok, failures
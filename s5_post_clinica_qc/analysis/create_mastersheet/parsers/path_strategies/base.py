@@ -1,7 +1,51 @@
 from abc import ABC, abstractmethod
+import os
 import pandas as pd
 
+
+def viscode_to_session(viscode: pd.Series) -> pd.Series:
+    """
+    Vectorized VISCODE -> BIDS session label: "bl" -> "M000", "m6"/"m60" -> "M006"/"M060",
+    anything else is upper-cased unchanged.
+    """
+    vis = viscode.astype(str).str.lower()
+    months = pd.to_numeric(vis.str.extract(r"m(\d+)", expand=False), errors="coerce").astype("Int64")
+    session = vis.str.upper()
+    has_months = months.notna()
+    session[has_months] = "M" + months[has_months].astype(str).str.zfill(3)
+    session[vis == "bl"] = "M000"
+    return session
+
+
+def _scandir(path):
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except OSError:
+        return []
+
+
+def scan_bids_files(root, datatype="func"):
+    """
+    Return the set of file paths under root/sub-*/ses-*/<datatype>/ using one os.scandir walk,
+    so existence checks become set lookups instead of per-file stat calls.
+    """
+    files = set()
+    for sub in _scandir(root):
+        if not (sub.name.startswith("sub-") and sub.is_dir()):
+            continue
+        for ses in _scandir(sub.path):
+            if not (ses.name.startswith("ses-") and ses.is_dir()):
+                continue
+            for entry in _scandir(os.path.join(ses.path, datatype)):
+                if entry.is_file():
+                    files.add(entry.path)
+    return files
+
+
 class PathStrategy(ABC):
+    missing_report_path = "data/missing_bids_files.csv"
+
     @abstractmethod
     def load_anchor_df(self) -> pd.DataFrame:
         """Return a fully assembled DataFrame from conversion_info folder(s)."""
@@ -10,4 +54,50 @@ class PathStrategy(ABC):
     @abstractmethod
     def add_paths(self, df: pd.DataFrame) -> pd.DataFrame:
         """Add NIfTI/JSON paths and existence checks to the given df."""
-        pass
\ No newline at end of file
+        pass
+
+    def _assign_bids_paths(self, df: pd.DataFrame, roots: pd.Series) -> pd.DataFrame:
+        """
+        Fill NIfTI_path/JSON_path and *_exists columns for every row.
+
+        Args:
+            df: Anchor rows with Subject_ID and VISCODE.
+            roots: BIDS root per row (aligned with df) that holds sub-ADNI*/ses-*/func.
+        """
+        sub = "sub-ADNI" + df["Subject_ID"].astype(str).str.replace("_", "", regex=False)
+        ses = "ses-" + viscode_to_session(df["VISCODE"])
+        base = sub + "_" + ses + "_task-rest_bold"
+        func_dir = pd.Series(
+            [os.path.join(r, s, v, "func") for r, s, v in zip(roots, sub, ses)], index=df.index
+        )
+        nifti = func_dir + os.sep + base + ".nii.gz"
+
+        existing = set()
+        for root in pd.unique(roots):
+            existing |= scan_bids_files(root, datatype="func")
+
+        df["NIfTI_path"] = nifti
+        df["JSON_path"] = nifti.str.replace(".nii.gz", ".json", regex=False)
+        df["NIfTI_exists"] = df["NIfTI_path"].isin(existing)
+        df["JSON_exists"] = df["JSON_path"].isin(existing)
+        self._write_missing_report(df)
+        return df
+
+    def _write_missing_report(self, df):
+        """Write missing NIfTI/JSON files to one summary CSV instead of a warning line per file."""
+        missing = pd.concat([
+            df.loc[~df["NIfTI_exists"], ["Subject_ID", "VISCODE", "NIfTI_path"]]
+              .rename(columns={"NIfTI_path": "missing_path"}).assign(kind="NIfTI"),
+            df.loc[~df["JSON_exists"], ["Subject_ID", "VISCODE", "JSON_path"]]
+              .rename(columns={"JSON_path": "missing_path"}).assign(kind="JSON"),
+        ], ignore_index=True)
+        if missing.empty:
+            if os.path.exists(self.missing_report_path):
+                os.remove(self.missing_report_path)  # don't leave a stale report from an earlier run
+            return
+        os.makedirs(os.path.dirname(self.missing_report_path) or ".", exist_ok=True)
+        missing.to_csv(self.missing_report_path, index=False)
+        print(
+            f"[WARNING] {(~df['NIfTI_exists']).sum()} NIfTI and {(~df['JSON_exists']).sum()} JSON files "
+            f"not found; see {self.missing_report_path}"
+        )
@@ -1,5 +1,4 @@
 import os
-import re
 import pandas as pd
 from .base import PathStrategy
 
@@ -27,36 +26,4 @@ class DefaultFlatStrategy(PathStrategy):
         return pd.concat(all_dfs, ignore_index=True) if all_dfs else pd.DataFrame()
 
     def add_paths(self, df: pd.DataFrame) -> pd.DataFrame:
-        nifti_paths, json_paths, nifti_exists, json_exists = [], [], [], []
-
-        for row in df.itertuples():
-            sub_id = row.Subject_ID.replace("_", "")
-            vis = row.VISCODE.lower()
-            match = re.search(r'm(\d+)', vis)
-
-            if vis == "bl":
-                session = "M000"
-            elif match:
-                session = f"M{int(match.group(1)):03d}"
-            else:
-                session = vis.upper()
-
-            base = f"sub-ADNI{sub_id}_ses-{session}_task-rest_bold"
-            nifti = os.path.join(self.bids_base_dir, f"sub-ADNI{sub_id}", f"ses-{session}", "func", f"{base}.nii.gz")
-            json_ = nifti.replace(".nii.gz", ".json")
-
-            nifti_paths.append(nifti)
-            json_paths.append(json_)
-            nifti_exists.append(os.path.exists(nifti))
-            json_exists.append(os.path.exists(json_))
-
-            if not os.path.exists(nifti):
-                print(f"[WARNING] NIfTI not found: {nifti}")
-            if not os.path.exists(json_):
-                print(f"[WARNING] JSON not found: {json_}")
-
-        df["NIfTI_path"] = nifti_paths
-        df["JSON_path"] = json_paths
-        df["NIfTI_exists"] = nifti_exists
-        df["JSON_exists"] = json_exists
-        return df
\ No newline at end of file
+        return self._assign_bids_paths(df, roots=pd.Series(self.bids_base_dir, index=df.index))
@@ -1,88 +1,104 @@
 import os
-import re
+import json
+import hashlib
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from .base import PathStrategy
 
 class PerSubjectStrategy(PathStrategy):
-    def __init__(self, subject_dirs, modality="fmri"):
+    def __init__(self, subject_dirs, modality="fmri", workers=16, cache_path=None):
         """
         subject_dirs: List of directories like sourcedata1/, sourcedata2/, etc.
         modality: "fmri", "t1", etc.
+        workers: Threads used to list subject folders and read the per-subject TSVs.
+        cache_path: Optional CSV holding the combined anchor rows. It is reused as long as the
+            set of TSVs and their sizes/mtimes is unchanged (key stored in <cache_path>.key).
         """
         self.subject_dirs = subject_dirs
         self.modality = modality
+        self.workers = max(1, workers)
+        self.cache_path = cache_path
 
-    def load_anchor_df(self):
-        all_dfs = []
-        for base_dir in self.subject_dirs:
-            for subject_id in os.listdir(base_dir):
-                subject_path = os.path.join(base_dir, subject_id)
-                if not os.path.isdir(subject_path):
-                    print(f"[WARNING]: Invalid path: {subject_path} ")
-                    continue  # skip files
-
-                conv_info_path = os.path.join(subject_path, "conversion_info")
-                if not os.path.isdir(conv_info_path):
-                    print("[WARNING]: No conversion_info clnica file.")
-                    continue  # skip if no conversion_info
+    def _find_subject_tsvs(self, subject_path):
+        """Return [(version_dir, tsv_path), ...] for one subject, or a warning string."""
+        if not os.path.isdir(subject_path):
+            return f"[WARNING]: Invalid path: {subject_path} "
+        conv_info_path = os.path.join(subject_path, "conversion_info")
+        if not os.path.isdir(conv_info_path):
+            return f"[WARNING]: No conversion_info clnica file in {subject_path}."
 
-                # Look inside versioned subdirs (like v0, v1, ...)
-                for version_dir in os.listdir(conv_info_path):
-                    version_path = os.path.join(conv_info_path, version_dir)
-                    if not os.path.isdir(version_path): # Skip over non-folders
+        # Look inside versioned subdirs (like v0, v1, ...)
+        found = []
+        try:
+            with os.scandir(conv_info_path) as it:
+                for version in it:
+                    if not version.is_dir():  # Skip over non-folders
                         continue
+                    tsv_path = os.path.join(version.path, f"{self.modality}_paths.tsv")
+                    if os.path.isfile(tsv_path):
+                        found.append((version.name, tsv_path))
+        except OSError as e:  # e.g. permission denied, or the folder was removed mid-run
+            return f"[WARNING]: Could not list {conv_info_path}: {e}"
+        return found
 
-                    tsv_path = os.path.join(version_path, f"{self.modality}_paths.tsv")
-                    # print(f"[DEBUG] Checking: {tsv_path}")
+    def _read_tsv(self, item):
+        subject_path, version_dir, tsv_path = item
+        try:
+            df = pd.read_csv(tsv_path, sep="\t")
+        except Exception as e:
+            print(f"[ERROR] Failed to read {tsv_path}: {e}")
+            return None
+        if df.empty or df.isna().all().all():
+            return None
+        df["source_subject_path"] = subject_path
+        df["source_version"] = version_dir
+        return df
 
-                    if os.path.isfile(tsv_path):
-                        try:
-                            df = pd.read_csv(tsv_path, sep="\t")
-                            if df.empty or df.isna().all().all():  print(f"[DEBUG] Empty or all-NA DataFrame: {tsv_path}")
-                            df["source_subject_path"] = subject_path
-                            df["source_version"] = version_dir
-                            all_dfs.append(df)
-                            print(f"[✓] Loaded: {tsv_path}")
-                        except Exception as e:
-                            print(f"[ERROR] Failed to read {tsv_path}: {e}")
-        # return pd.concat(all_dfs, ignore_index=True) if all_dfs else pd.DataFrame()
-        valid_dfs = [df for df in all_dfs if not df.empty and not df.isna().all().all()] # Filter out empties
-        return pd.concat(valid_dfs, ignore_index=True) if valid_dfs else pd.DataFrame()
+    def _cache_key(self, tsvs):
+        stats = []
+        for _, _, tsv_path in tsvs:
+            st = os.stat(tsv_path)
+            stats.append((tsv_path, st.st_size, st.st_mtime_ns))
+        return hashlib.md5(json.dumps(sorted(stats)).encode("utf-8")).hexdigest()
 
-    def add_paths(self, df: pd.DataFrame) -> pd.DataFrame:
-        nifti_paths, json_paths, nifti_exists, json_exists = [], [], [], []
+    def load_anchor_df(self):
+        subject_paths = [
+            os.path.join(base_dir, subject_id)
+            for base_dir in self.subject_dirs
+            for subject_id in os.listdir(base_dir)
+        ]
 
-        for row in df.itertuples():
-            sub_id = row.Subject_ID.replace("_", "")
-            vis = row.VISCODE.lower()
-            match = re.search(r'm(\d+)', vis)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            listings = list(pool.map(self._find_subject_tsvs, subject_paths))
 
-            if vis == "bl":
-                session = "M000"
-            elif match:
-                session = f"M{int(match.group(1)):03d}"
-            else:
-                session = vis.upper()
+            tsvs, n_skipped = [], 0
+            for subject_path, found in zip(subject_paths, listings):
+                if isinstance(found, str):
+                    n_skipped += 1
+                    continue
+                tsvs.extend((subject_path, version_dir, tsv_path) for version_dir, tsv_path in found)
+            if n_skipped:
+                print(f"[WARNING]: Skipped {n_skipped} entries without a readable conversion_info folder.")
 
-            base = f"sub-ADNI{sub_id}_ses-{session}_task-rest_bold"
-            # subject_dir = row.source_subject
-            subject_path = row.source_subject_path
-            # nifti = os.path.join(subject_dir, f"sub-ADNI{sub_id}", f"ses-{session}", "func", f"{base}.nii.gz")
-            nifti = os.path.join(subject_path, f"sub-ADNI{sub_id}", f"ses-{session}", "func", f"{base}.nii.gz")
-            json_ = nifti.replace(".nii.gz", ".json")
+            key_path = f"{self.cache_path}.key" if self.cache_path else None
+            key = self._cache_key(tsvs) if self.cache_path else None
+            if key_path and os.path.exists(self.cache_path) and os.path.exists(key_path):
+                with open(key_path, "r") as f:
+                    if f.read().strip() == key:
+                        print(f"Loaded {len(tsvs)} unchanged TSVs from cache: {self.cache_path}")
+                        return pd.read_csv(self.cache_path)
 
-            nifti_paths.append(nifti)
-            json_paths.append(json_)
-            nifti_exists.append(os.path.exists(nifti))
-            json_exists.append(os.path.exists(json_))
+            # Filter out empties, then concatenate once
+            valid_dfs = [df for df in pool.map(self._read_tsv, tsvs) if df is not None]
+        print(f"[✓] Loaded {len(valid_dfs)} of {len(tsvs)} {self.modality}_paths.tsv files.")
 
-            if not os.path.exists(nifti):
-                print(f"[WARNING] NIfTI not found: {nifti}")
-            if not os.path.exists(json_):
-                print(f"[WARNING] JSON not found: {json_}")
+        combined = pd.concat(valid_dfs, ignore_index=True) if valid_dfs else pd.DataFrame()
+        if self.cache_path and not combined.empty:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            combined.to_csv(self.cache_path, index=False)
+            with open(key_path, "w") as f:
+                f.write(key)
+        return combined
 
-        df["NIfTI_path"] = nifti_paths
-        df["JSON_path"] = json_paths
-        df["NIfTI_exists"] = nifti_exists
-        df["JSON_exists"] = json_exists
-        return df
\ No newline at end of file
+    def add_paths(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self._assign_bids_paths(df, roots=df["source_subject_path"])
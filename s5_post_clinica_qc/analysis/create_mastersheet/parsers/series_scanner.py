@@ -0,0 +1,159 @@
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import pydicom
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from tqdm import tqdm
+
+warnings.filterwarnings("ignore", category=UserWarning, module="pydicom")
+
+# Only these elements are read from each slice; pixel data is never touched
+SLICE_TAGS = ["SeriesInstanceUID", "InstanceNumber", "ImagePositionPatient", "ImageOrientationPatient"]
+
+SCAN_COLUMNS = [
+    "series_dir", "n_files", "n_unreadable", "n_series_uids", "n_positions", "n_volumes",
+    "slice_spacing", "spacing_range", "orientation_consistent", "missing_instances",
+    "duplicate_instances", "issues", "ok",
+]
+
+
+def _read_slice(path):
+    """Header-only read of the SLICE_TAGS of one file. Returns a dict, or None if unreadable."""
+    try:
+        ds = pydicom.dcmread(path, stop_before_pixels=True, specific_tags=SLICE_TAGS)
+        ipp = ds.get("ImagePositionPatient")
+        iop = ds.get("ImageOrientationPatient")
+        # Malformed IS/DS values raise here; the slice then counts as unreadable
+        return {
+            "uid": str(ds.get("SeriesInstanceUID", "")),
+            "instance": int(ds.InstanceNumber) if ds.get("InstanceNumber") is not None else None,
+            "ipp": [float(v) for v in ipp] if ipp is not None and len(ipp) == 3 else None,
+            "iop": [float(v) for v in iop] if iop is not None and len(iop) == 6 else None,
+        }
+    except Exception:
+        return None
+
+
+def check_series(slices, spacing_tol=0.05, orientation_tol=1e-4, min_slices=1):
+    """
+    Series-level consistency checks on the per-slice headers of one series.
+
+    - slice count: fewer than `min_slices` readable files, or a slice count that is not a whole
+      number of volumes (each slice position should repeat once per volume)
+    - spacing: distance between consecutive slice positions along the slice normal varies by
+      more than `spacing_tol` mm ("Interslice distance varies in the volume")
+    - orientation: ImageOrientationPatient differs between slices by more than `orientation_tol`
+    - missing instances: gaps or duplicates in the InstanceNumber sequence
+
+    Args:
+        slices (list): Dicts from _read_slice (None for unreadable files).
+
+    Returns:
+        dict: The SCAN_COLUMNS metrics (without series_dir) and an "issues" string.
+    """
+    readable = [s for s in slices if s is not None]
+    issues = []
+    result = {
+        "n_files": len(slices), "n_unreadable": len(slices) - len(readable),
+        "n_series_uids": len({s["uid"] for s in readable}), "n_positions": None, "n_volumes": None,
+        "slice_spacing": None, "spacing_range": None, "orientation_consistent": None,
+        "missing_instances": 0, "duplicate_instances": 0,
+    }
+    if result["n_unreadable"]:
+        issues.append("unreadable_files")
+    if len(readable) < min_slices:
+        issues.append("too_few_slices")
+    if result["n_series_uids"] > 1:
+        issues.append("mixed_series")
+
+    # Orientation
+    iops = np.array([s["iop"] for s in readable if s["iop"] is not None])
+    if len(iops):
+        consistent = bool(np.all(np.abs(iops - iops[0]) <= orientation_tol))
+        result["orientation_consistent"] = consistent
+        if not consistent:
+            issues.append("orientation_varies")
+
+    # Slice positions along the normal of the first slice's orientation
+    ipps = np.array([s["ipp"] for s in readable if s["ipp"] is not None])
+    if len(ipps) and len(iops):
+        normal = np.cross(iops[0][:3], iops[0][3:])
+        positions, counts = np.unique(np.round(ipps @ normal, 3), return_counts=True)
+        result["n_positions"] = len(positions)
+        if len(set(counts)) > 1:
+            issues.append("uneven_slices_per_volume")
+        else:
+            result["n_volumes"] = int(counts[0])
+        if len(positions) > 1:
+            gaps = np.diff(positions)
+            result["slice_spacing"] = float(np.median(gaps))
+            result["spacing_range"] = float(gaps.max() - gaps.min())
+            if result["spacing_range"] > spacing_tol:
+                issues.append("interslice_distance_varies")
+
+    # Instance numbers
+    instances = [s["instance"] for s in readable if s["instance"] is not None]
+    if instances:
+        unique = set(instances)
+        result["duplicate_instances"] = len(instances) - len(unique)
+        result["missing_instances"] = (max(unique) - min(unique) + 1) - len(unique)
+        if result["missing_instances"]:
+            issues.append("missing_instances")
+        if result["duplicate_instances"]:
+            issues.append("duplicate_instances")
+
+    result["issues"] = ";".join(issues)
+    result["ok"] = not issues
+    return result
+
+
+def scan_series_dir(series_dir, spacing_tol=0.05, orientation_tol=1e-4, min_slices=1):
+    """Read every slice header in one series directory and check it. Returns (row dict, seconds)."""
+    start = time.perf_counter()
+    try:
+        with os.scandir(series_dir) as it:
+            files = sorted(e.path for e in it if e.is_file())
+    except OSError as e:
+        row = {**dict.fromkeys(SCAN_COLUMNS), "series_dir": series_dir, "n_files": 0,
+               "issues": f"unlistable:{type(e).__name__}", "ok": False}
+        return row, time.perf_counter() - start
+    result = check_series([_read_slice(f) for f in files], spacing_tol, orientation_tol, min_slices)
+    return {"series_dir": series_dir, **result}, time.perf_counter() - start
+
+
+def _scan_one(args):
+    return scan_series_dir(*args)
+
+
+def scan_series(series_dirs, workers=1, executor="process", spacing_tol=0.05, orientation_tol=1e-4,
+                min_slices=1, progress=True, stats=None):
+    """
+    Scan whole DICOM series (every slice header, no pixels) for problems that make conversion
+    fail, such as "Interslice distance varies in the volume".
+
+    Args:
+        series_dirs (list): Series directories, e.g. the Path column of Clinica's fmri_paths.tsv.
+        workers (int): Parallel workers; series are distributed across them.
+        executor (str): "process" or "thread" pool when workers > 1 (threads suit network storage).
+        stats (StageStats): Optional; receives per-series scan times and the first issue as failure type.
+
+    Returns:
+        pd.DataFrame: One row per series with SCAN_COLUMNS, in input order.
+    """
+    series_dirs = list(series_dirs)
+    args = [(d, spacing_tol, orientation_tol, min_slices) for d in series_dirs]
+    bar = dict(total=len(args), desc="Scanning DICOM series", disable=not progress)
+    if workers <= 1:
+        results = [_scan_one(a) for a in tqdm(args, **bar)]
+    else:
+        pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        chunksize = max(1, len(args) // (workers * 16)) if executor == "process" else 1
+        with pool_cls(max_workers=workers) as pool:
+            results = list(tqdm(pool.map(_scan_one, args, chunksize=chunksize), **bar))
+
+    if stats is not None:
+        for row, seconds in results:
+            stats.record_file(row["series_dir"], seconds, row["issues"].split(";")[0] if row["issues"] else None)
+    return pd.DataFrame([row for row, _ in results], columns=SCAN_COLUMNS)
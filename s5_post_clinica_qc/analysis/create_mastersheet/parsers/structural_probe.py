@@ -1,20 +1,30 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import os
+import re
+import time
 import pandas as pd
 import nibabel as nib
 from tqdm import tqdm
+from parsers.nifti_header import read_nifti_header
 
 class StructuralProbe:
     """
     StructuralProbe detects the presence of structural NIfTI images (e.g., T1w, FLAIR)
-    and extracts key header metadata (dimensions, voxel sizes) using nibabel.
+    and extracts key header metadata (dimensions, voxel sizes) from the NIfTI-1 header,
+    falling back to nibabel for other formats.
     
     It supports searching across multiple folders per session (e.g., anat, fmap, dwi),
     and returns a DataFrame with _exists flags, header fields, and file paths.
+    Candidate files for all sessions are collected up front and their headers are read
+    concurrently. Every matching run (run-01, run-02, ...) is recorded: the wide columns
+    describe the first run in sorted order, and `runs_df` holds one row per run.
     
     Example usage:
-        probe = StructuralProbe(modalities=["T1w", "FLAIR"], folders=["anat"])
+        probe = StructuralProbe(modalities=["T1w", "FLAIR"], folders=["anat"], workers=8)
         struct_df = probe.run(df)
         df = pd.concat([df, struct_df], axis=1)
+        probe.runs_df  # long table: one row per (session, modality, run)
     """
 
     HEADER_FIELDS = {
@@ -26,29 +36,80 @@ class StructuralProbe:
         "pixdim3": lambda hdr: float(hdr["pixdim"][3]),
     }
 
-    def __init__(self, modalities=["T1w", "FLAIR"], folders=["anat"]):
+    RUN_PATTERN = re.compile(r"_run-(\d+)_")
+
+    def __init__(self, modalities=["T1w", "FLAIR"], folders=["anat"], header_only=True, workers=1, progress=True,
+                 stats=None):
         """
         Initialize the probe.
         
         Args:
             modalities (list): List of modality suffixes to track (e.g., ["T1w", "FLAIR"]).
             folders (list): Subdirectories within each session to search (e.g., ["anat", "fmap"]).
+            header_only (bool): Read only the first bytes of each file instead of nib.load.
+            workers (int): Threads used to list session folders and read headers.
+            progress (bool): Show tqdm progress bars.
+            stats (StageStats): Optional; receives the read time and failure type of every header.
         """
         self.modalities = modalities
         self.folders = folders
+        self.header_only = header_only
+        self.workers = max(1, workers)
+        self.progress = progress
+        self.stats = stats
+        self.runs_df = pd.DataFrame()
 
-    def _extract_header_fields(self, nii_path, modality_prefix):
-        """Safely load a NIfTI header and extract specified fields."""
+    def _read_header(self, nii_path):
+        if self.header_only:
+            try:
+                return read_nifti_header(nii_path)
+            except ValueError:
+                pass  # e.g. NIfTI-2; let nibabel handle it
+        return nib.load(nii_path).header
+
+    def _header_values(self, nii_path):
+        """Safely load a NIfTI header and extract HEADER_FIELDS (None for each on failure)."""
+        start, failure = time.perf_counter(), None
         try:
-            img = nib.load(nii_path)
-            hdr = img.header
-            return {
-                f"{modality_prefix}_{field}": fn(hdr)
-                for field, fn in self.HEADER_FIELDS.items()
-            }
+            hdr = self._read_header(nii_path)
+            values = {field: fn(hdr) for field, fn in self.HEADER_FIELDS.items()}
         except Exception as e:
-            tqdm.write(f"[nibabel failed] {nii_path} — {e}")
-            return {f"{modality_prefix}_{field}": None for field in self.HEADER_FIELDS}
+            tqdm.write(f"[header read failed] {nii_path} — {e}")
+            values, failure = {field: None for field in self.HEADER_FIELDS}, type(e).__name__
+        if self.stats is not None:
+            self.stats.record_file(nii_path, time.perf_counter() - start, failure)
+        return values
+
+    def _extract_header_fields(self, nii_path, modality_prefix):
+        """Safely load a NIfTI header and extract specified fields."""
+        return {
+            f"{modality_prefix}_{field}": value
+            for field, value in self._header_values(nii_path).items()
+        }
+
+    def _find_session_files(self, ses_dir):
+        """
+        List each search folder of one session once and return {modality: [sorted paths]}.
+        As before, the first folder (in `self.folders` order) with a match wins for a modality.
+        """
+        found = {mod: [] for mod in self.modalities}
+        for folder in self.folders:
+            search_dir = os.path.join(ses_dir, folder)
+            try:
+                names = sorted(e.name for e in os.scandir(search_dir) if e.is_file())
+            except OSError:
+                continue
+            for mod in self.modalities:
+                if not found[mod]:
+                    found[mod] = [os.path.join(search_dir, n) for n in names if n.endswith(f"{mod}.nii.gz")]
+        return found
+
+    def _map(self, fn, items, desc):
+        if self.workers == 1:
+            return [fn(item) for item in tqdm(items, total=len(items), desc=desc, disable=not self.progress)]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(tqdm(pool.map(fn, items), total=len(items), desc=desc, disable=not self.progress))
+
 
     def run(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -60,37 +121,58 @@ class StructuralProbe:
         Returns:
             pd.DataFrame: A new DataFrame with columns:
                 - {mod}_exists (True/False)
-                - {mod}_dim{1–3}, {mod}_pixdim{1–3}
-                - {mod}_path
+                - {mod}_dim{1–3}, {mod}_pixdim{1–3} (first run)
+                - {mod}_path (first run)
+                - {mod}_n_runs (all matching runs)
+            The path and header of every run are stored on `self.runs_df`.
         """
-        all_rows = []
-        for row in tqdm(df.itertuples(), total=len(df), desc="Structural probe: checking modality files"):
-            nifti_path = getattr(row, "NIfTI_path")
-            ses_dir = Path(nifti_path).parents[1]
+        ses_dirs = [str(Path(p).parents[1]) for p in df["NIfTI_path"]]
+        unique_dirs = list(dict.fromkeys(ses_dirs))
 
-            row_result = {}
+        # 1. Collect every candidate file for every session up front
+        listings = dict(zip(unique_dirs, self._map(
+            self._find_session_files, unique_dirs, "Structural probe: listing session folders"
+        )))
 
+        # 2. Read all headers concurrently
+        all_files = list(dict.fromkeys(
+            path for found in listings.values() for paths in found.values() for path in paths
+        ))
+        headers = dict(zip(all_files, self._map(
+            self._header_values, all_files, "Structural probe: reading headers"
+        )))
+
+        # 3. Assemble one wide row per input row, plus one long row per run
+        all_rows, run_rows = [], []
+        for row_pos, ses_dir in enumerate(ses_dirs):
+            row_result = {}
             for mod in self.modalities:
-                found_file = None
-
-                for folder in self.folders:
-                    search_dir = ses_dir / folder
-                    if search_dir.exists():
-                        file = next(search_dir.glob(f"*{mod}.nii.gz"), None)
-                        if file:
-                            found_file = file
-                            break
-
-                if found_file:
-                    row_result[f"{mod}_path"] = str(found_file)
+                paths = listings[ses_dir][mod]
+                if paths:
+                    row_result[f"{mod}_path"] = paths[0]
                     row_result[f"{mod}_exists"] = True
-                    row_result.update(self._extract_header_fields(str(found_file), modality_prefix=mod))
+                    row_result.update({f"{mod}_{field}": v for field, v in headers[paths[0]].items()})
                 else:
                     row_result[f"{mod}_path"] = None
                     row_result[f"{mod}_exists"] = False
                     for field in self.HEADER_FIELDS:
                         row_result[f"{mod}_{field}"] = None
+                row_result[f"{mod}_n_runs"] = len(paths)
 
+                for path in paths:
+                    match = self.RUN_PATTERN.search(os.path.basename(path))
+                    run_rows.append({
+                        "row": row_pos,
+                        "modality": mod,
+                        "run": int(match.group(1)) if match else None,
+                        "path": path,
+                        **headers[path],
+                    })
             all_rows.append(row_result)
 
-        return pd.DataFrame(all_rows)
\ No newline at end of file
+        runs_df = pd.DataFrame(run_rows, columns=["row", "modality", "run", "path", *self.HEADER_FIELDS])
+        # Carry session identifiers over so the long table can be read on its own
+        id_cols = [c for c in ("Subject_ID", "VISCODE") if c in df.columns]
+        ids = df[id_cols].reset_index(drop=True)
+        self.runs_df = pd.concat([ids.iloc[runs_df["row"]].reset_index(drop=True), runs_df], axis=1)
+        return pd.DataFrame(all_rows)
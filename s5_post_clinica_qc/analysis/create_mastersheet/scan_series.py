@@ -0,0 +1,72 @@
+#%%
+from parsers.series_scanner import scan_series
+from instrumentation import RunReport
+import pandas as pd
+import argparse
+import os
+#%%
+
+# Run this before Clinica (step 4) to find DICOM series that will fail conversion, e.g.
+#   python scan_series.py --paths /path/to/conversion_info/v0/fmri_paths.tsv --workers 16
+#   python scan_series.py --dicom-root /path/to/ADNI --workers 16 --executor thread
+
+
+def find_series_dirs(root):
+    """Every directory under `root` that directly contains files (one DICOM series per folder in ADNI downloads)."""
+    return sorted(dirpath for dirpath, _, filenames in os.walk(root) if filenames)
+
+
+def load_series_table(paths):
+    """Read one or more CSV/TSV files with a Path column (Clinica *_paths.tsv, anchor_df.csv, ...)."""
+    frames = []
+    for path in paths:
+        df = pd.read_csv(path, sep="\t" if path.endswith(".tsv") else ",")
+        if "Path" not in df.columns:
+            raise ValueError(f"{path} has no 'Path' column.")
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    df = df[df["Path"].notna() & (df["Path"].astype(str).str.strip() != "")]
+    id_cols = [c for c in ("Subject_ID", "VISCODE", "Image_ID") if c in df.columns]
+    return df[id_cols + ["Path"]].drop_duplicates("Path").reset_index(drop=True)
+
+
+def main(paths=None, dicom_root=None, output_path="data/series_scan.csv", workers=1, executor="process",
+         spacing_tol=0.05, min_slices=1):
+    if paths:
+        series = load_series_table(paths)
+    else:
+        series = pd.DataFrame({"Path": find_series_dirs(dicom_root)})
+    print(f"Scanning {len(series)} DICOM series.")
+
+    report = RunReport(workers=workers, executor=executor, spacing_tol=spacing_tol, min_slices=min_slices)
+    with report.stage("series") as stats:
+        scan_df = scan_series(series["Path"], workers=workers, executor=executor, spacing_tol=spacing_tol,
+                              min_slices=min_slices, stats=stats)
+        stats.items = len(scan_df)
+    scan_df = pd.concat([series.drop(columns=["Path"]), scan_df], axis=1)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    scan_df.to_csv(output_path, index=False)
+    report.save(os.path.splitext(output_path)[0] + "_report.json")
+
+    flagged = scan_df[~scan_df["ok"]]
+    print(f"{len(flagged)} of {len(scan_df)} series flagged; full results saved to {output_path}")
+    if len(flagged):
+        print(flagged["issues"].str.split(";").explode().value_counts().to_string())
+    return scan_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check every slice of each DICOM series for problems that break NIfTI conversion.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--paths", nargs="+", help="CSV/TSV files with a Path column of series directories (e.g. Clinica fmri_paths.tsv).")
+    source.add_argument("--dicom-root", help="Scan every folder containing files under this directory.")
+    parser.add_argument("--output", default="data/series_scan.csv", help="Per-series results (default: data/series_scan.csv).")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel workers (default: 1, serial).")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process", help="Worker pool type (default: process).")
+    parser.add_argument("--spacing-tol", type=float, default=0.05, help="Allowed variation of the slice spacing in mm (default: 0.05).")
+    parser.add_argument("--min-slices", type=int, default=1, help="Flag series with fewer readable slices than this (default: 1).")
+    args = parser.parse_args()
+
+    main(paths=args.paths, dicom_root=args.dicom_root, output_path=args.output, workers=args.workers,
+         executor=args.executor, spacing_tol=args.spacing_tol, min_slices=args.min_slices)
@@ -0,0 +1,205 @@
+import os
+import csv
+import glob
+import json
+import hashlib
+import pandas as pd
+from pathlib import Path
+from contextlib import nullcontext
+from tqdm import tqdm
+from config.dicom_fields import dcm_keep_fields
+from parsers.dicom_parser import parse_dicom_dirs
+from parsers.dicom_cache import DICOMCache
+from parsers.nifti_parser import parse_nifti_pair
+from parsers.nifti_cache import NiftiCache
+from parsers.file_cache import file_fingerprint
+from parsers.structural_probe import StructuralProbe
+
+
+def _folder_fingerprint(ses_dir, folders):
+    """[name, size, mtime_ns] of every file in the session's structural folders (what StructuralProbe lists)."""
+    listing = []
+    for folder in folders:
+        try:
+            entries = sorted((e for e in os.scandir(os.path.join(ses_dir, folder)) if e.is_file()), key=lambda e: e.name)
+        except OSError:
+            continue
+        listing += [[folder, e.name, file_fingerprint(e.path)] for e in entries]
+    return listing
+
+
+def _chunk_key(chunk, folders=("anat",)):
+    """
+    Identify a chunk by its anchor rows and the files they point to, so a rerun can tell whether a
+    written part is still valid. Each row contributes the same fingerprints the DICOM/NIfTI caches
+    validate against (first DICOM file, NIfTI and JSON size/mtime) plus the listing of its
+    structural `folders`, so a regenerated or added file invalidates the part.
+    """
+    content = [
+        [
+            f"{r.Subject_ID}|{r.VISCODE}|{r.Path}|{r.source_version}",
+            DICOMCache._fingerprint(r.Path),
+            NiftiCache._fingerprint(r.NIfTI_path, r.JSON_path),
+            _folder_fingerprint(str(Path(r.NIfTI_path).parents[1]), folders),
+        ]
+        for r in chunk.itertuples()
+    ]
+    return hashlib.md5(json.dumps(content).encode("utf-8")).hexdigest()
+
+
+def build_chunk(chunk, workers=1, probe=None, report=None, dicom_cache=None, nifti_cache=None):
+    """
+    Run one chunk of anchor rows through the DICOM -> NIfTI/JSON -> structural stages.
+    With a RunReport, each stage's time and per-file reads are added to that stage's totals.
+    With a DICOMCache/NiftiCache, only series and sessions that are new or changed are parsed.
+
+    Returns:
+        (pd.DataFrame, pd.DataFrame): The chunk's mastersheet rows and its StructuralProbe runs_df.
+    """
+    chunk = chunk.reset_index(drop=True)
+    stage = report.stage if report is not None else (lambda name: nullcontext())
+
+    with stage("dicom") as stats:
+        if dicom_cache is not None:
+            dicom_rows, failures, _ = dicom_cache.parse(chunk["Path"], workers=workers, progress=False, stats=stats)
+        else:
+            dicom_rows, failures = parse_dicom_dirs(chunk["Path"], dcm_keep_fields, workers=workers, progress=False,
+                                                    stats=stats)
+        for i, dicom_path, error in failures:
+            tqdm.write(f"Failed to parse DICOM (this row will not contain DICOM information) {dicom_path} - {error}")
+
+    with stage("nifti") as stats:
+        if nifti_cache is not None:
+            nifti_rows, _ = nifti_cache.parse(chunk["NIfTI_path"], chunk["JSON_path"], stats=stats, progress=False)
+        else:
+            nifti_rows = [parse_nifti_pair(n, j, stats=stats)[0] for n, j in zip(chunk["NIfTI_path"], chunk["JSON_path"])]
+    merged = pd.concat([chunk, pd.DataFrame(dicom_rows), pd.DataFrame(nifti_rows)], axis=1)
+
+    with stage("struct") as stats:
+        probe = probe or StructuralProbe(modalities=["T1w", "FLAIR"], folders=["anat"], workers=workers, progress=False)
+        probe.stats = stats
+        struct_df = probe.run(merged)
+    if report is not None:
+        for name in ("dicom", "nifti", "struct"):
+            report.stages[name].items += len(chunk)
+    return pd.concat([merged, struct_df], axis=1), probe.runs_df
+
+
+def iter_mastersheet_chunks(anchor_df, chunk_size=250, workers=1, probe=None, skip=None, report=None,
+                            dicom_cache=None, nifti_cache=None):
+    """
+    Yield (chunk_index, key, frame, runs) for each fixed-size slice of the anchor table, where
+    `runs` is the chunk's structural runs table with "row" counted from the start of `anchor_df`.
+
+    Only one chunk is materialised at a time, so memory depends on `chunk_size`, not cohort size.
+    `skip(chunk_index, key)` may return True to skip chunks that are already on disk.
+    """
+    for start in range(0, len(anchor_df), chunk_size):
+        chunk_index = start // chunk_size
+        chunk = anchor_df.iloc[start:start + chunk_size]
+        key = _chunk_key(chunk, folders=probe.folders if probe is not None else ("anat",))
+        if skip is not None and skip(chunk_index, key):
+            yield chunk_index, key, None, None
+            continue
+        frame, runs = build_chunk(chunk, workers=workers, probe=probe, report=report,
+                                  dicom_cache=dicom_cache, nifti_cache=nifti_cache)
+        runs["row"] += start
+        yield chunk_index, key, frame, runs
+
+
+def _part_paths(chunk_dir, chunk_index):
+    base = os.path.join(chunk_dir, f"part-{chunk_index:05d}")
+    return f"{base}.csv", f"{base}.runs.csv", f"{base}.key"
+
+
+def build_streaming(anchor_df, chunk_dir="data/chunks", output_path=None, runs_output_path=None, chunk_size=250,
+                    workers=1, resume=True, on_chunk=None, report=None, dicom_cache=None, nifti_cache=None):
+    """
+    Build the mastersheet chunk by chunk, writing each chunk to `chunk_dir/part-NNNNN.csv` and its
+    structural runs to `chunk_dir/part-NNNNN.runs.csv`.
+
+    Each part is written to a temporary file and renamed, with a `.key` file recording which
+    anchor rows it holds and the fingerprints of their DICOM, NIfTI, JSON and structural files,
+    so a crash leaves every finished part on disk and a rerun with `resume=True` only rebuilds
+    parts that are missing or whose rows or files changed. Chunk keys depend on row position, so
+    after anchors are inserted later chunks are rebuilt; pass the DICOM/NIfTI caches so those
+    rebuilds only re-read files that actually changed. If `output_path` / `runs_output_path`
+    are given, the parts are then combined into one CSV each without loading them all at once.
+
+    Args:
+        on_chunk (callable): Optional callback receiving each newly built chunk DataFrame
+            (e.g. to upsert it into the session store).
+        report (RunReport): Optional; collects per-stage timings across all built chunks.
+        dicom_cache (DICOMCache), nifti_cache (NiftiCache): Optional; saved after every built chunk.
+
+    Returns:
+        list: Paths of the part files, in anchor order.
+    """
+    os.makedirs(chunk_dir, exist_ok=True)
+
+    def already_written(chunk_index, key):
+        part_path, runs_path, key_path = _part_paths(chunk_dir, chunk_index)
+        if not (resume and all(os.path.exists(p) for p in (part_path, runs_path, key_path))):
+            return False
+        with open(key_path, "r") as f:
+            return f.read().strip() == key
+
+    n_chunks = (len(anchor_df) + chunk_size - 1) // chunk_size
+    part_paths, runs_paths, n_reused = [], [], 0
+    chunks = iter_mastersheet_chunks(anchor_df, chunk_size=chunk_size, workers=workers, skip=already_written,
+                                     report=report, dicom_cache=dicom_cache, nifti_cache=nifti_cache)
+    for chunk_index, key, frame, runs in tqdm(chunks, total=n_chunks, desc="Streaming mastersheet chunks"):
+        part_path, runs_path, key_path = _part_paths(chunk_dir, chunk_index)
+        part_paths.append(part_path)
+        runs_paths.append(runs_path)
+        if frame is None:
+            n_reused += 1
+            continue
+        for df, path in ((frame, part_path), (runs, runs_path)):
+            df.to_csv(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+        with open(key_path, "w") as f:
+            f.write(key)
+        for cache in (dicom_cache, nifti_cache):
+            if cache is not None:
+                cache.save()
+        if on_chunk is not None:
+            on_chunk(frame)
+
+    # Drop parts left over from a previous, larger anchor table
+    current = set(part_paths) | set(runs_paths)
+    for stale in glob.glob(os.path.join(chunk_dir, "part-*.csv")):
+        if stale not in current:
+            os.remove(stale)
+            key_path = os.path.join(chunk_dir, os.path.basename(stale).split(".", 1)[0] + ".key")
+            if os.path.exists(key_path):
+                os.remove(key_path)
+
+    print(f"Streaming build: {len(part_paths) - n_reused} chunks built, {n_reused} reused from {chunk_dir}.")
+    if output_path:
+        combine_parts(part_paths, output_path)
+    if runs_output_path:
+        combine_parts(runs_paths, runs_output_path)
+    return part_paths
+
+
+def combine_parts(part_paths, output_path):
+    """
+    Concatenate part CSVs into `output_path` one part at a time.
+
+    Parts can have different columns (e.g. a JSON key only some sessions have), so the header
+    rows are read first to build the union of columns, then each part is reindexed and appended.
+    """
+    columns = []
+    for part_path in part_paths:
+        with open(part_path, newline="") as f:
+            for col in next(csv.reader(f), []):
+                if col not in columns:
+                    columns.append(col)
+
+    tmp_path = output_path + ".tmp"
+    for i, part_path in enumerate(part_paths):
+        part = pd.read_csv(part_path, dtype=str, keep_default_na=False)
+        part.reindex(columns=columns).to_csv(tmp_path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+    os.replace(tmp_path, output_path)
+    print(f"Combined {len(part_paths)} chunks into {output_path} ({len(columns)} columns).")
@@ -0,0 +1,36 @@
+import os
+import sys
+
+# The mastersheet modules import each other relative to analysis/create_mastersheet/
+SUITE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOP_LEVEL = {os.path.splitext(name)[0] for name in os.listdir(SUITE_DIR)}
+# create_report/scripts/config.py would win over the config/ namespace package here even when it
+# comes later on sys.path, so that folder is taken off the path while this suite runs
+SHADOWING_DIRS = [os.path.join(os.path.dirname(SUITE_DIR), "create_report", "scripts")]
+
+
+def _is_local(module):
+    paths = [getattr(module, "__file__", None), *getattr(module, "__path__", [])]
+    return any(p and os.path.abspath(p).startswith(SUITE_DIR + os.sep) for p in paths)
+
+
+def use_suite_modules():
+    """
+    Put this folder first on sys.path, drop SHADOWING_DIRS from it and forget same-named modules
+    imported from elsewhere, so this suite can run in the same pytest session as create_report/tests.
+    """
+    sys.path[:] = [SUITE_DIR] + [p for p in sys.path if p != SUITE_DIR and p not in SHADOWING_DIRS]
+    for name, module in list(sys.modules.items()):
+        if name.split(".")[0] in TOP_LEVEL and not _is_local(module):
+            del sys.modules[name]
+
+
+def pytest_collectstart(collector):
+    use_suite_modules()
+
+
+def pytest_runtest_setup(item):
+    use_suite_modules()
+
+
+use_suite_modules()
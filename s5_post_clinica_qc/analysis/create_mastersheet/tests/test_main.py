@@ -0,0 +1,27 @@
+import os
+import pandas as pd
+import main
+from benchmarks.synthetic_dataset import generate_dataset
+
+
+def test_partial_parquet_run_keeps_other_sessions(tmp_path):
+    dataset = generate_dataset(str(tmp_path / "dataset"), n_sessions=12, n_volumes=10)
+    out_dir = str(tmp_path / "out")
+    run = dict(base_dir=dataset["base_dir"], bids_dir=dataset["bids_dir"], output_dir=out_dir, output_format="parquet")
+    parquet_path = os.path.join(out_dir, "anchor_plus_dicom_nifti_struct.parquet")
+
+    main.main(**run)
+    full = pd.read_parquet(parquet_path)
+    assert not os.path.exists(os.path.join(out_dir, "anchor_plus_dicom_nifti_struct.csv"))
+
+    subject = full["Subject_ID"].iloc[0]
+    main.main(**run, subjects=[subject])
+    merged = pd.read_parquet(parquet_path)
+
+    keys = ["Subject_ID", "VISCODE"]
+    assert len(merged) == len(full)
+    assert set(map(tuple, merged[keys].astype(str).values)) == set(map(tuple, full[keys].astype(str).values))
+    pd.testing.assert_series_equal(
+        merged.sort_values(keys)["nifti_dim3"].reset_index(drop=True),
+        full.sort_values(keys)["nifti_dim3"].reset_index(drop=True),
+    )
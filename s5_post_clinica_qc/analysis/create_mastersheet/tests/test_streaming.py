@@ -0,0 +1,41 @@
+import os
+import numpy as np
+import pandas as pd
+import nibabel as nib
+import main
+from benchmarks.synthetic_dataset import generate_dataset
+from parsers.dicom_cache import DICOMCache
+from parsers.nifti_cache import NiftiCache
+from config.dicom_fields import dcm_keep_fields
+from streaming import build_streaming
+
+
+def test_rerun_rebuilds_part_whose_nifti_changed(tmp_path):
+    dataset = generate_dataset(str(tmp_path / "dataset"), n_sessions=8, n_volumes=10)
+    out_dir = str(tmp_path / "out")
+    main.main(base_dir=dataset["base_dir"], bids_dir=dataset["bids_dir"], output_dir=out_dir, stages=["anchors"])
+    anchor_df = pd.read_csv(os.path.join(out_dir, "anchor_df.csv"))
+    chunk_dir = os.path.join(out_dir, "chunks")
+
+    def build():
+        parts = build_streaming(
+            anchor_df, chunk_dir=chunk_dir, chunk_size=4,
+            dicom_cache=DICOMCache(os.path.join(out_dir, "dicom_cache.json"), keep_fields=dcm_keep_fields),
+            nifti_cache=NiftiCache(os.path.join(out_dir, "nifti_cache.json")),
+        )
+        return {p: (os.stat(p).st_mtime_ns, pd.read_csv(p)) for p in parts}
+
+    first = build()
+    assert {p: m for p, (m, _) in build().items()} == {p: m for p, (m, _) in first.items()}  # nothing changed
+
+    # Regenerate one BOLD file with a different number of volumes, keeping its path
+    row = anchor_df[anchor_df["NIfTI_exists"]].iloc[-1]
+    img = nib.load(row["NIfTI_path"])
+    nib.save(nib.Nifti1Image(np.zeros((4, 4, 3, 7), np.int16), img.affine, img.header), row["NIfTI_path"])
+
+    second = build()
+    changed = [p for p in first if second[p][0] != first[p][0]]
+    assert len(changed) == 1
+    part = second[changed[0]][1]
+    dim = part.loc[part["NIfTI_path"] == row["NIfTI_path"], "nifti_dim"].iloc[0]
+    assert dim.startswith("[4, 4, 4, 3, 7,")
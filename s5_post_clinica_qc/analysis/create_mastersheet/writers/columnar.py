@@ -0,0 +1,75 @@
+import ast
+import numpy as np
+import pandas as pd
+from config.mastersheet_schema import list_columns, categorical_columns
+
+
+def _as_list(value):
+    """Return a header list from an in-memory list/array or its repr string (as stored in the CSV)."""
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return None
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return value
+    return None
+
+
+def _expand_list_column(series, dtype, length):
+    """Expand a list-valued column into `length` numeric columns named <col>0 .. <col>{length-1}."""
+    values = np.full((len(series), length), np.nan)
+    for i, value in enumerate(series):
+        lst = _as_list(value)
+        if lst is not None:
+            n = min(len(lst), length)
+            values[i, :n] = lst[:n]
+    return pd.DataFrame(
+        {f"{series.name}{j}": pd.array(values[:, j], dtype="Float64").astype(dtype) for j in range(length)},
+        index=series.index,
+    )
+
+
+def to_columnar(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return a typed copy of the mastersheet ready for Parquet/Arrow.
+
+    - list columns in config/mastersheet_schema.py become real numeric columns (nifti_dim0..7, ...)
+    - a "Site" column is derived from Subject_ID
+    - configured low-cardinality columns become categoricals
+    - remaining object columns holding lists or mixed types are stored as strings
+    """
+    out = df.copy()
+    if "Subject_ID" in out.columns:
+        out["Site"] = out["Subject_ID"].astype(str).str[:3]
+
+    for col, (dtype, length) in list_columns.items():
+        if col in out.columns:
+            expanded = _expand_list_column(out[col], dtype, length)
+            # Rows merged from an existing Parquet mastersheet already hold the expanded columns
+            typed = [c for c in expanded.columns if c in out.columns]
+            for c in typed:
+                expanded[c] = expanded[c].fillna(out[c].astype(expanded[c].dtype))
+            out = pd.concat([out.drop(columns=[col] + typed), expanded], axis=1)
+
+    for col in out.columns[out.dtypes == object]:
+        kind = pd.api.types.infer_dtype(out[col], skipna=True)
+        if kind in ("floating", "integer", "mixed-integer-float"):
+            out[col] = pd.to_numeric(out[col], errors="coerce")
+        elif kind not in ("string", "empty", "boolean"):
+            out[col] = out[col].map(lambda v: v if v is None or (isinstance(v, float) and np.isnan(v)) else str(v))
+
+    for col in categorical_columns:
+        if col in out.columns:
+            out[col] = out[col].astype("category")
+    return out
+
+
+def write_parquet(df: pd.DataFrame, path: str) -> pd.DataFrame:
+    """Write the typed mastersheet to `path` (requires pyarrow). Returns the typed frame."""
+    typed = to_columnar(df)
+    try:
+        typed.to_parquet(path, index=False, engine="pyarrow")
+    except ImportError as e:
+        raise ImportError("Writing the Parquet mastersheet requires pyarrow (pip install pyarrow).") from e
+    return typed
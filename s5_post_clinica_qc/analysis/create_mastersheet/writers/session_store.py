@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+        return "TEXT"  # stored as "True"/"False", like the CSV
+    if pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def _sql_value(value):
+    """Convert a cell to something sqlite3 can bind; lists/dicts are stored as their repr (as in the CSV)."""
+    if value is None:
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, (int, str)):
+        return value
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return str(value)
+
+
+class SessionStore:
+    """
+    Embedded SQLite store of mastersheet rows, one per session (Subject_ID, VISCODE).
+
+    Rows are upserted by main.py after each build, and Subject_ID, VISCODE, Image_ID and the
+    manufacturer columns are indexed so point lookups and filtered reads do not need to parse
+    the whole CSV.
+
+    Example usage:
+        with SessionStore("data/mastersheet.sqlite") as store:
+            store.get_subject("002_S_0413")
+            store.query("json_Manufacturer = ? AND json_RepetitionTime < ?", ("Philips", 1))
+    """
+
+    TABLE = "sessions"
+    KEY_COLUMNS = ["Subject_ID", "VISCODE"]
+    INDEXED_COLUMNS = ["Subject_ID", "VISCODE", "Image_ID", "dicom_Manufacturer", "json_Manufacturer"]
+
+    def __init__(self, db_path="data/mastersheet.sqlite"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def columns(self):
+        return [row[1] for row in self.conn.execute(f'PRAGMA table_info("{self.TABLE}")')]
+
+    def _ensure_schema(self, df):
+        existing = self.columns()
+        if not existing:
+            cols = ", ".join(f'"{c}" {_sql_type(df[c].dtype)}' for c in df.columns)
+            keys = ", ".join(f'"{c}"' for c in self.KEY_COLUMNS)
+            self.conn.execute(f'CREATE TABLE "{self.TABLE}" ({cols}, PRIMARY KEY ({keys}))')
+        else:
+            # New header fields (e.g. a new JSON key) become new nullable columns
+            for c in df.columns:
+                if c not in existing:
+                    self.conn.execute(f'ALTER TABLE "{self.TABLE}" ADD COLUMN "{c}" {_sql_type(df[c].dtype)}')
+        for c in self.INDEXED_COLUMNS:
+            if c in df.columns or c in existing:
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{self.TABLE}_{c}" ON "{self.TABLE}" ("{c}")')
+
+    def upsert(self, df: pd.DataFrame):
+        """Insert or update one row per (Subject_ID, VISCODE) from `df`. Returns the number of rows written."""
+        df = df.loc[:, ~df.columns.duplicated()]
+        self._ensure_schema(df)
+        cols = list(df.columns)
+        col_sql = ", ".join(f'"{c}"' for c in cols)
+        updates = ", ".join(f'"{c}" = excluded."{c}"' for c in cols if c not in self.KEY_COLUMNS)
+        keys = ", ".join(f'"{c}"' for c in self.KEY_COLUMNS)
+        sql = (
+            f'INSERT INTO "{self.TABLE}" ({col_sql}) VALUES ({", ".join("?" * len(cols))}) '
+            f"ON CONFLICT ({keys}) DO UPDATE SET {updates}"
+        )
+        rows = ([_sql_value(v) for v in row] for row in df.itertuples(index=False, name=None))
+        with self.conn:
+            self.conn.executemany(sql, rows)
+        return len(df)
+
+    def prune(self, df: pd.DataFrame):
+        """Delete stored sessions whose (Subject_ID, VISCODE) is not in `df`. Returns the number deleted."""
+        keep = df[self.KEY_COLUMNS].astype(str).drop_duplicates()
+        with self.conn:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_keys (Subject_ID TEXT, VISCODE TEXT)")
+            self.conn.execute("DELETE FROM keep_keys")
+            self.conn.executemany("INSERT INTO keep_keys VALUES (?, ?)", keep.itertuples(index=False, name=None))
+            cur = self.conn.execute(
+                f'DELETE FROM "{self.TABLE}" WHERE NOT EXISTS ('
+                f'SELECT 1 FROM keep_keys k WHERE k.Subject_ID = "{self.TABLE}".Subject_ID '
+                f'AND k.VISCODE = "{self.TABLE}".VISCODE)'
+            )
+        return cur.rowcount
+
+    def query(self, where=None, params=(), columns=None) -> pd.DataFrame:
+        """
+        Return matching sessions as a DataFrame.
+
+        Args:
+            where (str): Optional SQL condition with ? placeholders, e.g. "json_Manufacturer = ?".
+            params (tuple): Values for the placeholders.
+            columns (list): Columns to return (default: all).
+        """
+        col_sql = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+        sql = f'SELECT {col_sql} FROM "{self.TABLE}"' + (f" WHERE {where}" if where else "")
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def get_subject(self, subject_id, columns=None) -> pd.DataFrame:
+        return self.query('"Subject_ID" = ?', (subject_id,), columns)
+
+    def get_session(self, subject_id, viscode, columns=None) -> pd.DataFrame:
+        return self.query('"Subject_ID" = ? AND "VISCODE" = ?', (subject_id, viscode), columns)
+
+    def get_image(self, image_id, columns=None) -> pd.DataFrame:
+        return self.query('"Image_ID" = ?', (int(image_id),), columns)
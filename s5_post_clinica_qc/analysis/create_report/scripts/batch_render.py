@@ -0,0 +1,142 @@
+#%%
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import plots
+from plots import REMAINING_PARAMETERS, set_plot_output, write_plotlyjs
+from config import CONFIG, PLOT_OUTPUT
+from session_pipeline import SessionFilterPipeline
+#%%
+
+# Render every report plot to HTML without Jupyter, e.g. on a compute node:
+#   python scripts/batch_render.py ../create_mastersheet/data/statadni/anchor_plus_dicom_nifti_struct.csv --workers 8
+# Figures are never shown; each job writes its own HTML file.
+
+
+def plot_jobs(output_dir):
+    """
+    (frame, plots function name, keyword arguments) for every plot of the report. Frames are the
+    ones main.ipynb draws from: "phase0"/"phase1" (rows remaining after that phase, input of the
+    next phase's plots) and "final". The remaining parameter plots are one job per column so
+    they render in parallel too.
+    """
+    phase_dir = os.path.join(output_dir, "phases")
+    final_dir = os.path.join(output_dir, "final_plots")
+    jobs = [
+        ("phase0", "render_scan_depth_plot", {"html_path": f"{phase_dir}/scan_depth_plot_phase1.html"}),
+        ("phase0", "render_repetition_time_plot", {"html_path": f"{phase_dir}/repetition_time_by_site.html"}),
+        ("phase0", "render_total_duration_plot", {"html_path": f"{phase_dir}/total_duration_plot_phase1.html"}),
+        ("phase1", "render_coil_string_plot", {"html_path": f"{phase_dir}/coil_string_by_site.html"}),
+        ("phase1", "render_percent_phase_fov_plot", {"html_path": f"{phase_dir}/percent_phase_fov_by_site.html"}),
+        ("final", "render_scan_depth_plot", {"html_path": f"{final_dir}/scan_depth.html"}),
+        ("final", "render_repetition_time_plot", {"html_path": f"{final_dir}/tr_plot.html"}),
+        ("final", "render_total_duration_plot", {"html_path": f"{final_dir}/total_duration.html"}),
+        ("final", "render_coil_string_plot", {"html_path": f"{final_dir}/coil_string.html"}),
+        ("final", "render_percent_phase_fov_plot", {"html_path": f"{final_dir}/percent_phase_fov.html"}),
+        ("final", "render_multiband_vs_singleband_plot", {"html_path": f"{final_dir}/mb_vs_sb_timeline.html"}),
+    ]
+    jobs = [(frame, func, {**kwargs, "produce_html": True, "show": False}) for frame, func, kwargs in jobs]
+    jobs += [
+        ("final", "render_remaining_parameters_plot",
+         {"produce_html": True, "html_dir": final_dir, "columns": [col], "show": False})
+        for col in REMAINING_PARAMETERS
+    ]
+    jobs.append(("final", "render_subject_session_histogram", {"output_html": f"{final_dir}/sessions_per_subject.html"}))
+    return jobs
+
+
+_frames = {}
+
+
+def _init_worker(frames, plot_output):
+    _frames.update(frames)
+    set_plot_output(**plot_output)
+
+
+def _render(job):
+    frame, func, kwargs = job
+    start = time.perf_counter()
+    getattr(plots, func)(_frames[frame], **kwargs)
+    return job, time.perf_counter() - start
+
+
+def render_report_plots(pipeline, output_dir="report_plots", workers=None, jobs=None, **plot_output):
+    """
+    Write every report plot as HTML, rendering jobs in parallel worker processes.
+
+    Args:
+        pipeline (SessionFilterPipeline): Pipeline after run().
+        output_dir (str): Root directory; phase plots go to phases/, final ones to final_plots/.
+        workers (int): Worker processes (default: one per CPU, at most one per job); 1 renders serially.
+        jobs (list): Override plot_jobs(output_dir).
+        **plot_output: PLOT_OUTPUT options (shared_plotlyjs, webgl_threshold, aggregate_points).
+
+    Returns:
+        list: (job, seconds) per rendered plot, in completion order.
+    """
+    jobs = plot_jobs(output_dir) if jobs is None else jobs
+    frames = {"final": pipeline.df_current}
+    for key, phase in (("phase0", 0), ("phase1", 1)):
+        if phase in pipeline.phase_checkpoints:
+            frames[key] = pipeline.phase_checkpoints[phase]
+    skipped = [job for job in jobs if job[0] not in frames]
+    if skipped:
+        print(f"Skipping {len(skipped)} plots whose phase was not run.")
+    jobs = [job for job in jobs if job[0] in frames]
+
+    # Green bands of the pipeline's own registry and threshold overrides
+    bands = {
+        "render_scan_depth_plot": pipeline.accepted_ranges("ScanDepth"),
+        "render_repetition_time_plot": pipeline.accepted_ranges(CONFIG["repetition_time"]),
+    }
+    jobs = [(frame, func, {"bands": bands[func], **kwargs} if func in bands else kwargs) for frame, func, kwargs in jobs]
+
+    set_plot_output(**plot_output)
+    for _, _, kwargs in jobs:
+        path = kwargs.get("html_path") or kwargs.get("output_html")
+        directory = kwargs.get("html_dir") or os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        if PLOT_OUTPUT["shared_plotlyjs"]:
+            write_plotlyjs(directory)  # once per directory, before workers start writing HTML
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs)) or 1
+    if workers == 1:
+        _init_worker(frames, dict(PLOT_OUTPUT))
+        return [_render(job) for job in jobs]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(frames, dict(PLOT_OUTPUT))) as pool:
+        for future in as_completed([pool.submit(_render, job) for job in jobs]):
+            results.append(future.result())
+    return results
+
+
+def main(csv_path, output_dir="report_plots", workers=None, phase_limit=3, **plot_output):
+    start = time.perf_counter()
+    pipeline = SessionFilterPipeline(csv_path)
+    pipeline.run(phase_limit=phase_limit, verbose=False)
+    results = render_report_plots(pipeline, output_dir=output_dir, workers=workers, **plot_output)
+    slowest = sorted(results, key=lambda r: r[1], reverse=True)[:5]
+    print(f"Rendered {len(results)} plots to {output_dir} in {time.perf_counter() - start:.1f}s. Slowest:")
+    for (frame, func, kwargs), seconds in slowest:
+        print(f"  {seconds:6.2f}s  {func} ({frame}{', ' + kwargs['columns'][0] if 'columns' in kwargs else ''})")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render all QC report plots to HTML in parallel, without Jupyter.")
+    parser.add_argument("csv_path", help="Mastersheet (CSV, Parquet or SQLite) from create_mastersheet/main.py.")
+    parser.add_argument("--output-dir", default="report_plots", help="Output directory (default: report_plots).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+    parser.add_argument("--phase-limit", type=int, default=3, help="Run heuristics up to this phase (default: all).")
+    # PLOT_OUTPUT options default to config.PLOT_OUTPUT; only the flags given are forwarded
+    parser.add_argument("--shared-plotlyjs", action="store_true", default=argparse.SUPPRESS,
+                        help="Write plotly.js once per directory instead of into every HTML file.")
+    parser.add_argument("--webgl-threshold", type=int, default=argparse.SUPPRESS,
+                        help="Use WebGL scatter traces above this many points.")
+    parser.add_argument("--aggregate-points", action="store_true", default=argparse.SUPPRESS,
+                        help="Draw identical (Site, value) points once, sized by session count.")
+    args = vars(parser.parse_args())
+
+    main(args.pop("csv_path"), output_dir=args.pop("output_dir"), workers=args.pop("workers"),
+         phase_limit=args.pop("phase_limit"), **args)
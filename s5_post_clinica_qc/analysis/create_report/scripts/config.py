@@ -23,4 +23,97 @@ CONFIG = {
     "SeriesDate": "dicom_SeriesDate",
     "PTID": "Subject_ID",
     "T1w_exists": "T1w_exists" 
-}
\ No newline at end of file
+}
+
+# Session filters, in the order they are applied. Each heuristic keeps the rows that satisfy all
+# of its rules; a rule is {"column": CONFIG key or column name, "op": one of heuristics.OPERATORS,
+# plus "value" / "values" / "range" / "ranges" as the operator needs}. Set "warn_missing" to print
+# how many rows have no value. "label" and "description" go in the summary table; the phase
+# summaries use "summary_label"/"summary" (default: label/description), "rationale", "short_label"
+# (drop tables) and "missing" ({label: columns} whose missing values are counted, default: the
+# columns the rules read). Texts may use {value} / {values} / {range} / {ranges} / {low} / {high} /
+# {value_minutes}, filled in from the rules after threshold overrides. Load a different cohort's filters from YAML with
+# heuristics.load_heuristics("filters.yaml") (same structure) and pass them to run_heuristics.
+HEURISTICS = {
+    "filter_missing_data_adnidap": {
+        "phase": 0,
+        "label": "BIDS",
+        "description": "Sessions flagged due to known errors in Clinica BIDS conversion.",
+        "rules": [{"column": "Image_ID", "op": "not_in", "values": [1341794, 401073, 1636121, 1259845]}],
+    },
+    "filter_missing_data": {
+        "phase": 0,
+        "label": "Missing Data",
+        "description": "Sessions where required NIfTI or JSON files are missing after Clinica conversion.",
+        "summary": "Sessions where required `NIfTI` or `JSON` files are missing **after Clinica/BIDS conversion**, "
+                   "even if no error was reported.",
+        "rules": [
+            {"column": "nifti_exists", "op": "is_true"},
+            {"column": "json_exists", "op": "is_true"},
+        ],
+    },
+    "filter_missing_t1w": {
+        "phase": 0,
+        "label": "T1w Image Missing",
+        "description": "Session does not have a T1-weighted image.",
+        "rules": [{"column": "T1w_exists", "op": "is_true"}],
+    },
+    "filter_low_scan_depth": {
+        "phase": 1,
+        "label": "ScanDepth (dim3×pixdim3)",
+        "short_label": "ScanDepth",
+        "description": "Scan Depth (dim₃ × pixdim₃) is outside the range {range}.",
+        "summary_label": "ScanDepth (dim₃ × pixdim₃)",
+        "summary": "Sessions with dim₃ × pixdim₃ < {low} were flagged.",
+        "rationale": "ScanDepth values above {low} typically reflect sufficient anatomical coverage.",
+        "missing": {"ScanDepth": ["nifti_dim", "nifti_pixdim"]},
+        "rules": [{"column": "ScanDepth", "op": "between", "range": [155, 180], "warn_missing": True}],
+    },
+    "filter_invalid_repetition_time": {
+        "phase": 1,
+        "label": "RepetitionTime (TR)",
+        "short_label": "RepetitionTime",
+        "description": "Sessions where TR falls outside {ranges} seconds.",
+        "summary": "Sessions with TR outside {ranges} seconds were flagged.",
+        "rationale": "TR values within {ranges} seconds are considered standard for multiband and single-band protocols.",
+        "missing": {"TR": ["repetition_time"]},
+        "rules": [{"column": "repetition_time", "op": "between_any", "ranges": [[0.5, 1.0], [2.9, 3.1]]}],
+    },
+    "filter_short_duration": {
+        "phase": 1,
+        "label": "Scan Duration",
+        "description": "Sessions where total scan duration (TR × volumes) is less than {value_minutes} minutes.",
+        "summary": "Sessions where `TR × volumes` is < {value} seconds (i.e., under {value_minutes} minutes).",
+        "rationale": "Short scans (<{value_minutes} minutes) may indicate incomplete acquisitions.",
+        "missing": {},  # TR is reported by filter_invalid_repetition_time
+        # Use {"op": "between", "range": [300, 900]} for a 5–15 min range
+        "rules": [{"column": "Duration_sec", "op": ">=", "value": 300}],
+    },
+    "filter_low_percent_phase_fov": {
+        "phase": 2,
+        "label": "PercentPhaseFOV",
+        "description": "A session with an unusually low value of ≤ {value}.",
+        "summary": "Sessions with json_PercentPhaseFOV ≤ {value} were flagged.",
+        "rationale": "An unusually low PercentPhaseFOV (e.g., {value}%) may indicate problematic field coverage.",
+        "rules": [{"column": "percent_phase_fov", "op": ">", "value": 72}],
+    },
+    "filter_out_bad_coils": {
+        "phase": 2,
+        "label": "CoilString",
+        "description": "Sessions that use {values} coils.",
+        "summary": "Sessions that used {values} coils were flagged for exclusion.",
+        "rationale": "Additionally, coils labeled {values} are not used for brain imaging.",
+        "rules": [{"column": "coil_string", "op": "not_in", "values": ["Q-Body", "BODY"]}],
+    },
+}
+
+# How plots.py draws and writes figures; change with plots.set_plot_output(...)
+PLOT_OUTPUT = {
+    "shared_plotlyjs": False,   # write plotly.min.js once per output directory and reference it from each HTML file
+    "webgl_threshold": None,    # draw scatter plots with WebGL (scattergl) above this many points; None = plotly default
+    "aggregate_points": False,  # draw identical (Site, value, ...) points once, sized by their number of sessions
+}
+
+# On-disk cache of rendered figures (see figure_cache.py); a plot is only redrawn when the columns
+# it reads or its parameters change. Least recently used figures are deleted beyond max_mb.
+FIGURE_CACHE = {"enabled": True, "directory": ".figure_cache", "max_mb": 256}
@@ -0,0 +1,158 @@
+import functools
+import hashlib
+import inspect
+import os
+import plotly
+import plotly.io as pio
+from config import CONFIG, FIGURE_CACHE as FIGURE_CACHE_SETTINGS, PLOT_OUTPUT
+from mask_cache import fingerprint
+from mastersheet import ensure_derived_columns
+
+
+class FigureCache:
+    """
+    Content-addressed on-disk cache of plotly figures (serialized JSON), keyed on a hash of the
+    renderer name, its parameters, its code (see code_fingerprint), the PLOT_OUTPUT options, the
+    plotly version and a fingerprint of only the columns the plot reads. Least recently used files are deleted once the directory
+    grows beyond `max_mb`. Safe to share between the batch renderer's worker processes.
+
+    Example usage:
+        cache = FigureCache(".figure_cache", max_mb=256)
+        fig = cache.get_or_build("render_coil_string_plot", df, ["Site", "json_CoilString"], {}, build,
+                                 code=code_fingerprint(render_coil_string_plot))
+    """
+
+    def __init__(self, directory=".figure_cache", max_mb=256):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, name, df, columns, params, code=""):
+        h = hashlib.sha256()
+        h.update(repr((name, sorted(params.items()), code, sorted(PLOT_OUTPUT.items()), plotly.__version__)).encode())
+        h.update(fingerprint(df, [c for c in columns if c in df.columns]).encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """The cached figure, or None. A hit marks the file as recently used."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                fig = pio.from_json(f.read())
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return fig
+
+    def put(self, key, fig):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(fig.to_json())
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get_or_build(self, name, df, columns, params, build, code=""):
+        """Return the cached figure for these inputs and renderer `code`, or call `build()` and cache its result."""
+        key = self.key(name, df, columns, params, code)
+        fig = self.get(key)
+        if fig is not None:
+            self.hits += 1
+            return fig
+        self.misses += 1
+        fig = build()
+        self.put(key, fig)
+        return fig
+
+    def evict(self):
+        """Delete least recently used figures until the cache fits in max_mb."""
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+        except FileNotFoundError:
+            return
+        files = []
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # already removed by another worker
+            total -= size
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json"):
+                    os.remove(entry.path)
+        self.hits = self.misses = 0
+
+
+def code_fingerprint(func):
+    """
+    Hash of the source of the module defining `func` (or of `func` itself if the module has no
+    source file), so editing a renderer or the helpers it calls invalidates its cached figures.
+    Take it when the renderer is defined: an edited file only counts once it is reloaded.
+    """
+    try:
+        source = inspect.getsource(inspect.getmodule(func))
+    except (OSError, TypeError):
+        try:
+            source = inspect.getsource(func)
+        except (OSError, TypeError):
+            source = repr((func.__code__.co_code, func.__code__.co_consts))
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+# Shared by the plots.py renderers; None when disabled in config.FIGURE_CACHE
+FIGURE_CACHE = FigureCache(FIGURE_CACHE_SETTINGS["directory"], FIGURE_CACHE_SETTINGS["max_mb"]) \
+    if FIGURE_CACHE_SETTINGS["enabled"] else None
+
+
+def cached_render(columns, write_html):
+    """
+    Decorator for renderers with the (df, produce_html, html_path, show, ...) signature: the
+    figure is built with show=False/produce_html=False only when the plot's `columns` or other
+    parameters changed, and is then shown and/or written as usual.
+
+    `write_html(fig, path)` is the writer the renderer itself uses (plots._write_html).
+    """
+    def decorate(render):
+        signature = inspect.signature(render)
+        code = code_fingerprint(render)
+
+        @functools.wraps(render)
+        def wrapper(*args, **kwargs):
+            if FIGURE_CACHE is None:
+                return render(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            call = dict(bound.arguments)
+            df = ensure_derived_columns(call.pop("df"), CONFIG)
+            produce_html, html_path, show = call.pop("produce_html"), call.pop("html_path"), call.pop("show")
+
+            fig = FIGURE_CACHE.get_or_build(
+                render.__name__, df, columns, call,
+                lambda: render(df, produce_html=False, html_path=html_path, show=False, **call),
+                code=code,
+            )
+            if show:
+                fig.show()
+            if produce_html:
+                write_html(fig, html_path)
+                print(f"Plot saved to: {html_path}")
+            return fig
+        return wrapper
+    return decorate
@@ -1,85 +1,197 @@
-import ast
+# Heuristic rule engine
+# The heuristics themselves are declared in config.HEURISTICS (or a YAML file with the same
+# structure); this module compiles their rules into vectorized NumPy masks.
+# ScanDepth and Duration_sec are precomputed by mastersheet.add_derived_columns (see SessionFilterPipeline)
+import copy
+import operator
+import numpy as np
+import pandas as pd
 
-# Individual Heuristic Functions
+COMPARISONS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
 
-def filter_invalid_repetition_time(df, config):
-    """
-    Return rows where json_RepetitionTime is either in [0.5, 1.0] or [2.9, 3.1].
-    """
-    col = config["repetition_time"]
-    return ((df[col] >= 0.5) & (df[col] <= 1.0)) | ((df[col] >= 2.9) & (df[col] <= 3.1))
+# Every operator a rule can use, with the rule field holding its threshold
+OPERATORS = {
+    ">": "value", ">=": "value", "<": "value", "<=": "value",
+    "==": "value", "!=": "value",
+    "between": "range",       # inclusive [low, high]; missing values fail
+    "between_any": "ranges",  # inside at least one inclusive [low, high]
+    "in": "values",
+    "not_in": "values",
+    "is_true": None,          # True / "TRUE" (case-insensitive, as written by create_mastersheet)
+}
 
-def filter_out_bad_coils(df, config):
-    """
-    Exclude rows where json_CoilString is one of the bad coils.
-    """
-    bad_coils = ['Q-Body', 'BODY']
-    col = config["coil_string"]
-    return ~df[col].isin(bad_coils)
 
-def filter_low_scan_depth(df, config):
-    """
-    Keep rows where 180 => nifti_dim[3] * nifti_pixdim[3] >= 155.
-    Handles malformed strings and NaNs gracefully.
-    """
-    dim_col = config["nifti_dim"]
-    pixdim_col = config["nifti_pixdim"]
-    def is_valid(row):
-        try:
-            dim = ast.literal_eval(row[dim_col])
-            pixdim = ast.literal_eval(row[pixdim_col])
-            depth = dim[3] * pixdim[3]
-            return 155 <= depth <= 180
-        except Exception:
-            print(f"Malformed data in row: {row.name}, skipping.")
-            return False
-    return df.apply(is_valid, axis=1)
-
-def filter_missing_data(df, config):
-    """
-    Filter out rows where either NIfTI or JSON does not exist.
-    Must be marked 'TRUE' (case-insensitive) in both fields.
-    """
-    nifti_col = config["nifti_exists"]
-    json_col = config["json_exists"]
-    nifti_mask = df[nifti_col].astype(str).str.strip().str.upper() == "TRUE"
-    json_mask = df[json_col].astype(str).str.strip().str.upper() == "TRUE"
-    return nifti_mask & json_mask
+def _numeric(values):
+    """Column as a float array (non-numeric entries become NaN, which fails every comparison)."""
+    if values.dtype.kind in "biuf":
+        return values.astype(float, copy=False)
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
 
-def filter_missing_data_adnidap(df, config):
-    """
-    Filter out rows identified as bad by ADNIDap QC.
-    This is a static example and should eventually be replaced with real QC logic.
-    """
-    bad_image_ids = [1341794, 401073, 1636121, 1259845]
-    return ~df["Image_ID"].isin(bad_image_ids)
 
-def filter_low_percent_phase_fov(df, config):
-    """
-    Remove rows where json_PercentPhaseFOV is less than or equal to 72.
+def rule_mask(df, config, rule):
     """
-    col = config["percent_phase_fov"]
-    # return (df[col] >= 72) & (df[col] <= 130)
-    return df[col] > 72
+    Boolean pass mask (numpy array) of one rule.
+
+    Args:
+        df (pd.DataFrame): Mastersheet with derived columns.
+        config (dict): CONFIG; rule columns may be CONFIG keys or column names.
+        rule (dict): {"column", "op", and the field named in OPERATORS[op]}.
+
+    Returns:
+        np.ndarray: True for rows that pass.
+    """
+    op = rule["op"]
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator {op!r} in rule {rule}; expected one of {sorted(OPERATORS)}.")
+    col = config.get(rule["column"], rule["column"])
+    values = df[col].to_numpy()
+
+    if rule.get("warn_missing"):
+        n_missing = int(pd.isna(values).sum())
+        if n_missing:
+            print(f"Malformed or missing {col} in {n_missing} rows, skipping.")
+
+    if op in COMPARISONS:
+        with np.errstate(invalid="ignore"):
+            return COMPARISONS[op](_numeric(values), rule["value"])
+    if op == "between":
+        low, high = rule["range"]
+        x = _numeric(values)
+        with np.errstate(invalid="ignore"):
+            return (x >= low) & (x <= high)
+    if op == "between_any":
+        x = _numeric(values)
+        mask = np.zeros(len(x), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for low, high in rule["ranges"]:
+                mask |= (x >= low) & (x <= high)
+        return mask
+    if op in ("in", "not_in"):
+        isin = pd.Series(values).isin(list(rule["values"])).to_numpy()
+        return isin if op == "in" else ~isin
+    if op in ("==", "!="):
+        equal = pd.Series(values).eq(rule["value"]).to_numpy()
+        return equal if op == "==" else ~equal
+    # is_true
+    if values.dtype == bool:
+        return values.copy()
+    return pd.Series(values).astype(str).str.strip().str.upper().eq("TRUE").to_numpy()
 
-def filter_missing_t1w(df, config):
-    """
-    Filter out rows where the T1-weighted image does not exist.
-    Requires the column to be 'TRUE' (case-insensitive).
-    """
-    col = config["T1w_exists"]
-    return df[col].astype(str).str.strip().str.upper() == "TRUE"
 
-def filter_short_duration(df, config):
+def evaluate_rules(df, config, rules):
+    """Pass mask of a heuristic: rows satisfying every rule in `rules`."""
+    mask = np.ones(len(df), dtype=bool)
+    for rule in rules:
+        mask &= rule_mask(df, config, rule)
+    return mask
+
+
+def resolve_rules(heuristic, params=None):
+    """
+    The heuristic's rules with threshold overrides applied. `params` fields (e.g. {"value": 70},
+    {"range": [150, 180]}) replace that field in every rule of the heuristic that has it.
+    """
+    rules = copy.deepcopy(heuristic["rules"])
+    for field, value in (params or {}).items():
+        matched = [rule for rule in rules if field in rule]
+        if not matched:
+            raise KeyError(f"No rule of this heuristic has a {field!r} field: {heuristic['rules']}")
+        for rule in matched:
+            rule[field] = value
+    return rules
+
+
+def _format_field(field, value):
+    """Threshold as shown in the report text: [155, 180], [0.5–1.0] or [2.9–3.1], Q-Body or BODY, 72."""
+    if field == "range":
+        return f"[{value[0]}, {value[1]}]"
+    if field == "ranges":
+        return " or ".join(f"[{low}–{high}]" for low, high in value)
+    if field == "values":
+        return " or ".join(str(v) for v in value)
+    return str(value)
+
+
+def describe(heuristic, params=None, key="description"):
+    """
+    The heuristic's `key` text ("description", "summary" or "rationale") with {value}, {values},
+    {range} and {ranges} placeholders filled in from its rules after threshold overrides, so the
+    report states the cutoffs that were actually applied. {low}/{high} are the bounds of a range
+    and {value_minutes} a value in seconds shown in minutes.
+    """
+    fields = {}
+    for rule in resolve_rules(heuristic, params):
+        for field in ("value", "values", "range", "ranges"):
+            if field in rule and field not in fields:
+                fields[field] = _format_field(field, rule[field])
+        if "range" in rule and "low" not in fields:
+            fields["low"], fields["high"] = (str(v) for v in rule["range"])
+        if isinstance(rule.get("value"), (int, float)) and "value_minutes" not in fields:
+            fields["value_minutes"] = f"{rule['value'] / 60:g}"
+    text = heuristic.get(key, "")
+    try:
+        return text.format(**fields)
+    except (KeyError, IndexError, ValueError):
+        return text  # placeholder without a matching rule field, or literal braces
+
+
+def accepted_ranges(heuristics, column, config, params=None):
+    """
+    [low, high] ranges that pass the between/between_any rules on `column` across the registry
+    (after threshold overrides in `params`, {heuristic_name: {field: value}}); drawn as the
+    green bands of the report plots.
+    """
+    ranges = []
+    for name, heuristic in heuristics.items():
+        for rule in resolve_rules(heuristic, (params or {}).get(name)):
+            if config.get(rule["column"], rule["column"]) != column:
+                continue
+            if rule["op"] == "between":
+                ranges.append(list(rule["range"]))
+            elif rule["op"] == "between_any":
+                ranges.extend(list(r) for r in rule["ranges"])
+    return ranges
+
+
+def input_columns(heuristic, config):
+    """Mastersheet columns the heuristic's rules read."""
+    return list(dict.fromkeys(config.get(rule["column"], rule["column"]) for rule in heuristic["rules"]))
+
+
+def missing_columns(heuristic, config):
     """
-    Keep rows where total scan duration (TR × n_volumes) is at least 300 seconds.
-    Optional upper bound: exclude sessions longer than 900 seconds (15 minutes).
+    {label: [columns]} whose missing values the phase summaries report for the heuristic, from its
+    "missing" entry (the counts of a label's columns are added up, e.g. ScanDepth from the nifti_dim
+    and nifti_pixdim headers). Without one, every column its rules read is reported under its own name.
     """
-    df = df.copy()
-    df["nifti_dim"] = df["nifti_dim"].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-    df["n_volumes"] = df["nifti_dim"].apply(lambda dim: dim[4] if isinstance(dim, list) and len(dim) > 4 else None)
-    df["TR"] = df[config["repetition_time"]]
-    df["Duration_sec"] = df["TR"] * df["n_volumes"]
-
-    # return (df["Duration_sec"] >= 300) & (df["Duration_sec"] <= 900)  # Use this for  5–15 min range
-    return df["Duration_sec"] >= 300
\ No newline at end of file
+    if "missing" not in heuristic:
+        return {col.replace("json_", "").replace("dicom_", ""): [col] for col in input_columns(heuristic, config)}
+    return {label: [config.get(col, col) for col in cols] for label, cols in heuristic["missing"].items()}
+
+
+def validate_heuristics(heuristics):
+    """Check that every heuristic has a phase and well-formed rules; raises ValueError otherwise."""
+    for name, heuristic in heuristics.items():
+        if "phase" not in heuristic or not heuristic.get("rules"):
+            raise ValueError(f"Heuristic {name!r} needs a 'phase' and a non-empty 'rules' list.")
+        for rule in heuristic["rules"]:
+            if rule.get("op") not in OPERATORS or "column" not in rule:
+                raise ValueError(f"Heuristic {name!r} has an invalid rule {rule}; operators: {sorted(OPERATORS)}.")
+            field = OPERATORS[rule["op"]]
+            if field and field not in rule:
+                raise ValueError(f"Heuristic {name!r}: operator {rule['op']!r} needs a {field!r} field.")
+    return heuristics
+
+
+def load_heuristics(path):
+    """
+    Read a heuristic registry from YAML (same structure as config.HEURISTICS, a mapping of
+    heuristic name to phase/label/description/rules). Requires PyYAML.
+    """
+    try:
+        import yaml
+    except ImportError as e:
+        raise ImportError("Reading heuristics from YAML requires PyYAML (pip install pyyaml).") from e
+    with open(path) as f:
+        heuristics = yaml.safe_load(f)
+    return validate_heuristics(heuristics)
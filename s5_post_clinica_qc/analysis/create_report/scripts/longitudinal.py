@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+from config import CONFIG
+
+# Sentinel for sessions without a usable SeriesDate (days since epoch)
+_NO_DATE = np.iinfo(np.int64).min
+
+
+def visit_month(viscode):
+    """Months since baseline from an ADNI VISCODE ("bl"/"sc" -> 0, "m06" -> 6); NaN if unknown."""
+    months = pd.Series(viscode, dtype="string").str.lower().str.extract(r"^m(\d+)$")[0].astype(float)
+    baseline = pd.Series(viscode, dtype="string").str.lower().isin(["bl", "sc", "scmri", "init"])
+    return months.mask(baseline.fillna(False).to_numpy(), 0.0).to_numpy()
+
+
+def series_dates(values):
+    """
+    YYYYMMDD SeriesDate values (20110616, 20110616.0 as read from CSV, or "20110616") as
+    datetimes; empty or malformed values become NaT.
+    """
+    text = pd.Series(values).astype("string").str.replace(r"\.0+$", "", regex=True)
+    return pd.to_datetime(text, format="%Y%m%d", errors="coerce")
+
+
+class LongitudinalIndex:
+    """
+    Per-subject session timelines built once from the pipeline result.
+
+    Sessions are stored as flat arrays sorted by subject, SeriesDate and visit month, and
+    `offsets[i]:offsets[i + 1]` are the sessions of `subjects[i]` (CSR layout), so per-subject
+    questions are np.*.reduceat over segments instead of pandas scans.
+
+    Arrays: viscode, month (months since baseline), date (days since 1970, _NO_DATE if missing),
+    failure_bits (heuristics failed), passed (kept by the pipeline), is_mb (ScanType == "MB"),
+    row (position in df_original).
+
+    Example usage:
+        index = pipeline.longitudinal
+        index.subjects_with(min_sessions=3, min_span_months=24)
+        index.protocol_switches(by="Site")
+    """
+
+    def __init__(self, df, failure_bits=None, passed=None):
+        n = len(df)
+        subject = df[CONFIG["PTID"]].astype(str).to_numpy()
+        viscode = df["VISCODE"].astype("string").fillna("").to_numpy(dtype=object)
+        month = visit_month(df["VISCODE"])
+        dates = series_dates(df[CONFIG["SeriesDate"]])
+        days = np.where(dates.isna(), _NO_DATE, dates.to_numpy(dtype="datetime64[D]").astype(np.int64))
+        scan_type = df["ScanType"].to_numpy() if "ScanType" in df.columns else np.full(n, "", dtype=object)
+
+        # Sort by subject, then date (missing last), then visit month
+        sort_days = np.where(days == _NO_DATE, np.iinfo(np.int64).max, days)
+        order = np.lexsort((np.nan_to_num(month, nan=np.inf), sort_days, subject))
+        self.row = order
+        subject = subject[order]
+        starts = np.flatnonzero(np.r_[True, subject[1:] != subject[:-1]]) if n else np.array([], dtype=np.intp)
+        self.subjects = subject[starts]
+        self.offsets = np.r_[starts, n].astype(np.intp)
+        self.subject_of = np.repeat(np.arange(len(starts)), np.diff(self.offsets))
+
+        self.viscode = viscode[order]
+        self.month = month[order]
+        self.date = days[order]
+        self.failure_bits = (failure_bits[order] if failure_bits is not None else np.zeros(n, dtype=np.uint64))
+        self.passed = passed[order] if passed is not None else np.ones(n, dtype=bool)
+        self.is_mb = scan_type[order] == "MB"
+        self.site = pd.Series(self.subjects, dtype="string").str[:3].to_numpy(dtype=object)
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        return cls(pipeline.df_original, pipeline.failure_bits, pipeline.kept_mask)
+
+    def _segment_sum(self, values):
+        if not len(self.subjects):
+            return np.zeros(0, dtype=np.int64)
+        return np.add.reduceat(values.astype(np.int64), self.offsets[:-1])
+
+    def sessions_per_subject(self, passing=True):
+        """Number of (passing) sessions of every subject, as a Series indexed by Subject_ID."""
+        counts = self._segment_sum(self.passed if passing else np.ones(len(self.passed), dtype=bool))
+        return pd.Series(counts, index=pd.Index(self.subjects, name=CONFIG["PTID"]), name="Sessions")
+
+    def span_months(self, passing=True):
+        """Months between the first and last dated (passing) session of every subject (NaN if < 1 dated session)."""
+        use = (self.date != _NO_DATE) & (self.passed if passing else True)
+        if not len(self.subjects):
+            return pd.Series(dtype=float)
+        first = np.minimum.reduceat(np.where(use, self.date, np.iinfo(np.int64).max), self.offsets[:-1])
+        last = np.maximum.reduceat(np.where(use, self.date, np.iinfo(np.int64).min), self.offsets[:-1])
+        has_date = self._segment_sum(use) > 0
+        span = np.where(has_date, (last - first) / 30.4375, np.nan)
+        return pd.Series(span, index=pd.Index(self.subjects, name=CONFIG["PTID"]), name="SpanMonths")
+
+    def subjects_with(self, min_sessions=1, min_span_months=0, passing=True):
+        """Subject IDs with at least `min_sessions` (passing) sessions spanning `min_span_months` or more."""
+        sessions = self.sessions_per_subject(passing).to_numpy()
+        span = self.span_months(passing).to_numpy()
+        keep = (sessions >= min_sessions) & (np.nan_to_num(span, nan=-1) >= min_span_months)
+        return list(self.subjects[keep])
+
+    def protocol_switches(self, by="Site", passing=True):
+        """
+        Consecutive sessions of the same subject whose ScanType changes, counted as MB→SB and
+        SB→MB per site (by="Site") or per subject (by="Subject_ID").
+        """
+        idx = np.flatnonzero(self.passed) if passing else np.arange(len(self.passed))
+        subject, is_mb = self.subject_of[idx], self.is_mb[idx]
+        same = subject[1:] == subject[:-1]
+        mb_to_sb = same & is_mb[:-1] & ~is_mb[1:]
+        sb_to_mb = same & ~is_mb[:-1] & is_mb[1:]
+        owner = subject[1:]
+        keys = self.site[owner] if by == "Site" else self.subjects[owner]
+        counts = pd.DataFrame({by: keys, "MB→SB": mb_to_sb.astype(int), "SB→MB": sb_to_mb.astype(int)})
+        return counts.groupby(by)[["MB→SB", "SB→MB"]].sum()
+
+    def timeline(self, subject):
+        """The sessions of one subject in order, with row positions into df_original."""
+        i = np.searchsorted(self.subjects, subject)
+        if i == len(self.subjects) or self.subjects[i] != subject:
+            raise KeyError(f"Unknown subject: {subject}")
+        s = slice(self.offsets[i], self.offsets[i + 1])
+        dates = np.where(self.date[s] == _NO_DATE, np.datetime64("NaT"), self.date[s].astype("datetime64[D]"))
+        return pd.DataFrame({
+            "VISCODE": self.viscode[s],
+            "month": self.month[s],
+            "SeriesDate": dates,
+            "ScanType": np.where(self.is_mb[s], "MB", "SB"),
+            "passed": self.passed[s],
+            "failure_bits": self.failure_bits[s],
+            "row": self.row[s],
+        })
@@ -0,0 +1,78 @@
+import hashlib
+import inspect
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+def fingerprint(df, columns):
+    """
+    Content hash of `columns` of `df` (values and index), so a cached mask is only reused for
+    the same rows with the same values.
+    """
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise KeyError(f"Columns not in mastersheet: {missing}")
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(list(columns)).encode())
+    h.update(pd.util.hash_pandas_object(df[list(columns)], index=True).values.tobytes())
+    return h.hexdigest()
+
+
+def resolved_params(func, params):
+    """Keyword thresholds of `func` with its defaults filled in, so explicit defaults share a cache key."""
+    defaults = {
+        name: p.default for name, p in inspect.signature(func).parameters.items()
+        if p.default is not inspect.Parameter.empty
+    }
+    return {**defaults, **params}
+
+
+class MaskCache:
+    """
+    Bounded LRU cache of heuristic pass masks keyed on (heuristic name, threshold parameters,
+    fingerprint of the input columns). Changing one heuristic's threshold only recomputes that
+    heuristic; reloading an unchanged mastersheet recomputes nothing.
+
+    Example usage:
+        cache = MaskCache(maxsize=64)
+        rules = [{"column": "percent_phase_fov", "op": ">", "value": 70}]
+        passed = cache.mask("filter_low_percent_phase_fov", H.evaluate_rules, df, CONFIG,
+                            params={"rules": rules}, columns=["json_PercentPhaseFOV"])
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._masks = OrderedDict()
+
+    def mask(self, name, func, df, config, params=None, columns=()):
+        """
+        Return the cached boolean pass mask (read-only numpy array) of `func(df, config, **params)`,
+        computing and storing it on a miss.
+        """
+        params = params or {}
+        key = (name, repr(sorted(resolved_params(func, params).items())), fingerprint(df, columns))
+        if key in self._masks:
+            self._masks.move_to_end(key)
+            self.hits += 1
+            return self._masks[key]
+        self.misses += 1
+        mask = np.asarray(func(df, config, **params), dtype=bool)
+        mask.flags.writeable = False
+        self._masks[key] = mask
+        if len(self._masks) > self.maxsize:
+            self._masks.popitem(last=False)
+        return mask
+
+    def clear(self):
+        self._masks.clear()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._masks)
+
+
+# Shared across pipelines so re-running run_heuristics in a notebook reuses unchanged masks
+MASK_CACHE = MaskCache(maxsize=64)
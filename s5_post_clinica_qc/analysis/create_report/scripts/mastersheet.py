@@ -0,0 +1,114 @@
+import ast
+import sqlite3
+import numpy as np
+from contextlib import closing
+import pandas as pd
+
+
+def read_mastersheet(path, where=None, params=()):
+    """
+    Load the mastersheet written by create_mastersheet/main.py.
+
+    `.parquet` files are read with their stored types, `.sqlite`/`.db` files are read from the
+    indexed session store (optionally only rows matching `where`, an SQL condition with ?
+    placeholders bound to `params`), and anything else is read as CSV.
+    """
+    path = str(path)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if path.endswith((".sqlite", ".db")):
+        sql = 'SELECT * FROM "sessions"' + (f" WHERE {where}" if where else "")
+        with closing(sqlite3.connect(path)) as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+    if where:
+        raise ValueError("`where` filtering is only supported for the SQLite session store.")
+    return pd.read_csv(path)
+
+
+def _parse_list(value):
+    if isinstance(value, str):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return None
+    return value if isinstance(value, (list, tuple)) else None
+
+
+def list_element(df, col, i):
+    """
+    Return element `i` of a list-valued header column (e.g. nifti_dim) as a numeric Series.
+
+    Typed mastersheets already hold it as `{col}{i}` (e.g. nifti_dim3); for CSV mastersheets the
+    stringified list is parsed. Missing or malformed values become NaN.
+    """
+    typed = f"{col}{i}"
+    if typed in df.columns:
+        return pd.to_numeric(df[typed], errors="coerce").astype(float)
+    if col not in df.columns:
+        return pd.Series(float("nan"), index=df.index)
+    parsed = df[col].map(_parse_list)
+    return pd.to_numeric(
+        parsed.map(lambda v: v[i] if v is not None and len(v) > i else None), errors="coerce"
+    ).astype(float)
+
+
+# Header list columns expanded into numeric {col}0..{col}{n-1} columns (same names as the Parquet mastersheet)
+LIST_COLUMNS = {"nifti_dim": 8, "nifti_pixdim": 8}
+
+
+def expand_list_column(series, length):
+    """
+    Vectorized parse of a stringified header list column (e.g. "[4, 64, 64, 48, 140, 1, 1, 1]").
+
+    Returns a float DataFrame with columns {name}0..{name}{length-1}. Rows that are missing or
+    do not parse as a list of numbers (e.g. contain "nan") are NaN in every column, matching
+    what `ast.literal_eval` accepts.
+    """
+    name = series.name
+    inner = series.astype("string").str.strip().str.replace(r"^[\[(]|[\])]$", "", regex=True)
+    tokens = inner.str.split(",", expand=True)
+    if tokens.shape[1] == 0:
+        tokens = pd.DataFrame(index=series.index, columns=[0])
+    values = tokens.apply(lambda c: pd.to_numeric(c.str.strip(), errors="coerce")).astype(float)
+    malformed = (values.isna() & tokens.notna()).any(axis=1)
+    values[malformed] = np.nan
+    values = values.reindex(columns=range(length))
+    values.columns = [f"{name}{i}" for i in range(length)]
+    return values
+
+
+def add_derived_columns(df, config):
+    """
+    Return a copy of `df` with the header lists parsed once and the derived columns the
+    heuristics and plots read:
+
+    - nifti_dim0..7 / nifti_pixdim0..7 (skipped when already present, e.g. Parquet input)
+    - ScanDepth = dim3 × pixdim3, n_volumes = dim4, Duration_sec = TR × n_volumes
+    - Site (first 3 characters of Subject_ID) and ScanType ("MB" if TR < 1 s, else "SB")
+    """
+    df = df.copy()
+    for col, length in LIST_COLUMNS.items():
+        if col in df.columns and f"{col}0" not in df.columns:
+            df = pd.concat([df, expand_list_column(df[col], length)], axis=1)
+
+    tr = pd.to_numeric(df[config["repetition_time"]], errors="coerce")
+    df["ScanDepth"] = list_element(df, config["nifti_dim"], 3) * list_element(df, config["nifti_pixdim"], 3)
+    df["n_volumes"] = list_element(df, config["nifti_dim"], 4)
+    df["Duration_sec"] = tr * df["n_volumes"]
+    df["Site"] = df[config["PTID"]].astype(str).str[:3]
+    df["ScanType"] = np.where(tr < 1, "MB", "SB")
+    return df
+
+
+DERIVED_COLUMNS = ["ScanDepth", "n_volumes", "Duration_sec", "Site", "ScanType"]
+
+
+def ensure_derived_columns(df, config):
+    """
+    Return `df` itself if it already holds the derived columns (e.g. frames cut from
+    SessionFilterPipeline), otherwise add_derived_columns(df, config). Callers must not modify
+    the returned frame in place.
+    """
+    if all(col in df.columns for col in DERIVED_COLUMNS):
+        return df
+    return add_derived_columns(df, config)
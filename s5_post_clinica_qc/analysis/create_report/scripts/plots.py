@@ -1,27 +1,83 @@
 import plotly.express as px
 from IPython.display import Markdown, display
-import ast
 import pandas as pd
-from config import CONFIG
+from config import CONFIG, HEURISTICS, PLOT_OUTPUT
+import heuristics as H
+from mastersheet import ensure_derived_columns
+import figure_cache
+from figure_cache import cached_render, code_fingerprint
 import os
 
 # Should add a config file for the paramters to consolidate everything.
 
-def render_scan_depth_plot(df, produce_html=False, html_path="scan_depth_scatter_by_manufacturer_adni.html"):
-    df = df.copy()
 
-    # Parse stringified lists
-    df["nifti_dim"] = df["nifti_dim"].apply(lambda x: ast.literal_eval(x) if pd.notna(x) else [None]*8)
-    df["nifti_pixdim"] = df["nifti_pixdim"].apply(lambda x: ast.literal_eval(x) if pd.notna(x) else [None]*8)
+def set_plot_output(**options):
+    """
+    Change how figures are drawn and written (see PLOT_OUTPUT in config.py), e.g. for large
+    cohorts: set_plot_output(shared_plotlyjs=True, webgl_threshold=5000, aggregate_points=True).
+    """
+    unknown = set(options) - set(PLOT_OUTPUT)
+    if unknown:
+        raise KeyError(f"Unknown plot output options: {sorted(unknown)}")
+    PLOT_OUTPUT.update(options)
+
+
+def write_plotlyjs(directory):
+    """Write the plotly.min.js bundle that shared_plotlyjs HTML files reference, if not already there."""
+    from plotly.offline import get_plotlyjs
+
+    path = os.path.join(directory, "plotly.min.js")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+        os.replace(tmp_path, path)
+
+
+def _write_html(fig, html_path):
+    """Write a figure, embedding plotly.js or (shared_plotlyjs) referencing one copy next to it."""
+    if PLOT_OUTPUT["shared_plotlyjs"]:
+        write_plotlyjs(os.path.dirname(html_path) or ".")
+        fig.write_html(html_path, include_plotlyjs="directory")
+    else:
+        fig.write_html(html_path)
+
 
-    df["dim3"] = df["nifti_dim"].apply(lambda x: x[3] if len(x) > 3 else None)
-    df["pixdim3"] = df["nifti_pixdim"].apply(lambda x: x[3] if len(x) > 3 else None)
-    df["ScanDepth"] = df["dim3"] * df["pixdim3"]
-    df["Site"] = df["Subject_ID"].astype(str).str[:3]
+def _scatter(df, x, y, **kwargs):
+    """
+    px.scatter honouring PLOT_OUTPUT: with aggregate_points, rows sharing the same x, y, color,
+    symbol and facet are drawn as one marker sized by their session count (per-session hover data
+    is dropped); above webgl_threshold points, WebGL traces are used instead of SVG.
+    """
+    if PLOT_OUTPUT["aggregate_points"]:
+        keys = [x, y] + [kwargs[k] for k in ("color", "symbol", "facet_col", "facet_row") if isinstance(kwargs.get(k), str)]
+        df = (
+            df.groupby(list(dict.fromkeys(keys)), dropna=False, observed=True, sort=False)
+            .size()
+            .reset_index(name="Sessions")
+        )
+        kwargs["hover_data"] = {"Sessions": True}
+        kwargs.setdefault("size", "Sessions")
+        kwargs.setdefault("size_max", 18)
+    if PLOT_OUTPUT["webgl_threshold"] is not None:
+        kwargs["render_mode"] = "webgl" if len(df) > PLOT_OUTPUT["webgl_threshold"] else "svg"
+    return px.scatter(df, x=x, y=y, **kwargs)
+
+@cached_render(["Site", "ScanDepth", "json_Manufacturer"], _write_html)
+def render_scan_depth_plot(df, produce_html=False, html_path="scan_depth_scatter_by_manufacturer_adni.html", show=True,
+                           bands=None):
+    """
+    `bands` are the accepted [low, high] ScanDepth ranges drawn in green; by default the ones
+    of the rules in config.HEURISTICS (SessionFilterPipeline passes its own registry and overrides).
+    """
+    df = ensure_derived_columns(df, CONFIG)  # ScanDepth, Site
+    if bands is None:
+        bands = H.accepted_ranges(HEURISTICS, "ScanDepth", CONFIG)
 
     df = df[df["json_Manufacturer"].isin(["Philips", "Siemens", "GE"])]
 
-    fig = px.scatter(
+    fig = _scatter(
         df,
         x="Site",
         y="ScanDepth",
@@ -36,31 +92,39 @@ def render_scan_depth_plot(df, produce_html=False, html_path="scan_depth_scatter
     for i in range(3):
         xref = f"x{i+1} domain" if i > 0 else "x domain"
         yref = f"y{i+1}" if i > 0 else "y"
-        fig.add_shape(
-            type="rect", x0=0, x1=1, y0=155, y1=180,
-            xref=xref, yref=yref,
-            fillcolor="green", opacity=0.2,
-            layer="below", line_width=0,
-        )
+        for y0, y1 in bands:
+            fig.add_shape(
+                type="rect", x0=0, x1=1, y0=y0, y1=y1,
+                xref=xref, yref=yref,
+                fillcolor="green", opacity=0.2,
+                layer="below", line_width=0,
+            )
 
-    fig.show()
+    if show:
+        fig.show()
 
     if produce_html:
-        fig.write_html(html_path)
+        _write_html(fig, html_path)
         print(f"Plot saved to: {html_path}")
 
-def render_repetition_time_plot(df, produce_html=False, html_path="repetition_time_by_site.html"):
-    df = df.copy()
-    df["Site"] = df["Subject_ID"].astype(str).str[:3]
+    return fig
+
+@cached_render(["Site", "json_RepetitionTime", "ScanType", "json_Manufacturer", "Subject_ID", "Image_ID"], _write_html)
+def render_repetition_time_plot(df, produce_html=False, html_path="repetition_time_by_site.html", show=True,
+                                bands=None):
+    """
+    `bands` are the accepted [low, high] TR ranges drawn in green; by default the ones of the
+    rules in config.HEURISTICS (SessionFilterPipeline passes its own registry and overrides).
+    """
+    df = ensure_derived_columns(df, CONFIG)  # Site, ScanType (multiband vs singleband)
+    if bands is None:
+        bands = H.accepted_ranges(HEURISTICS, CONFIG["repetition_time"], CONFIG)
 
     # Only keep rows with known TR and valid manufacturers
     df = df[df["json_Manufacturer"].isin(["Philips", "Siemens", "GE"])]
     df = df[df["json_RepetitionTime"].notna()]
 
-    # Identify multiband vs singleband
-    df["ScanType"] = df["json_RepetitionTime"].apply(lambda tr: "MB" if tr < 1 else "SB")
-
-    fig = px.scatter(
+    fig = _scatter(
         df,
         x="Site",
         y="json_RepetitionTime",
@@ -79,38 +143,33 @@ def render_repetition_time_plot(df, produce_html=False, html_path="repetition_ti
 
     fig.update_layout(height=600, width=1200, showlegend=True)
 
-    # Add green zones for accepted TR ranges
+    # Add green zones for accepted TR ranges (multiband and single-band windows)
     for i in range(3):  # one for each facet (Philips, Siemens, GE)
         xref = f"x{i+1} domain" if i > 0 else "x domain"
         yref = f"y{i+1}" if i > 0 else "y"
+        for y0, y1 in bands:
+            fig.add_shape(
+                type="rect", x0=0, x1=1, y0=y0, y1=y1,
+                xref=xref, yref=yref,
+                fillcolor="green", opacity=0.2, layer="below", line_width=0
+            )
 
-        # Zone 1: 0.5 – 1.0 s
-        fig.add_shape(
-            type="rect", x0=0, x1=1, y0=0.5, y1=1.0,
-            xref=xref, yref=yref,
-            fillcolor="green", opacity=0.2, layer="below", line_width=0
-        )
-
-        # Zone 2: 2.9 – 3.1 s
-        fig.add_shape(
-            type="rect", x0=0, x1=1, y0=2.9, y1=3.1,
-            xref=xref, yref=yref,
-            fillcolor="green", opacity=0.2, layer="below", line_width=0
-        )
-
-    fig.show()
+    if show:
+        fig.show()
 
     if produce_html:
-        fig.write_html(html_path)
+        _write_html(fig, html_path)
         print(f"Plot saved to: {html_path}")
 
-def render_coil_string_plot(df, produce_html=False, html_path="coil_string_by_site.html"):
-    df = df.copy()
-    df["Site"] = df["Subject_ID"].astype(str).str[:3]
+    return fig
+
+@cached_render(["Site", "json_CoilString", "json_Manufacturer"], _write_html)
+def render_coil_string_plot(df, produce_html=False, html_path="coil_string_by_site.html", show=True):
+    df = ensure_derived_columns(df, CONFIG)  # Site
     df = df[df["json_Manufacturer"].isin(["Philips", "Siemens", "GE"])]
     df = df[df["json_CoilString"].notna()]
 
-    fig = px.scatter(
+    fig = _scatter(
         df,
         x="Site",
         y="json_CoilString",
@@ -121,20 +180,23 @@ def render_coil_string_plot(df, produce_html=False, html_path="coil_string_by_si
     )
 
     fig.update_layout(height=600, width=1200, showlegend=True)
-    fig.show()
+    if show:
+        fig.show()
 
     if produce_html:
-        fig.write_html(html_path)
+        _write_html(fig, html_path)
         print(f"Plot saved to: {html_path}")
 
+    return fig
 
-def render_percent_phase_fov_plot(df, produce_html=False, html_path="percent_phase_fov_by_site.html"):
-    df = df.copy()
-    df["Site"] = df["Subject_ID"].astype(str).str[:3]
+
+@cached_render(["Site", "json_PercentPhaseFOV", "json_Manufacturer"], _write_html)
+def render_percent_phase_fov_plot(df, produce_html=False, html_path="percent_phase_fov_by_site.html", show=True):
+    df = ensure_derived_columns(df, CONFIG)  # Site
     df = df[df["json_Manufacturer"].isin(["Philips", "Siemens", "GE"])]
     df = df[df["json_PercentPhaseFOV"].notna()]
 
-    fig = px.scatter(
+    fig = _scatter(
         df,
         x="Site",
         y="json_PercentPhaseFOV",
@@ -145,34 +207,25 @@ def render_percent_phase_fov_plot(df, produce_html=False, html_path="percent_pha
     )
 
     fig.update_layout(height=600, width=1200, showlegend=True)
-    fig.show()
+    if show:
+        fig.show()
 
     if produce_html:
-        fig.write_html(html_path)
+        _write_html(fig, html_path)
         print(f"Plot saved to: {html_path}")
 
-def render_remaining_parameters_plot(df, produce_html=False, html_dir="plots_remaining/"):
-    """
-    Render faceted plots for all remaining parameters, one per HTML file.
+    return fig
 
-    Parameters:
-        df (pd.DataFrame): The input DataFrame.
-        produce_html (bool): Whether to save plots as HTML files.
-        html_dir (str): Directory to save HTML files in.
-    """
-    df = df.copy()
-    df["Site"] = df["Subject_ID"].astype(str).str[:3]
-    df = df[df["json_Manufacturer"].isin(["Philips", "Siemens", "GE"])]
+# Parameters plotted by render_remaining_parameters_plot, one figure each
+# REMAINING_PARAMETERS = [
+#     "json_MagneticFieldStrength", "json_ManufacturersModelName",
+#     "json_InstitutionName", "json_MRAcquisitionType", "json_SliceThickness", "json_SpacingBetweenSlices",
+#     "json_EchoTime", "json_FlipAngle", "json_PercentSampling", "json_EchoTrainLength",
+#     "json_AcquisitionMatrixPE", "json_PhaseEncodingDirection",
+#     "dicom_MRAcquisitionFrequencyEncodingSteps", "json_PhaseEncodingAxis"
+# ]
 
-    # categorical_columns = [
-    #     "json_MagneticFieldStrength", "json_ManufacturersModelName",
-    #     "json_InstitutionName", "json_MRAcquisitionType", "json_SliceThickness", "json_SpacingBetweenSlices",
-    #     "json_EchoTime", "json_FlipAngle", "json_PercentSampling", "json_EchoTrainLength",
-    #     "json_AcquisitionMatrixPE", "json_PhaseEncodingDirection",
-    #     "dicom_MRAcquisitionFrequencyEncodingSteps", "json_PhaseEncodingAxis"
-    # ]
-
-    categorical_columns = [
+REMAINING_PARAMETERS = [
     # Section A: Supplemental Plots Provided for Context Only
     "json_ManufacturersModelName",
     "json_InstitutionName",
@@ -192,53 +245,93 @@ def render_remaining_parameters_plot(df, produce_html=False, html_dir="plots_rem
     "json_EchoTime"
 ]
 
-    df[categorical_columns] = df[categorical_columns].fillna("Not Provided")
+
+def render_remaining_parameters_plot(df, produce_html=False, html_dir="plots_remaining/", columns=None, show=True):
+    """
+    Render faceted plots for all remaining parameters, one per HTML file.
+
+    Parameters:
+        df (pd.DataFrame): The input DataFrame.
+        produce_html (bool): Whether to save plots as HTML files.
+        html_dir (str): Directory to save HTML files in.
+        columns (list): Only plot these of the parameters below (default: all).
+        show (bool): Display the figures (and section headers) in the notebook when not saving.
+
+    Returns:
+        dict: {column: figure}.
+    """
+    df = ensure_derived_columns(df, CONFIG)  # Site
+    df = df[df["json_Manufacturer"].isin(["Philips", "Siemens", "GE"])]
+
+    categorical_columns = [col for col in REMAINING_PARAMETERS if columns is None or col in columns]
+
+    # astype(object) so categorical columns from a Parquet mastersheet accept the fill value
+    df[categorical_columns] = df[categorical_columns].astype(object).fillna("Not Provided")
     site_order = sorted(df["Site"].unique(), key=lambda x: int(x))
 
     if produce_html:
         os.makedirs(html_dir, exist_ok=True)
 
+    figures = {}
     for col in categorical_columns:
         if col == "json_Manufacturer":
             continue  # no need to plot manufacturer vs manufacturer
 
-        if col == "json_MagneticFieldStrength":
+        if show and col == "json_MagneticFieldStrength":
             display(Markdown("---\n\n## B. Parameters Considered for Heuristic Use but Not Flagged\n"))
 
         col_clean = col.split("_", 1)[-1] if "_" in col else col
-        df_plot = df[df[col] != "Not Provided"].copy()
-        df_plot["ColorLabel"] = df_plot[col].astype(str)
-
-        fig = px.scatter(
-            df_plot,
-            x="Site",
-            y=col,
-            color="ColorLabel",
-            facet_col="json_Manufacturer",
-            title=f"{col_clean} Values Across Sites (Faceted by Manufacturer)",
-            labels={
-                "Site": "Site",
-                col: col_clean,
-                "ColorLabel": col_clean
-            },
-            category_orders={"Site": site_order}
-        )
 
-        fig.update_layout(
-            height=600,
-            width=1200,
-            title_font_size=16,
-            showlegend=True
+        def build(col=col, col_clean=col_clean):
+            df_plot = df[df[col] != "Not Provided"].copy()
+            df_plot["ColorLabel"] = df_plot[col].astype(str)
+
+            fig = _scatter(
+                df_plot,
+                x="Site",
+                y=col,
+                color="ColorLabel",
+                facet_col="json_Manufacturer",
+                title=f"{col_clean} Values Across Sites (Faceted by Manufacturer)",
+                labels={
+                    "Site": "Site",
+                    col: col_clean,
+                    "ColorLabel": col_clean
+                },
+                category_orders={"Site": site_order}
+            )
+
+            fig.update_layout(
+                height=600,
+                width=1200,
+                title_font_size=16,
+                showlegend=True
+            )
+            return fig
+
+        # Site order comes from the same Site column, so these three columns determine the figure
+        cache = figure_cache.FIGURE_CACHE
+        fig = build() if cache is None else cache.get_or_build(
+            "render_remaining_parameters_plot", df, ["Site", "json_Manufacturer", col], {"column": col}, build,
+            code=_PLOTS_CODE,
         )
 
         if produce_html:
             html_path = os.path.join(html_dir, f"{col_clean}_faceted_by_manufacturer.html")
-            fig.write_html(html_path)
+            _write_html(fig, html_path)
             print(f"Saved: {html_path}")
-        else:
+        elif show:
             fig.show()
+        figures[col] = fig
+
+    return figures
 
-def render_multiband_vs_singleband_plot(df, produce_html=False, html_path="multiband_vs_singleband_plot.html"):
+
+# Cache key part for render_remaining_parameters_plot, which caches per column without cached_render
+_PLOTS_CODE = code_fingerprint(render_remaining_parameters_plot)
+
+@cached_render(["Site", "ScanType", CONFIG["SeriesDate"], CONFIG["repetition_time"], CONFIG["PTID"], "VISCODE"], _write_html)
+def render_multiband_vs_singleband_plot(df, produce_html=False, html_path="multiband_vs_singleband_plot.html", show=True):
     """
     Plot multiband (MB) vs single-band (SB) session distribution over time across sites.
     MB sessions appear underneath SB for visual clarity.
@@ -248,10 +341,8 @@ def render_multiband_vs_singleband_plot(df, produce_html=False, html_path="multi
         produce_html (bool): Whether to save the figure as HTML.
         html_path (str): Output path for HTML if `produce_html=True`.
     """
-    df = df.copy()
-    df["Site"] = df["Subject_ID"].astype(str).str[:3]
-    df[CONFIG["SeriesDate"]] = pd.to_datetime(df[CONFIG["SeriesDate"]], format="%Y%m%d", errors="coerce")
-    df["ScanType"] = df[CONFIG["repetition_time"]].apply(lambda tr: "MB" if tr < 1 else "SB")
+    df = ensure_derived_columns(df, CONFIG)  # Site, ScanType
+    df = df.assign(**{CONFIG["SeriesDate"]: pd.to_datetime(df[CONFIG["SeriesDate"]], format="%Y%m%d", errors="coerce")})
 
     symbol_map = {"MB": "circle", "SB": "x"}
     hover_data = {
@@ -264,7 +355,7 @@ def render_multiband_vs_singleband_plot(df, produce_html=False, html_path="multi
     }
 
     # Plot MB sessions first (underneath)
-    fig = px.scatter(
+    fig = _scatter(
         df[df["ScanType"] == "MB"],
         x=CONFIG["SeriesDate"],
         y="Site",
@@ -278,7 +369,7 @@ def render_multiband_vs_singleband_plot(df, produce_html=False, html_path="multi
 
     # Overlay SB sessions on top
     fig.add_trace(
-        px.scatter(
+        _scatter(
             df[df["ScanType"] == "SB"],
             x=CONFIG["SeriesDate"],
             y="Site",
@@ -300,28 +391,42 @@ def render_multiband_vs_singleband_plot(df, produce_html=False, html_path="multi
         width=1200
     )
 
-    fig.show()
+    if show:
+        fig.show()
 
     if produce_html:
-        fig.write_html(html_path)
+        _write_html(fig, html_path)
         print(f"Plot saved as '{html_path}' with SB on top and correct hover data")
 
+    return fig
+
 
-def render_subject_session_histogram(df, output_html=None):
+def _sessions_per_short_id(df, index=None):
+    """
+    Sessions per short subject ID (the digits after "S_"), sorted by count like value_counts().
+    With a longitudinal.LongitudinalIndex the counts come from its per-subject passing session
+    counts, so only the unique subject IDs are parsed instead of every row.
+    """
+    if index is None:
+        return df["Subject_ID"].str.extract(r"S_(\d+)$")[0].value_counts()
+    counts = index.sessions_per_subject(passing=True)
+    counts = counts[counts > 0]
+    short = counts.index.str.extract(r"S_(\d+)$")[0].to_numpy()
+    return counts.groupby(short).sum().sort_values(ascending=False)
+
+
+def render_subject_session_histogram(df, output_html=None, index=None):
     """
     Render a histogram showing how many subjects had N sessions.
 
     Parameters:
     - df: pandas DataFrame with 'Subject_ID' column.
     - output_html: Optional path to save the interactive HTML plot.
+    - index: Optional LongitudinalIndex of the pipeline; its passing sessions are counted instead of `df`.
     """
-    df = df.copy()
-    df["Subject"] = df["Subject_ID"].str.extract(r"S_(\d+)$")[0]
-
     # Count how many sessions each subject had (frequency)
     histogram_df = (
-        df["Subject"]
-        .value_counts()
+        _sessions_per_short_id(df, index)
         .rename_axis("Subject")
         .reset_index(name="Sessions")
     )
@@ -345,25 +450,24 @@ def render_subject_session_histogram(df, output_html=None):
     )
 
     if output_html:
-        fig.write_html(output_html)
+        _write_html(fig, output_html)
     else:
         fig.show()
 
+    return fig
+
 
-def render_subject_session_barplot(df, output_html=None):
+def render_subject_session_barplot(df, output_html=None, index=None):
     """
     Render a bar chart of number of sessions per subject.
 
     Parameters:
     - df: pandas DataFrame with a 'Subject_ID' column.
     - output_html: Optional path to save the interactive HTML plot.
+    - index: Optional LongitudinalIndex of the pipeline; its passing sessions are counted instead of `df`.
     """
-    df = df.copy()
-    df["Short_Subject_ID"] = df["Subject_ID"].str.extract(r"S_(\d+)$")[0]
-
     subject_session_counts = (
-        df["Short_Subject_ID"]
-        .value_counts()
+        _sessions_per_short_id(df, index)
         .sort_index()
         .rename_axis("Subject")
         .reset_index(name="Number of Sessions")
@@ -390,12 +494,15 @@ def render_subject_session_barplot(df, output_html=None):
     )
 
     if output_html:
-        fig.write_html(output_html)
+        _write_html(fig, output_html)
     else:
         fig.show()
 
+    return fig
+
 
-def render_total_duration_plot(df, produce_html=False, html_path="total_duration_plot.html"):
+@cached_render(["Site", "Duration_sec", CONFIG["repetition_time"], "n_volumes", "Subject_ID", "json_Manufacturer", "nifti_dim", "nifti_pixdim"], _write_html)
+def render_total_duration_plot(df, produce_html=False, html_path="total_duration_plot.html", show=True):
     """
     Render total scan duration = TR × # volumes, faceted by manufacturer.
     
@@ -404,16 +511,10 @@ def render_total_duration_plot(df, produce_html=False, html_path="total_duration
         produce_html (bool): Whether to save plot as HTML.
         html_path (str): Output HTML file path if produce_html is True.
     """
-    df = df.copy()
-
-    # Parse nifti_dim safely
-    df["nifti_dim"] = df["nifti_dim"].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-    df["n_volumes"] = df["nifti_dim"].apply(lambda dim: dim[4] if isinstance(dim, list) and len(dim) > 4 else None)
+    df = ensure_derived_columns(df, CONFIG)  # n_volumes, Duration_sec, Site
 
     # Use TR from config
-    df["TR"] = df[CONFIG["repetition_time"]]
-    df["Duration_sec"] = df["TR"] * df["n_volumes"]
-    df["Site"] = df["Subject_ID"].astype(str).str[:3]
+    df = df.assign(TR=df[CONFIG["repetition_time"]])
 
     df = df[df["json_Manufacturer"].isin(["Philips", "Siemens", "GE"])]
     df = df[df["Duration_sec"].notna()]
@@ -424,11 +525,11 @@ def render_total_duration_plot(df, produce_html=False, html_path="total_duration
         "n_volumes": True,
         "Duration_sec": True,
         "Site": True,
-        "nifti_dim": True,
-        "nifti_pixdim": True,
     }
+    # CSV mastersheets carry the raw header lists; typed ones have nifti_dim0..7 instead
+    hover_data.update({col: True for col in ("nifti_dim", "nifti_pixdim") if col in df.columns})
 
-    fig = px.scatter(
+    fig = _scatter(
         df,
         x="Site",
         y="Duration_sec",
@@ -458,8 +559,48 @@ def render_total_duration_plot(df, produce_html=False, html_path="total_duration
                 line_width=0,
             )
 
-    fig.show()
+    if show:
+        fig.show()
 
     if produce_html:
-        fig.write_html(html_path)
-        print(f"Plot saved to: {html_path}")
\ No newline at end of file
+        _write_html(fig, html_path)
+        print(f"Plot saved to: {html_path}")
+
+    return fig
+
+def render_retention_curve(sweep_df, x, group_by="json_Manufacturer", y="retention_sessions",
+                           produce_html=False, html_path="retention_curve.html", show=True):
+    """
+    Plot a retention curve from sweep.sweep_thresholds: kept fraction against one swept threshold,
+    one line per group. Other swept thresholds are fixed at their first value unless `sweep_df`
+    is filtered beforehand.
+
+    Args:
+        sweep_df (pd.DataFrame): Output of sweep_thresholds.
+        x (str): Swept threshold column, e.g. "filter_low_percent_phase_fov.value".
+        group_by (str): "all", "json_Manufacturer" or "Site".
+        y (str): "retention_sessions", "retention_subjects", "sessions" or "subjects".
+    """
+    df = sweep_df[sweep_df["group_by"] == group_by]
+    for col in [c for c in df.columns if "." in c and c != x]:
+        df = df[df[col] == df[col].iloc[0]]
+    df = df.assign(**{x: df[x].astype(str) if df[x].map(lambda v: isinstance(v, tuple)).any() else df[x]})
+
+    fig = px.line(
+        df.sort_values(x),
+        x=x,
+        y=y,
+        color="group",
+        markers=True,
+        title=f"{y.replace('_', ' ').capitalize()} by {group_by} vs. {x}",
+        hover_data=["sessions", "subjects"],
+    )
+    fig.update_layout(height=500, width=900)
+
+    if show:
+        fig.show()
+
+    if produce_html:
+        _write_html(fig, html_path)
+
+    return fig
@@ -1,6 +1,8 @@
+import numpy as np
 import pandas as pd
+from collections.abc import Mapping
 from IPython.display import Markdown, display
-import heuristics as H  # Import all heuristics from separate file
+import heuristics as H  # Rule engine for the heuristics declared in config.HEURISTICS
 import os
 from plots import (
     render_scan_depth_plot,
@@ -12,86 +14,228 @@ from plots import (
     render_multiband_vs_singleband_plot,
     render_total_duration_plot
 )
-from config import CONFIG
+from config import CONFIG, HEURISTICS
+from mastersheet import add_derived_columns, read_mastersheet
+from mask_cache import MASK_CACHE
+from stats_cube import MANUFACTURER, MISSING_COLUMNS, StatsCube
+from longitudinal import LongitudinalIndex
+from sweep import SWEEP_GROUPS, sweep_thresholds
 import plotly.express as px
 
 
+class MaskedFrames(Mapping):
+    """
+    Read-only {key: DataFrame} mapping whose frames are cut from `df` with a stored boolean mask
+    only when they are accessed, so no per-heuristic or per-phase copies are kept around.
+    """
+
+    def __init__(self, df, masks):
+        self._df = df
+        self._masks = masks
+
+    def __getitem__(self, key):
+        return self._df[self._masks[key]]
+
+    def __iter__(self):
+        return iter(self._masks)
+
+    def __len__(self):
+        return len(self._masks)
+
+
+_NUMBER_WORDS = ["No", "One", "Two", "Three", "Four", "Five", "Six", "Seven", "Eight", "Nine", "Ten"]
+
+
+def _counted(n, noun):
+    """"Three heuristics were", "One check was", ... for the phase summary intros."""
+    word = _NUMBER_WORDS[n] if n < len(_NUMBER_WORDS) else str(n)
+    return f"{word} {noun}{'' if n == 1 else 's'} {'was' if n == 1 else 'were'}"
+
+
 class SessionFilterPipeline:
     """
     This class handles the multi-phase filtering of sessions using defined heuristics.
     Each phase runs a group of heuristics, and the results can be used to generate reports.
+
+    Every heuristic is evaluated once over `df_original` into a per-row failure bitmask
+    (`failure_bits`, one bit per heuristic in `heuristic_bits`). Sequential phase results,
+    independent drop counts and overlaps are bit operations on it. Results are stored as boolean
+    masks over the rows of `df_original`; `df_current`, `dropped_dfs[name]` and
+    `phase_checkpoints[phase]` are built from them on access.
     """
 
-    def __init__(self, csv_path):
-        # === Load and store the input dataset ===
-        self.df_original = pd.read_csv(csv_path)
-        self.df_current = self.df_original.copy()
+    def __init__(self, csv_path, params=None, cache=MASK_CACHE, heuristics=None):
+        # === Load and store the input dataset (CSV or typed Parquet mastersheet) ===
+        # Header lists are parsed once here; heuristics and plots read ScanDepth, n_volumes,
+        # Duration_sec, Site and ScanType instead of re-parsing nifti_dim/nifti_pixdim.
+        self.df_original = add_derived_columns(read_mastersheet(csv_path), CONFIG)
         self.initial_count = len(self.df_original)
 
-        # === Tracking structures ===
-        self.dropped_dfs = {}         # heuristic_name -> dropped DataFrame
-        self.phase_checkpoints = {}   # phase_number -> df after that phase
+        # === Tracking structures (boolean arrays aligned with df_original) ===
+        self.kept_mask = np.ones(self.initial_count, dtype=bool)  # rows that passed every heuristic run so far
+        self.dropped_masks = {}       # heuristic_name -> rows dropped by that heuristic (in phase order)
+        self.phase_masks = {}         # phase_number -> rows remaining after that phase
+        self.failure_bits = None      # per-row bitmask of failed heuristics, set by evaluate()
+
+        # === Heuristic registry (config.HEURISTICS, a dict or a YAML path), threshold overrides
+        # ({heuristic_name: {rule_field: value}}) and the memoized masks ===
+        if isinstance(heuristics, (str, os.PathLike)):
+            heuristics = H.load_heuristics(heuristics)
+        self.heuristics = H.validate_heuristics(heuristics if heuristics is not None else HEURISTICS)
+        self.params = {name: dict(p) for name, p in (params or {}).items()}
+        self.cache = cache
+        self.dropped_dfs = MaskedFrames(self.df_original, self.dropped_masks)
+        self.phase_checkpoints = MaskedFrames(self.df_original, self.phase_masks)
+        self._stats = None            # StatsCube of the last run(), built on first use
+        self._longitudinal = None     # LongitudinalIndex of the last run(), built on first use
 
         self._setup_phases()
 
     def _setup_phases(self):
         """
-        Define which heuristics run in which phase.
-        Each tuple is (function, name) for clarity and modularity.
-        """
-        self.phase_map = {
-            0: [
-                (H.filter_missing_data_adnidap, "filter_missing_data_adnidap"),
-                (H.filter_missing_data, "filter_missing_data"),
-                (H.filter_missing_t1w, "filter_missing_t1w")
-                
-            ],
-            1: [  
-                (H.filter_low_scan_depth, "filter_low_scan_depth"),
-                (H.filter_invalid_repetition_time, "filter_invalid_repetition_time"),
-                (H.filter_short_duration, "filter_short_duration")
-            ],
-            2: [
-                (H.filter_low_percent_phase_fov, "filter_low_percent_phase_fov"),
-                (H.filter_out_bad_coils, "filter_out_bad_coils")
+        Group the registered heuristics by phase ({phase: [heuristic_name, ...]}), keeping
+        registry order within a phase.
+        """
+        self.phase_map = {}
+        for name, heuristic in sorted(self.heuristics.items(), key=lambda item: item[1]["phase"]):
+            self.phase_map.setdefault(heuristic["phase"], []).append(name)
+        names = [name for names in self.phase_map.values() for name in names]
+        if len(names) > 64:
+            raise ValueError(f"At most 64 heuristics fit in the failure bitmask, got {len(names)}.")
+        self.heuristic_bits = {name: 1 << i for i, name in enumerate(names)}
+
+    def evaluate(self, verbose=False):
+        """
+        Evaluate every registered heuristic once over all rows and store which ones each row fails
+        as bits of `self.failure_bits` (uint64). Heuristics are row-wise, so results on the full
+        frame equal results on any filtered subset.
+        """
+        bits = np.zeros(self.initial_count, dtype=np.uint64)
+        for names in self.phase_map.values():
+            for name in names:
+                passed = self.heuristic_mask(name)
+                bits[~passed] |= np.uint64(self.heuristic_bits[name])
+                if verbose:
+                    print(f"  {name}: {(~passed).sum()} of {self.initial_count} rows fail")
+        self.failure_bits = bits
+        return bits
+
+    def heuristic_mask(self, name):
+        """Pass mask of one heuristic with its current params, from the mask cache when possible."""
+        heuristic = self.heuristics[name]
+        rules = H.resolve_rules(heuristic, self.params.get(name))
+        if self.cache is None:
+            return H.evaluate_rules(self.df_original, CONFIG, rules)
+        columns = H.input_columns(heuristic, CONFIG)
+        return self.cache.mask(name, H.evaluate_rules, self.df_original, CONFIG, {"rules": rules}, columns)
+
+    def set_params(self, name, **params):
+        """
+        Override rule thresholds of one heuristic, e.g. set_params("filter_low_percent_phase_fov",
+        value=70) or set_params("filter_low_scan_depth", range=[150, 180]). The next run() only
+        recomputes masks whose thresholds changed.
+        """
+        if name not in self.heuristic_bits:
+            raise KeyError(f"Unknown heuristic: {name}")
+        self.params.setdefault(name, {}).update(params)
+        self.failure_bits = None
+
+    def _bits(self, names):
+        """Combined bit value of the given heuristic names."""
+        value = 0
+        for name in names:
+            value |= self.heuristic_bits[name]
+        return np.uint64(value)
+
+    def failed_any(self, names):
+        """Boolean mask of rows failing at least one of the given heuristics."""
+        if self.failure_bits is None:
+            self.evaluate()
+        return (self.failure_bits & self._bits(names)) != 0
+
+    def failed_all(self, names):
+        """Boolean mask of rows failing every one of the given heuristics."""
+        if self.failure_bits is None:
+            self.evaluate()
+        bits = self._bits(names)
+        return (self.failure_bits & bits) == bits
+
+    def describe(self, name, key="description"):
+        """A heuristic's description (or summary, rationale) with the thresholds this pipeline applies."""
+        return H.describe(self.heuristics[name], self.params.get(name), key=key)
+
+    def accepted_ranges(self, column):
+        """Accepted [low, high] ranges of `column` under this registry and its overrides (plot bands)."""
+        return H.accepted_ranges(self.heuristics, column, CONFIG, self.params)
+
+    def sweep(self, grids, by=SWEEP_GROUPS, phase_limit=None):
+        """
+        Retention of sessions and subjects (overall, by manufacturer and by site) for every
+        combination of threshold grids, e.g.
+        sweep({"filter_low_percent_phase_fov": {"value": range(60, 91)}}). See sweep.sweep_thresholds.
+        """
+        return sweep_thresholds(self, grids, by=by, phase_limit=phase_limit)
+
+    @property
+    def df_current(self):
+        """Rows that passed every heuristic run so far (materialized on access)."""
+        return self.df_original[self.kept_mask]
+
+    @property
+    def stats(self):
+        """Counts per (stage, failure bits, manufacturer, site) cell of the last run(); see stats_cube.StatsCube."""
+        if self._stats is None:
+            # Also count missing values of the columns the phase summaries report for each heuristic
+            columns = MISSING_COLUMNS + [
+                col for h in self.heuristics.values() for cols in H.missing_columns(h, CONFIG).values() for col in cols
             ]
-        }
+            self._stats = StatsCube(self, missing_columns=list(dict.fromkeys(columns)))
+        return self._stats
+
+    @property
+    def longitudinal(self):
+        """Per-subject session timelines of the last run(); see longitudinal.LongitudinalIndex."""
+        if self._longitudinal is None:
+            self._longitudinal = LongitudinalIndex.from_pipeline(self)
+        return self._longitudinal
 
     def run(self, phase_limit=3, verbose=True):
         """
         Run the filtering pipeline up to the specified phase number.
-        Tracks dropped rows and filtered DataFrames for reporting.
+        Tracks dropped rows and remaining rows per phase as masks for reporting.
+        Heuristics are evaluated once (see evaluate()); later calls only redo the bit operations.
         """
-        self.df_current = self.df_original.copy()
-        self.dropped_dfs.clear()
-        self.phase_checkpoints.clear()
-
-        for phase, heuristics in self.phase_map.items():
+        if self.failure_bits is None:
+            self.evaluate()
+        self.kept_mask = np.ones(self.initial_count, dtype=bool)
+        self.dropped_masks.clear()
+        self.phase_masks.clear()
+        self._stats = self._longitudinal = None
+
+        for phase, names in self.phase_map.items():
             if phase > phase_limit:
                 break
             if verbose:
                 print(f"Phase {phase}:")
-            for func, name in heuristics:
-                mask = func(self.df_current, CONFIG)
-                dropped = self.df_current[~mask].copy()
-                kept = self.df_current[mask].copy()
-                self.dropped_dfs[name] = dropped
-                self.df_current = kept
+            for name in names:
+                failed = self.failed_any([name])
+                self.dropped_masks[name] = self.kept_mask & failed
+                self.kept_mask = self.kept_mask & ~failed
                 if verbose:
-                    print(f"  {name}: Dropped {len(dropped)} rows, Remaining: {len(self.df_current)}")
-            self.phase_checkpoints[phase] = self.df_current.copy()
+                    print(f"  {name}: Dropped {self.dropped_masks[name].sum()} rows, Remaining: {self.kept_mask.sum()}")
+            self.phase_masks[phase] = self.kept_mask
 
     def get_phase_summary(self):
         """
         Return the drop statistics as a dictionary.
         Useful for report generation or Plotly visualizations.
         """
-        total_dropped = sum(len(df) for df in self.dropped_dfs.values())
+        drop_details = {name: int(mask.sum()) for name, mask in self.dropped_masks.items()}
         return {
             "initial_count": self.initial_count,
-            "final_kept": len(self.df_current),
-            "total_dropped": total_dropped,
-            "drop_details": {name: len(df) for name, df in self.dropped_dfs.items()}
+            "final_kept": int(self.kept_mask.sum()),
+            "total_dropped": sum(drop_details.values()),
+            "drop_details": drop_details
         }
     
     def display_phase_summary(self):
@@ -99,33 +243,12 @@ class SessionFilterPipeline:
         Display a clean Markdown table summarizing heuristic drops,
         showing remaining rows *after each heuristic* and listing initial row count at the top.
         """
-        name_map = {
-            "filter_missing_data": "Missing Data",
-            "filter_missing_data_adnidap": "BIDS",
-            "filter_missing_t1w": "T1w Image Missing",
-            "filter_invalid_repetition_time": "RepetitionTime (TR)",
-            "filter_out_bad_coils": "CoilString",
-            "filter_low_scan_depth": "ScanDepth (dim3×pixdim3)",
-            "filter_low_percent_phase_fov": "PercentPhaseFOV",
-            "filter_short_duration": "Scan Duration"
-        }
-
-        desc_map = {
-            "RepetitionTime (TR)": "Sessions where TR falls outside [0.5–1.0] or [2.9–3.1] seconds.",
-            "CoilString": "Sessions that use Q-BODY or BODY coils.",
-            "ScanDepth (dim3×pixdim3)": "Scan Depth (dim₃ × pixdim₃) is outside the range [155, 180].",
-            "PercentPhaseFOV": "A session with an unusually low value of ≤ 72.",
-            "BIDS": "Sessions flagged due to known errors in Clinica BIDS conversion.",
-            "Missing Data": "Sessions where required NIfTI or JSON files are missing after Clinica conversion.",
-            "T1w Image Missing": "Session does not have a T1-weighted image.",
-            "Scan Duration": "Sessions where total scan duration (TR × volumes) is less than 5 minutes."
-        }
-
         rows = []
         last_phase = None
         running_total = self.initial_count
-        initial_subjects = self.df_original["Subject_ID"].nunique()
-        final_subjects = self.df_current["Subject_ID"].nunique()
+        sessions_per_subject = self.longitudinal.sessions_per_subject(passing=True)
+        initial_subjects = len(sessions_per_subject)
+        final_subjects = int((sessions_per_subject > 0).sum())
 
 
         header = (
@@ -134,14 +257,14 @@ class SessionFilterPipeline:
             "|-------|-----------|----------|--------------|----------------|"
         )
 
-        for phase, heuristics in self.phase_map.items():
+        for phase, names in self.phase_map.items():
             if phase not in self.phase_checkpoints:
                 continue
 
-            for _, code_name in heuristics:
-                pretty_name = name_map.get(code_name, code_name)
-                description = desc_map.get(pretty_name, "")
-                dropped = len(self.dropped_dfs.get(code_name, []))
+            for code_name in names:
+                pretty_name = self.heuristics[code_name].get("label", code_name)
+                description = self.describe(code_name)
+                dropped = self.stats.dropped(code_name)
                 running_total -= dropped
 
                 phase_str = f"Phase {phase}" if phase != last_phase else ""
@@ -151,38 +274,40 @@ class SessionFilterPipeline:
                     f"| {phase_str} | {pretty_name} | {description} | {dropped} | {running_total} |"
                 )
 
-        total_dropped = sum(len(df) for df in self.dropped_dfs.values())
-        total_remaining = len(self.df_current)
+        summary = self.get_phase_summary()
+        total_dropped = summary["total_dropped"]
+        total_remaining = summary["final_kept"]
 
         rows.append(
             f"| **TOTAL** | — | — | **{total_dropped}** | **{total_remaining}** |"
         )
 
         final_summary = (
-            f"\n\n#### Final Session Count: {len(self.df_current)} ({final_subjects} subjects)"
+            f"\n\n#### Final Session Count: {total_remaining} ({final_subjects} subjects)"
         )
 
         markdown = header + "\n" + "\n".join(rows) + final_summary
         display(Markdown(markdown))
 
-        render_subject_session_histogram(self.df_current)
+        render_subject_session_histogram(self.df_original.loc[self.kept_mask, ["Subject_ID"]], index=self.longitudinal)
 
     def render_phase0_summary(self):
         """
         Render Phase 0 summary with rich explanation and heuristic drop counts.
         Aligns with report's narrative and overview of applied filters.
         """
-        d_bids = len(self.dropped_dfs.get("filter_missing_data_adnidap", []))
-        d_missing = len(self.dropped_dfs.get("filter_missing_data", []))
-        d_t1w = len(self.dropped_dfs.get("filter_missing_t1w", []))
-        remaining = len(self.phase_checkpoints.get(0, []))
+        names = self.phase_map.get(0, [])
+        if not names:
+            display(Markdown("No Phase 0 heuristics are defined."))
+            return
+        drops = self.get_phase_summary()["drop_details"]
+        remaining = int(self.phase_masks[0].sum()) if 0 in self.phase_masks else 0
+        rows = "\n".join(f"| {self.heuristics[n].get('label', n)} | {drops.get(n, 0)} |" for n in names)
 
         md = f"""
-Three checks were applied:
+{_counted(len(names), "check")} applied:
 
-- **BIDS**: Sessions flagged due to known errors in Clinica BIDS conversion.
-- **Missing Data**: Sessions where required `NIfTI` or `JSON` files are missing **after Clinica/BIDS conversion**, even if no error was reported.
-- **T1w Image Missing**: Session does not have a T1-weighted image. 
+{self._heuristic_bullets(names)}
 
 These filters ensure that only sessions with the core imaging files required for analysis proceed to structural and quality-based checks in later phases.
 
@@ -190,9 +315,7 @@ These filters ensure that only sessions with the core imaging files required for
 
 | Heuristic              | Sessions Dropped |
 |------------------------|------------------|
-| BIDS                   | {d_bids}         |
-| Missing Data           | {d_missing}      |
-| T1w Image Missing      | {d_t1w}          |
+{rows}
 | Remaining After Phase 0| {remaining}      |
 """
         display(Markdown(md))
@@ -203,138 +326,97 @@ These filters ensure that only sessions with the core imaging files required for
         Render Phase 1 summary with explanations, drop counts, overlap analysis,
         and missingness faceted by manufacturer.
         """
-        df_base = self.phase_checkpoints.get(0, self.df_original.copy()).copy()
-
-        # Re-run masks independently
-        mask_sd = H.filter_low_scan_depth(df_base, CONFIG)
-        mask_tr = H.filter_invalid_repetition_time(df_base, CONFIG)
-        mask_dur = H.filter_short_duration(df_base, CONFIG)
-
-        dropped_sd = (~mask_sd).sum()
-        dropped_tr = (~mask_tr).sum()
-        dropped_dur = (~mask_dur).sum()
-
-        # Overlap: dropped by all 3
-        dropped_all = (~mask_sd & ~mask_tr & ~mask_dur).sum()
-
-        # Total dropped: count of unique rows dropped by any of the 3
-        mask_combined = mask_sd & mask_tr & mask_dur
-        total_dropped = (~mask_combined).sum()
-
-        remaining = len(self.phase_checkpoints.get(1, []))
-        initial = len(df_base)
-
-        scan_col = CONFIG["nifti_dim"]
-        pix_col = CONFIG["nifti_pixdim"]
-        tr_col = CONFIG["repetition_time"]
-
-        manufacturers = ["Philips", "Siemens", "GE"]
-        rows = []
-
-        for m in manufacturers:
-            sub = df_base[df_base["json_Manufacturer"] == m]
-            missing_scan = sub[scan_col].isna().sum() + sub[pix_col].isna().sum()
-            missing_tr = sub[tr_col].isna().sum()
-            rows.append(f"| {m} | {missing_scan} | {missing_tr} |")
-
-        md = f"""
-Three heuristics were evaluated:
-
-- **ScanDepth (dim₃ × pixdim₃)**: Sessions with dim₃ × pixdim₃ < 155 were flagged.
-- **RepetitionTime (TR)**: Sessions with TR outside [0.5–1.0] or [2.9–3.1] seconds were flagged.
-- **Scan Duration**: Sessions where `TR × volumes` is < 300 seconds (i.e., under 5 minutes).
-
-These thresholds are chosen to ensure structural and temporal resolution integrity.  
-- ScanDepth values above 155 typically reflect sufficient anatomical coverage.  
-- TR values within [0.5–1.0] or [2.9–3.1] seconds are considered standard for multiband and single-band protocols.  
-- Short scans (<5 minutes) may indicate incomplete acquisitions.
-
-The bullet points below summarize missing values by manufacturer, while the table highlights how many sessions were dropped by each heuristic.
-
-### Missing Field Counts by Manufacturer
-""" + "\n".join(
-    [f"- **{m}**: {rows[i].split('|')[2].strip()} missing ScanDepth, {rows[i].split('|')[3].strip()} missing TR"
-    for i, m in enumerate(manufacturers)]
-) + f"""
-
-### Dropped Summary
-
-| Heuristic         | Sessions Dropped |
-|------------------|------------------|
-| ScanDepth         | {dropped_sd}     |
-| RepetitionTime    | {dropped_tr}     |
-| Scan Duration     | {dropped_dur}    |
-| Dropped by All 3  | {dropped_all}    |
-| Remaining After Phase 1 | {remaining} |
-
-### Overlap Analysis
-
-→ **Total dropped in Phase 1 = ({dropped_sd} + {dropped_tr} + {dropped_dur}) − {dropped_all} = {dropped_sd + dropped_tr + dropped_dur} − {dropped_all} = {total_dropped} sessions**  
-→ **Remaining = {initial} − {total_dropped} = {remaining} sessions**
-    """
-        display(Markdown(md))
+        self._render_overlap_summary(1, "These thresholds are chosen to ensure structural and temporal resolution integrity.")
 
     def render_phase2_summary(self):
         """
-        Render Phase 2 summary with explanations, drop counts, and missingness
-        for PercentPhaseFOV and CoilString, faceted by manufacturer.
+        Render Phase 2 summary with explanations, drop counts, overlap analysis,
+        and missingness faceted by manufacturer.
         """
-        df_base = self.phase_checkpoints.get(1, self.df_original.copy()).copy()
-
-        # Re-run both masks independently on original data
-        mask_fov = H.filter_low_percent_phase_fov(df_base, CONFIG)
-        mask_coil = H.filter_out_bad_coils(df_base, CONFIG)
-
-        dropped_fov = (~mask_fov).sum()
-        dropped_coil = (~mask_coil).sum()
-        dropped_both = (~mask_fov & ~mask_coil).sum()
-        total_dropped = dropped_fov + dropped_coil - dropped_both
-        remaining = len(self.phase_checkpoints.get(2, []))
-
-        fov_col = CONFIG["percent_phase_fov"]
-        coil_col = CONFIG["coil_string"]
-
+        self._render_overlap_summary(2, "These filters were applied to ensure imaging consistency.", inline_rationale=True)
+
+    def _heuristic_bullets(self, names):
+        """Markdown bullets "- **summary_label**: summary" with the thresholds that were applied."""
+        bullets = []
+        for n in names:
+            heuristic = self.heuristics[n]
+            label = heuristic.get("summary_label", heuristic.get("label", n))
+            text = self.describe(n, key="summary" if "summary" in heuristic else "description")
+            bullets.append(f"- **{label}**: {text}")
+        return "\n".join(bullets)
+
+    def _render_overlap_summary(self, phase, rationale_intro, inline_rationale=False):
+        """
+        Summary of one phase's heuristics from the stats cube: their summaries and rationale
+        (from the registry, with the applied thresholds; the rationale as bullets or, with
+        `inline_rationale`, one paragraph), missing values of the columns listed in their
+        "missing" entries per manufacturer, independent drop counts and their overlap.
+        """
+        names = self.phase_map.get(phase, [])
+        if not names:
+            display(Markdown(f"No Phase {phase} heuristics are defined."))
+            return
+        cube = self.stats
+        labels = [self.heuristics[n].get("short_label", self.heuristics[n].get("label", n)) for n in names]
+
+        # Independent drop counts and overlaps from the failure bits of the cube (no heuristic re-runs)
+        dropped = [cube.failed([n], after_phase=phase - 1) for n in names]
+        dropped_all = cube.failed(names, after_phase=phase - 1, how="all")
+        total_dropped = cube.failed(names, after_phase=phase - 1)
+        remaining = cube.sessions(after_phase=phase) if phase in self.phase_masks else 0
+        initial = cube.sessions(after_phase=phase - 1)
+
+        # Missing values of the raw columns behind each heuristic (e.g. ScanDepth = missing nifti_dim
+        # + missing nifti_pixdim headers), among the sessions it was applied to
+        reported = {}
+        for n in names:
+            reported.update(H.missing_columns(self.heuristics[n], CONFIG))
+        columns = list(dict.fromkeys(col for cols in reported.values() for col in cols))
         manufacturers = ["Philips", "Siemens", "GE"]
-        rows = []
+        missing = cube.missing(columns, after_phase=phase - 1, by=MANUFACTURER).reindex(columns=manufacturers, fill_value=0)
+        missing_md = "\n".join(
+            f"- **{m}**: " + ", ".join(f"{missing.loc[cols, m].sum()} missing {label}" for label, cols in reported.items())
+            for m in manufacturers
+        )
 
-        for m in manufacturers:
-            sub = df_base[df_base["json_Manufacturer"] == m]
-            missing_fov = sub[fov_col].isna().sum()
-            missing_coil = sub[coil_col].isna().sum()
-            rows.append(f"| {m} | {missing_fov} | {missing_coil} |")
-            
+        rationale = [self.describe(n, key="rationale") for n in names if self.heuristics[n].get("rationale")]
+        if not rationale:
+            rationale_md = ""
+        elif inline_rationale:
+            rationale_md = f"\n\n{rationale_intro} " + " ".join(rationale)
+        else:
+            rationale_md = f"\n\n{rationale_intro}  \n" + "  \n".join(f"- {r}" for r in rationale)
+
+        drop_rows = "\n".join(f"| {label} | {d} |" for label, d in zip(labels, dropped))
+        if len(names) > 1:
+            drop_rows += f"\n| {'Dropped by Both' if len(names) == 2 else f'Dropped by All {len(names)}'} | {dropped_all} |"
+        if len(names) == 2:
+            overlap = f"({dropped[0]} + {dropped[1]}) − {dropped_all} = {total_dropped} sessions"
+        else:
+            overlap = f"{total_dropped} sessions (failing at least one heuristic)"
 
         md = f"""
-Two heuristics were evaluated:
-
-- **PercentPhaseFOV**: Sessions with json_PercentPhaseFOV ≤ 72 were flagged.
-- **CoilString**: Sessions that used Q-BODY or BODY coils were flagged for exclusion.
+{_counted(len(names), "heuristic")} evaluated:
 
-These filters were applied to ensure imaging consistency. An unusually low PercentPhaseFOV (e.g., 72%) may indicate problematic field coverage. Additionally, coils labeled Q-BODY or BODY are not used for brain imaging.
+{self._heuristic_bullets(names)}{rationale_md}
 
 The bullet points below summarize missing values by manufacturer, while the table highlights how many sessions were dropped by each heuristic.
 
 ### Missing Field Counts by Manufacturer
-""" + "\n".join(
-    [f"- **{m}**: {rows[i].split('|')[2].strip()} missing PercentPhaseFOV, {rows[i].split('|')[3].strip()} missing CoilString"
-     for i, m in enumerate(manufacturers)]
-) + f"""
+{missing_md}
 
 ### Dropped Summary
 
 | Heuristic                | Sessions Dropped |
 |--------------------------|------------------|
-| PercentPhaseFOV          | {dropped_fov}    |
-| CoilString               | {dropped_coil}   |
-| Dropped by Both          | {dropped_both}   |
-| Remaining After Phase 2  | {remaining}      |
+{drop_rows}
+| Remaining After Phase {phase}  | {remaining}      |
 
 ### Overlap Analysis
 
-→ **Total dropped in Phase 2 = ({dropped_fov} + {dropped_coil}) − {dropped_both} = {total_dropped} sessions**  
-→ **Remaining = {len(df_base)} − {total_dropped} = {remaining} sessions**
+→ **Total dropped in Phase {phase} = {overlap}**  
+→ **Remaining = {initial} − {total_dropped} = {remaining} sessions**
 """
-
         display(Markdown(md))
 
     def render_final_missingness_by_manufacturer(self):
@@ -342,7 +424,6 @@ The bullet points below summarize missing values by manufacturer, while the tabl
         Display a Markdown table of missing value counts for key parameters,
         faceted by manufacturer (Philips, Siemens, GE), including ScanDepth.
         """
-        df = self.df_current.copy()
         manufacturers = ["Philips", "Siemens", "GE"]
 
         # --- Columns to inspect ---
@@ -366,21 +447,18 @@ The bullet points below summarize missing values by manufacturer, while the tabl
             CONFIG["phase_encoding_axis"]
         ]
 
-        # Add ScanDepth (dim3 * pixdim3) as a derived field
-        df["ScanDepth"] = df[CONFIG["nifti_dim"]].apply(lambda x: eval(x)[3] if pd.notna(x) else None) * \
-                        df[CONFIG["nifti_pixdim"]].apply(lambda x: eval(x)[3] if pd.notna(x) else None)
-
+        # Add ScanDepth (dim3 * pixdim3), precomputed when the pipeline was loaded
         categorical_columns.append("ScanDepth")
 
+        # Sessions kept by every heuristic run, from the cube
+        last_phase = max(self.phase_masks, default=None)
+        missing = self.stats.missing(categorical_columns, after_phase=last_phase, by=MANUFACTURER)
+        missing = missing.reindex(columns=manufacturers, fill_value=0)
+
         rows = []
         for col in categorical_columns:
             label = col.replace("json_", "").replace("dicom_", "")
-            row = [label]
-            for m in manufacturers:
-                sub = df[df["json_Manufacturer"] == m]
-                missing = sub[col].isna().sum()
-                row.append(str(missing))
-            rows.append(row)
+            rows.append([label] + [str(missing.loc[col, m]) for m in manufacturers])
 
         # Build Markdown
         header = "| Parameter | Philips | Siemens | GE |\n|-----------|---------|---------|----|"
@@ -397,7 +475,7 @@ The bullet points below summarize missing values by manufacturer, while the tabl
         if df is None:
             print("Phase 0 data not available. Run the pipeline first.")
             return
-        render_scan_depth_plot(df, produce_html=produce_html, html_path=html_path)
+        render_scan_depth_plot(df, produce_html=produce_html, html_path=html_path, bands=self.accepted_ranges("ScanDepth"))
     
     def render_phase1_tr_plot(self, produce_html=False, html_path="repetition_time_by_site.html"):
         df = self.phase_checkpoints.get(0)
@@ -405,7 +483,8 @@ The bullet points below summarize missing values by manufacturer, while the tabl
             print("Phase 0 data not available. Run the pipeline first.")
             return
         from plots import render_repetition_time_plot
-        render_repetition_time_plot(df, produce_html=produce_html, html_path=html_path)
+        render_repetition_time_plot(df, produce_html=produce_html, html_path=html_path,
+                                    bands=self.accepted_ranges(CONFIG["repetition_time"]))
 
     def render_phase1_duration_plot(self, produce_html=False, html_path="total_duration_plot_phase1.html"):
         """
@@ -446,8 +525,10 @@ The bullet points below summarize missing values by manufacturer, while the tabl
             "across sites and manufacturers."
         ))
 
-        render_scan_depth_plot(df_final, produce_html=produce_html, html_path=f"{output_dir}/scan_depth.html")
-        render_repetition_time_plot(df_final, produce_html=produce_html, html_path=f"{output_dir}/tr_plot.html")
+        render_scan_depth_plot(df_final, produce_html=produce_html, html_path=f"{output_dir}/scan_depth.html",
+                               bands=self.accepted_ranges("ScanDepth"))
+        render_repetition_time_plot(df_final, produce_html=produce_html, html_path=f"{output_dir}/tr_plot.html",
+                                    bands=self.accepted_ranges(CONFIG["repetition_time"]))
         render_total_duration_plot(df_final, produce_html=produce_html, html_path=f"{output_dir}/total_duration.html")
         render_coil_string_plot(df_final, produce_html=produce_html, html_path=f"{output_dir}/coil_string.html")
         render_percent_phase_fov_plot(df_final, produce_html=produce_html, html_path=f"{output_dir}/percent_phase_fov.html")
@@ -463,12 +544,15 @@ The bullet points below summarize missing values by manufacturer, while the tabl
         render_multiband_vs_singleband_plot(df_final, produce_html=produce_html, html_path=f"{output_dir}/mb_vs_sb_timeline.html")
         render_remaining_parameters_plot(df_final, produce_html=produce_html, html_dir=output_dir)
         
-def run_heuristics(csv_path, phase_limit=3, display_markdown=True):
+def run_heuristics(csv_path, phase_limit=3, display_markdown=True, params=None, heuristics=None):
     """
     Run the full pipeline up to a phase and optionally display Markdown summary.
+    `params` overrides heuristic thresholds, e.g. {"filter_short_duration": {"value": 240}};
+    masks of unchanged heuristics are reused from previous runs. `heuristics` replaces
+    config.HEURISTICS with another registry (dict or YAML path).
     Returns the SessionFilterPipeline object for further inspection or export.
     """
-    pipeline = SessionFilterPipeline(csv_path)
+    pipeline = SessionFilterPipeline(csv_path, params=params, heuristics=heuristics)
     pipeline.run(phase_limit=phase_limit, verbose=False)  
     if display_markdown:
         pipeline.display_phase_summary()
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from config import CONFIG
+
+# Columns whose missing values the report tables count (phase summaries and final missingness)
+MISSING_COLUMNS = [
+    "nifti_dim3", "nifti_pixdim3", "ScanDepth",
+    CONFIG["repetition_time"],
+    CONFIG["magnetic_field_strength"],
+    CONFIG["manufacturer_model"],
+    CONFIG["institution_name"],
+    CONFIG["mr_acquisition_type"],
+    CONFIG["slice_thickness"],
+    CONFIG["spacing_between_slices"],
+    CONFIG["echo_time"],
+    CONFIG["flip_angle"],
+    CONFIG["percent_phase_fov"],
+    CONFIG["percent_sampling"],
+    CONFIG["echo_train_length"],
+    CONFIG["acquisition_matrix_pe"],
+    CONFIG["phase_encoding_direction"],
+    CONFIG["coil_string"],
+    CONFIG["mr_acquisition_freq_encoding"],
+    CONFIG["phase_encoding_axis"],
+]
+
+# Low-cardinality columns whose value counts are kept per cell
+VALUE_COLUMNS = ["ScanType", CONFIG["coil_string"], CONFIG["magnetic_field_strength"], CONFIG["mr_acquisition_type"]]
+
+MANUFACTURER = "json_Manufacturer"
+
+
+def _missing(df, col):
+    """
+    Missing-value mask of one column. A header list column (nifti_dim) that a typed mastersheet
+    only stores as nifti_dim0..7 is missing where nifti_dim0 is; any other absent column counts
+    as missing everywhere (as list_element does).
+    """
+    if col in df.columns:
+        return df[col].isna().to_numpy()
+    if f"{col}0" in df.columns:
+        return df[f"{col}0"].isna().to_numpy()
+    return np.ones(len(df), dtype=bool)
+
+
+class StatsCube:
+    """
+    Session counts, missing-value counts and value counts aggregated per
+    (stage, failure bits, manufacturer, site) cell in one groupby pass over the pipeline result.
+
+    `stage` is the position (in run order) of the heuristic that dropped the session, or the
+    number of heuristics run for sessions that were kept, so "sessions remaining after phase p"
+    is a range of stages. `failure_bits` is the session's bitmask of every failed heuristic, so
+    independent and overlapping drop counts are bit tests on the cell keys. Every report table
+    sums cells of this cube instead of re-filtering the DataFrame.
+
+    Example usage:
+        cube = pipeline.stats
+        cube.missing(["json_RepetitionTime"], after_phase=0, by=MANUFACTURER)
+        cube.failed(["filter_low_percent_phase_fov", "filter_out_bad_coils"], after_phase=1, how="all")
+    """
+
+    def __init__(self, pipeline, missing_columns=MISSING_COLUMNS, value_columns=VALUE_COLUMNS):
+        df = pipeline.df_original
+        self.heuristic_bits = pipeline.heuristic_bits
+        self.order = list(pipeline.dropped_masks)  # heuristics in the order run() applied them
+        # Stage index right after the last heuristic of each phase that was run
+        self.phase_end = {
+            phase: sum(len(names) for p, names in pipeline.phase_map.items() if p <= phase)
+            for phase in pipeline.phase_masks
+        }
+
+        stage = np.full(len(df), len(self.order), dtype=np.int16)
+        for i, name in enumerate(self.order):
+            stage[pipeline.dropped_masks[name]] = i
+        bits = pipeline.failure_bits if pipeline.failure_bits is not None else np.zeros(len(df), dtype=np.uint64)
+
+        keys = pd.DataFrame({
+            "stage": stage,
+            "failure_bits": bits,
+            MANUFACTURER: df[MANUFACTURER].astype("string").fillna("Unknown").to_numpy(),
+            "Site": df["Site"].astype("string").fillna("Unknown").to_numpy(),
+        })
+        self.keys = list(keys.columns)
+
+        missing = pd.DataFrame({col: _missing(df, col) for col in missing_columns}, dtype=np.int32)
+        self.missing_columns = list(missing_columns)
+        grouped = pd.concat([keys, missing], axis=1).groupby(self.keys, observed=True, sort=False)
+        self.cells = grouped.sum()
+        self.cells.insert(0, "sessions", grouped.size())
+        self.cells = self.cells.reset_index()
+
+        present = [col for col in value_columns if col in df.columns]
+        values = pd.concat([keys, df[present].astype("string").reset_index(drop=True)], axis=1)
+        self.values = (
+            values.melt(id_vars=self.keys, var_name="column", value_name="value")
+            .fillna({"value": "Not Provided"})
+            .groupby(self.keys + ["column", "value"], observed=True, sort=False)
+            .size()
+            .rename("sessions")
+            .reset_index()
+        )
+
+    def _select(self, table, after_phase=None):
+        """Cells of sessions still present after `after_phase` (all sessions if None or not run)."""
+        if after_phase is None:
+            return table
+        return table[table["stage"] >= self.phase_end.get(after_phase, 0)]
+
+    def _bits(self, names):
+        value = 0
+        for name in names:
+            value |= self.heuristic_bits[name]
+        return np.uint64(value)
+
+    def _total(self, cells, column, by):
+        if by is None:
+            return int(cells[column].sum())
+        return cells.groupby(by, observed=True)[column].sum()
+
+    def sessions(self, after_phase=None, by=None):
+        """Number of sessions remaining after a phase (all sessions if None), optionally per `by`."""
+        return self._total(self._select(self.cells, after_phase), "sessions", by)
+
+    def dropped(self, name, by=None):
+        """Sessions dropped by heuristic `name` in run order (not counting earlier drops)."""
+        if name not in self.order:
+            return 0 if by is None else pd.Series(dtype=int)
+        cells = self.cells[self.cells["stage"] == self.order.index(name)]
+        return self._total(cells, "sessions", by)
+
+    def failed(self, names, after_phase=None, how="any", by=None):
+        """
+        Sessions remaining after `after_phase` that fail any/all of the heuristics `names`,
+        regardless of run order (independent and overlap counts of the phase summaries).
+        """
+        cells = self._select(self.cells, after_phase)
+        bits = self._bits(names)
+        hit = cells["failure_bits"].to_numpy(dtype=np.uint64) & bits
+        cells = cells[hit != 0] if how == "any" else cells[hit == bits]
+        return self._total(cells, "sessions", by)
+
+    def missing(self, columns, after_phase=None, by=MANUFACTURER):
+        """Missing-value counts of `columns` among sessions remaining after `after_phase`."""
+        cells = self._select(self.cells, after_phase)
+        if by is None:
+            return cells[list(columns)].sum()
+        return cells.groupby(by, observed=True)[list(columns)].sum().T
+
+    def value_counts(self, column, after_phase=None, by=None):
+        """Session counts per value of one of the VALUE_COLUMNS, optionally per `by`."""
+        values = self._select(self.values, after_phase)
+        values = values[values["column"] == column]
+        return values.groupby(([by] if by else []) + ["value"], observed=True)["sessions"].sum()
@@ -0,0 +1,162 @@
+import itertools
+import numpy as np
+import pandas as pd
+import heuristics as H
+from config import CONFIG
+
+# Breakdowns reported by sweep_thresholds besides the overall ("all") retention
+SWEEP_GROUPS = ("json_Manufacturer", "Site")
+
+
+def _grid_options(fields):
+    """Cartesian product of one heuristic's field grids, e.g. {"value": [70, 72]} -> [{"value": 70}, {"value": 72}]."""
+    keys = list(fields)
+    values = [[tuple(v) if isinstance(v, list) else v for v in fields[k]] for k in keys]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def _quiet(rules):
+    """Rules without warn_missing, so a sweep does not print the same warning per grid value."""
+    return [{k: v for k, v in rule.items() if k != "warn_missing"} for rule in rules]
+
+
+def _object_array(values):
+    """1-D object array (keeps tuple thresholds such as ranges as single values)."""
+    out = np.empty(len(values), dtype=object)
+    out[:] = values
+    return out
+
+
+class _Grouping:
+    """Sorted row order of one breakdown so per-group sums are a single np.add.reduceat."""
+
+    def __init__(self, codes, n_codes):
+        self.n_codes = n_codes
+        self.order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[self.order]
+        self.starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(codes) else np.array([], int)
+        self.present = sorted_codes[self.starts]
+
+    def sums(self, values):
+        """Per-group column sums of `values` (combinations x rows) -> (combinations x n_codes)."""
+        out = np.zeros((values.shape[0], self.n_codes), dtype=np.int64)
+        if len(self.starts):
+            out[:, self.present] = np.add.reduceat(values[:, self.order].astype(np.int32), self.starts, axis=1)
+        return out
+
+
+def sweep_thresholds(pipeline, grids, by=SWEEP_GROUPS, phase_limit=None, chunk_rows=20_000_000):
+    """
+    Evaluate every combination of threshold grids and return retention curves.
+
+    Each grid value is evaluated once per heuristic as a row mask over the precomputed columns;
+    combinations are then boolean ANDs of those masks with the (fixed) result of the heuristics
+    that are not swept, and kept sessions/subjects per group are summed with np.add.reduceat.
+    No DataFrame is copied per combination.
+
+    Example usage:
+        curves = sweep_thresholds(pipeline, {
+            "filter_low_scan_depth": {"range": [[d, 180] for d in range(140, 171)]},
+            "filter_low_percent_phase_fov": {"value": range(60, 91)},
+        })
+
+    Args:
+        pipeline (SessionFilterPipeline): Loaded pipeline; its registry and params are the baseline.
+        grids (dict): {heuristic_name: {rule_field: [values, ...]}}; fields as in set_params().
+        by (tuple): Columns to break retention down by, in addition to "all".
+        phase_limit (int): Only apply heuristics up to this phase (default: all phases). Sweeping a
+            heuristic of a later phase raises ValueError.
+        chunk_rows (int): Upper bound on combinations x sessions held in memory at once.
+
+    Returns:
+        pd.DataFrame: One row per combination and group with a column per swept field
+        ("{heuristic}.{field}"), group_by, group, sessions, subjects, and their retention
+        relative to all sessions/subjects of that group before filtering.
+    """
+    df = pipeline.df_original
+    unknown = [name for name in grids if name not in pipeline.heuristics]
+    if unknown:
+        raise KeyError(f"Unknown heuristics: {unknown}")
+
+    active = [
+        name for phase, names in pipeline.phase_map.items()
+        if phase_limit is None or phase <= phase_limit for name in names
+    ]
+    inactive = [name for name in grids if name not in active]
+    if inactive:
+        raise ValueError(
+            f"Heuristics {inactive} are in phases above phase_limit={phase_limit}, so sweeping them has no effect."
+        )
+    swept = list(grids)
+    fixed = [name for name in active if name not in grids]
+
+    # Rows failing any fixed heuristic are dropped in every combination
+    base = ~pipeline.failed_any(fixed) if fixed else np.ones(len(df), dtype=bool)
+    rows = np.flatnonzero(base)
+
+    options, masks = {}, {}
+    for name in swept:
+        options[name] = _grid_options(grids[name])
+        heuristic = pipeline.heuristics[name]
+        masks[name] = np.stack([
+            H.evaluate_rules(df, CONFIG, _quiet(H.resolve_rules(heuristic, {**pipeline.params.get(name, {}), **params})))[rows]
+            for params in options[name]
+        ])
+    combos = np.array(list(itertools.product(*[range(len(options[name])) for name in swept])), dtype=np.intp)
+    combos = combos.reshape(len(combos), len(swept))
+
+    # Group codes over all sessions (totals) and over the rows that survive the fixed heuristics
+    subjects = pd.factorize(df[CONFIG["PTID"]])[0]
+    breakdowns = []
+    for group_by in ("all",) + tuple(by):
+        if group_by == "all":
+            codes, labels = np.zeros(len(df), dtype=np.intp), np.array(["all"], dtype=object)
+        else:
+            codes, labels = pd.factorize(df[group_by].astype("string").fillna("Unknown"), sort=True)
+            labels = np.asarray(labels, dtype=object)
+        pair_codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([codes, subjects]))
+        pair_group = pairs.get_level_values(0).to_numpy()
+        breakdowns.append({
+            "group_by": group_by, "labels": labels,
+            "total_sessions": np.bincount(codes, minlength=len(labels)),
+            "total_subjects": np.bincount(pair_group, minlength=len(labels)),
+            "sessions": _Grouping(codes[rows], len(labels)),
+            "pairs": _Grouping(pair_codes[rows], len(pairs)),
+            "pair_groups": _Grouping(pair_group, len(labels)),
+        })
+
+    chunk = max(1, chunk_rows // max(1, len(rows)))
+    sessions = {b["group_by"]: [] for b in breakdowns}
+    subjects_kept = {b["group_by"]: [] for b in breakdowns}
+    for start in range(0, len(combos), chunk):
+        idx = combos[start:start + chunk]
+        kept = np.ones((len(idx), len(rows)), dtype=bool)
+        for j, name in enumerate(swept):
+            kept &= masks[name][idx[:, j]]
+        for b in breakdowns:
+            sessions[b["group_by"]].append(b["sessions"].sums(kept))
+            subjects_kept[b["group_by"]].append(b["pair_groups"].sums(b["pairs"].sums(kept) > 0))
+
+    # Long table: combinations x groups
+    frames = []
+    n_combos = len(combos)
+    for b in breakdowns:
+        n_groups = len(b["labels"])
+        kept_sessions = np.vstack(sessions[b["group_by"]]).ravel()
+        kept_subjects = np.vstack(subjects_kept[b["group_by"]]).ravel()
+        total_sessions = np.tile(b["total_sessions"], n_combos)
+        total_subjects = np.tile(b["total_subjects"], n_combos)
+        frame = {
+            f"{name}.{field}": np.repeat(_object_array([options[name][i][field] for i in combos[:, j]]), n_groups)
+            for j, name in enumerate(swept) for field in grids[name]
+        }
+        frame.update({
+            "group_by": b["group_by"],
+            "group": np.tile(b["labels"], n_combos),
+            "sessions": kept_sessions,
+            "subjects": kept_subjects,
+            "retention_sessions": kept_sessions / np.maximum(total_sessions, 1),
+            "retention_subjects": kept_subjects / np.maximum(total_subjects, 1),
+        })
+        frames.append(pd.DataFrame(frame))
+    return pd.concat(frames, ignore_index=True)
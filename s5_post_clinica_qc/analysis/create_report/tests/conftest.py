@@ -0,0 +1,76 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# The report modules import each other relative to analysis/create_report/scripts/ (as main.ipynb does)
+SUITE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+TOP_LEVEL = {os.path.splitext(name)[0] for name in os.listdir(SUITE_DIR)}
+
+
+def _is_local(module):
+    paths = [getattr(module, "__file__", None), *getattr(module, "__path__", [])]
+    return any(p and os.path.abspath(p).startswith(SUITE_DIR + os.sep) for p in paths)
+
+
+def use_suite_modules():
+    """
+    Put scripts/ first on sys.path and forget same-named modules imported from elsewhere
+    (create_mastersheet has a config/ package that shadows scripts/config.py), so this suite
+    can run in the same pytest session as create_mastersheet/tests.
+    """
+    if sys.path[:1] != [SUITE_DIR]:
+        sys.path[:] = [SUITE_DIR] + [p for p in sys.path if p != SUITE_DIR]
+    for name, module in list(sys.modules.items()):
+        if name.split(".")[0] in TOP_LEVEL and not _is_local(module):
+            del sys.modules[name]
+
+
+def pytest_collectstart(collector):
+    use_suite_modules()
+
+
+def pytest_runtest_setup(item):
+    use_suite_modules()
+
+
+use_suite_modules()
+
+
+def write_mastersheet(path, n_sessions=400, seed=0):
+    """
+    Small synthetic mastersheet CSV with the columns the heuristics read. Values sit on and around
+    every threshold (TR windows, ScanDepth range, 300 s duration, PercentPhaseFOV 72, body coils)
+    and include missing headers, missing files and short dim lists.
+    """
+    rng = np.random.default_rng(seed)
+    pick = lambda options: [options[i] for i in rng.integers(0, len(options), n_sessions)]
+    dims = pick(["[4, 64, 64, {d3}, {d4}, 1, 1, 1]"] * 12 + ["[3, 64, 64, {d3}, 1, 1, 1, 1]", None])
+    dim3, dim4 = rng.choice([48, 50, 54], n_sessions), rng.choice([90, 100, 140, 197, 976], n_sessions)
+    pixdim3 = rng.choice([3.0, 3.3, 3.31, 3.5], n_sessions)
+    subjects = [f"{site:03d}_S_{i:04d}" for site, i in zip(rng.choice([2, 13, 35, 127], n_sessions), rng.integers(0, 150, n_sessions))]
+    df = pd.DataFrame({
+        "Subject_ID": subjects,
+        "VISCODE": pick(["bl", "m06", "m12", "m24", "m48"]),
+        "Image_ID": pick([1341794, 401073] + list(range(101, 119))),
+        "NIfTI_exists": pick([True] * 12 + [False]),
+        "JSON_exists": pick([True] * 12 + [False]),
+        "T1w_exists": pick([True] * 12 + [False]),
+        "nifti_dim": [d.format(d3=a, d4=b) if d else None for d, a, b in zip(dims, dim3, dim4)],
+        "nifti_pixdim": [f"[1.0, 3.3, 3.3, {p}, 3.0, 0.0, 0.0, 0.0]" if has else None
+                         for p, has in zip(pixdim3, pick([True] * 12 + [False]))],
+        "json_RepetitionTime": pick([0.607, 3.0, 0.5, 1.0, 2.9, 3.1] * 3 + [2.0, 0.45, 3.2, None]),
+        "json_PercentPhaseFOV": pick([100.0, 93.75, 80.0, 72.0, 72.5, 70.0, None]),
+        "json_CoilString": pick(["HEAD", "32Ch_Head", "HEA;HEP", "Q-Body", "BODY", None]),
+        "json_Manufacturer": pick(["Philips", "Siemens", "GE", None]),
+        "dicom_SeriesDate": pick([20110616, 20120101, 20150320, None]),
+    })
+    df.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def mastersheet_csv(tmp_path):
+    return write_mastersheet(str(tmp_path / "mastersheet.csv"))
+
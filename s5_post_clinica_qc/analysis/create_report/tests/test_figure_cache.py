@@ -0,0 +1,44 @@
+import importlib
+import sys
+import textwrap
+import pandas as pd
+import figure_cache
+from figure_cache import FigureCache
+
+RENDERER = '''
+import plotly.express as px
+from figure_cache import cached_render
+
+
+@cached_render(["Site", "ScanDepth"], lambda fig, path: None)
+def render_test_plot(df, produce_html=False, html_path="test.html", show=True):
+    return px.scatter(df, x="Site", y="ScanDepth", title="{title}")
+'''
+
+
+def _write_renderer(directory, title):
+    (directory / "renderer_under_test.py").write_text(textwrap.dedent(RENDERER).format(title=title))
+
+
+def test_renderer_code_change_misses_cache(tmp_path, monkeypatch):
+    cache = FigureCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(figure_cache, "FIGURE_CACHE", cache)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    df = pd.DataFrame({
+        "Site": ["002", "003"], "ScanDepth": [160.0, 170.0],
+        "n_volumes": [200, 200], "Duration_sec": [600.0, 600.0], "ScanType": ["SB", "SB"],
+    })
+
+    _write_renderer(tmp_path, "Before")
+    module = importlib.import_module("renderer_under_test")
+    module.render_test_plot(df, show=False)
+    module.render_test_plot(df, show=False)
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    _write_renderer(tmp_path, "After editing the title")
+    module = importlib.reload(module)
+    fig = module.render_test_plot(df, show=False)
+    assert (cache.misses, cache.hits) == (2, 1)
+    assert fig.layout.title.text == "After editing the title"
+    sys.modules.pop("renderer_under_test", None)
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+from longitudinal import LongitudinalIndex
+
+
+def test_timelines_spans_and_protocol_switches():
+    df = pd.DataFrame({
+        "Subject_ID": ["002_S_0001", "002_S_0001", "002_S_0001", "013_S_0002", "013_S_0002"],
+        "VISCODE": ["m24", "bl", "m12", "bl", "m06"],
+        "dicom_SeriesDate": [20130110.0, 20110105.0, "not a date", "20120301", None],
+        "ScanType": ["MB", "SB", "MB", "SB", "SB"],
+    })
+    passed = np.array([True, True, True, True, False])
+    index = LongitudinalIndex(df, passed=passed)
+
+    timeline = index.timeline("002_S_0001")
+    assert timeline["VISCODE"].tolist() == ["bl", "m24", "m12"]  # dated sessions first, by date
+    assert timeline["SeriesDate"].isna().tolist() == [False, False, True]
+    assert timeline["row"].tolist() == [1, 0, 2]
+
+    assert index.sessions_per_subject().to_dict() == {"002_S_0001": 3, "013_S_0002": 1}
+    assert round(index.span_months()["002_S_0001"]) == 24
+    assert index.subjects_with(min_sessions=2, min_span_months=12) == ["002_S_0001"]
+    switches = index.protocol_switches(by="Subject_ID")
+    assert switches.loc["002_S_0001"].to_dict() == {"MB→SB": 0, "SB→MB": 1}  # bl SB, m24 MB, m12 MB
@@ -0,0 +1,23 @@
+from mask_cache import MaskCache
+from session_pipeline import SessionFilterPipeline
+
+
+def test_only_changed_heuristic_is_recomputed(mastersheet_csv):
+    cache = MaskCache()
+    pipeline = SessionFilterPipeline(mastersheet_csv, cache=cache)
+    n = len(pipeline.heuristics)
+    pipeline.run(verbose=False)
+    assert (cache.misses, cache.hits) == (n, 0)
+    kept = pipeline.get_phase_summary()["final_kept"]
+
+    pipeline.set_params("filter_low_percent_phase_fov", value=60)
+    pipeline.run(verbose=False)
+    assert (cache.misses, cache.hits) == (n + 1, n - 1)
+    assert pipeline.get_phase_summary()["final_kept"] > kept
+
+    # Back to the configured threshold, and a reload of the unchanged mastersheet: all hits
+    pipeline.set_params("filter_low_percent_phase_fov", value=72)
+    pipeline.run(verbose=False)
+    SessionFilterPipeline(mastersheet_csv, cache=cache).run(verbose=False)
+    assert (cache.misses, cache.hits) == (n + 1, 3 * n - 1)
+    assert pipeline.get_phase_summary()["final_kept"] == kept
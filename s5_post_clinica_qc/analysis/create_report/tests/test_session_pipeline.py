@@ -0,0 +1,55 @@
+import numpy as np
+from session_pipeline import SessionFilterPipeline
+
+# Counts of the original pipeline (heuristic functions applied to DataFrame copies) on the
+# conftest.write_mastersheet fixture; the mask/bitmask engine and registry must reproduce them.
+SEQUENTIAL_DROPS = {
+    "filter_missing_data_adnidap": 45,
+    "filter_missing_data": 53,
+    "filter_missing_t1w": 19,
+    "filter_low_scan_depth": 101,
+    "filter_invalid_repetition_time": 30,
+    "filter_short_duration": 85,
+    "filter_low_percent_phase_fov": 28,
+    "filter_out_bad_coils": 12,
+}
+# Per phase: sessions entering the phase, each heuristic's drops on its own, dropped by all, dropped by any
+INDEPENDENT_DROPS = {
+    0: (400, {"filter_missing_data_adnidap": 45, "filter_missing_data": 58, "filter_missing_t1w": 29}, 0, 117),
+    1: (283, {"filter_low_scan_depth": 101, "filter_invalid_repetition_time": 44, "filter_short_duration": 175}, 8, 216),
+    2: (67, {"filter_low_percent_phase_fov": 28, "filter_out_bad_coils": 20}, 8, 40),
+}
+
+
+def test_drop_counts_match_original_pipeline(mastersheet_csv):
+    pipeline = SessionFilterPipeline(mastersheet_csv, cache=None)
+    pipeline.run(verbose=False)
+
+    summary = pipeline.get_phase_summary()
+    assert summary["drop_details"] == SEQUENTIAL_DROPS
+    assert summary["initial_count"] == 400
+    assert summary["final_kept"] == 400 - sum(SEQUENTIAL_DROPS.values())
+    assert {name: len(df) for name, df in pipeline.dropped_dfs.items()} == SEQUENTIAL_DROPS
+    assert len(pipeline.df_current) == summary["final_kept"]
+    assert pipeline.longitudinal.sessions_per_subject().gt(0).sum() == 26
+
+    cube = pipeline.stats
+    for phase, (entering, drops, dropped_all, dropped_any) in INDEPENDENT_DROPS.items():
+        names = list(drops)
+        base = pipeline.phase_masks.get(phase - 1, np.ones(pipeline.initial_count, dtype=bool))
+        assert int(base.sum()) == entering == cube.sessions(after_phase=phase - 1 if phase else None)
+        for name, dropped in drops.items():
+            assert int((base & pipeline.failed_any([name])).sum()) == dropped
+            assert cube.failed([name], after_phase=phase - 1 if phase else None) == dropped
+        assert int((base & pipeline.failed_all(names)).sum()) == dropped_all
+        assert int((base & pipeline.failed_any(names)).sum()) == dropped_any
+        assert len(pipeline.phase_checkpoints[phase]) == entering - dropped_any
+
+
+def test_phase_limit_stops_after_that_phase(mastersheet_csv):
+    pipeline = SessionFilterPipeline(mastersheet_csv, cache=None)
+    pipeline.run(phase_limit=1, verbose=False)
+
+    assert list(pipeline.phase_masks) == [0, 1]
+    assert "filter_out_bad_coils" not in pipeline.dropped_masks
+    assert pipeline.get_phase_summary()["final_kept"] == INDEPENDENT_DROPS[2][0]
@@ -0,0 +1,48 @@
+import pytest
+from session_pipeline import SessionFilterPipeline
+
+GRIDS = {
+    "filter_low_scan_depth": {"range": [[150, 180], [155, 180]]},
+    "filter_low_percent_phase_fov": {"value": [60, 72, 90]},
+}
+
+
+def _kept(pipeline):
+    """(sessions, subjects) kept by run(), overall and per manufacturer."""
+    df = pipeline.df_current
+    by = df["json_Manufacturer"].astype("string").fillna("Unknown")
+    return (len(df), df["Subject_ID"].nunique(),
+            df.groupby(by).size().to_dict(), df.groupby(by)["Subject_ID"].nunique().to_dict())
+
+
+def _swept(curves, depth, fov):
+    rows = curves[(curves["filter_low_scan_depth.range"] == tuple(depth))
+                  & (curves["filter_low_percent_phase_fov.value"] == fov)]
+    overall = rows[rows["group_by"] == "all"].iloc[0]
+    manufacturers = rows[(rows["group_by"] == "json_Manufacturer") & (rows["sessions"] > 0)].set_index("group")
+    return (overall["sessions"], overall["subjects"],
+            manufacturers["sessions"].to_dict(), manufacturers.loc[manufacturers["subjects"] > 0, "subjects"].to_dict())
+
+
+def test_sweep_matches_run_at_every_grid_point(mastersheet_csv):
+    pipeline = SessionFilterPipeline(mastersheet_csv, cache=None)
+    curves = pipeline.sweep(GRIDS)
+    assert len(curves[curves["group_by"] == "all"]) == 2 * 3
+
+    # Configured thresholds (no overrides) first, then the other grid points via set_params
+    pipeline.run(verbose=False)
+    assert _swept(curves, [155, 180], 72) == _kept(pipeline)
+    for depth in GRIDS["filter_low_scan_depth"]["range"]:
+        for fov in GRIDS["filter_low_percent_phase_fov"]["value"]:
+            pipeline.set_params("filter_low_scan_depth", range=depth)
+            pipeline.set_params("filter_low_percent_phase_fov", value=fov)
+            pipeline.run(verbose=False)
+            assert _swept(curves, depth, fov) == _kept(pipeline)
+
+
+def test_sweep_rejects_heuristics_beyond_phase_limit(mastersheet_csv):
+    pipeline = SessionFilterPipeline(mastersheet_csv, cache=None)
+    with pytest.raises(ValueError, match="filter_low_percent_phase_fov"):
+        pipeline.sweep(GRIDS, phase_limit=1)
+    with pytest.raises(KeyError):
+        pipeline.sweep({"filter_unknown": {"value": [1]}})